@@ -0,0 +1,131 @@
+# Medición por request: consultas SQL (cantidad, tiempo y texto), tiempo de
+# la vista, del render (serialización a JSON) y total. Los histogramas por
+# endpoint viven en la memoria de cada proceso y se reinician con el worker.
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+# Límites superiores de los buckets (el último bucket queda abierto)
+LIMITES_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class RegistroConsultas:
+    """execute_wrapper que cuenta y cronometra las consultas; guarda el SQL de las primeras max_sql"""
+
+    def __init__(self, max_sql=50):
+        self.cantidad = 0
+        self.segundos = 0.0
+        self.consultas = []
+        self.max_sql = max_sql
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.cantidad += 1
+            self.segundos += duracion
+            if len(self.consultas) < self.max_sql:
+                self.consultas.append((duracion, sql))
+
+    def resumen_sql(self, maximo=10, largo=300):
+        """Líneas con las consultas más lentas y las repetidas (típico N+1)"""
+        lineas = [
+            f"  {duracion * 1000:7.1f} ms  {sql[:largo]}"
+            for duracion, sql in sorted(self.consultas, reverse=True)[:maximo]
+        ]
+        repetidas = [(sql, n) for sql, n in Counter(sql for _, sql in self.consultas).most_common(3) if n > 1]
+        lineas += [f"  repetida x{n}: {sql[:largo]}" for sql, n in repetidas]
+        return "\n".join(lineas)
+
+
+@contextmanager
+def registrar_consultas(max_sql=50):
+    """Registra las consultas de todas las conexiones dentro del bloque"""
+    registro = RegistroConsultas(max_sql)
+    with ExitStack() as pila:
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(registro))
+        yield registro
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.buckets = [0] * (len(limites) + 1)
+        self.cantidad = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def observar(self, valor):
+        self.buckets[bisect_left(self.limites, valor)] += 1
+        self.cantidad += 1
+        self.suma += valor
+        self.maximo = max(self.maximo, valor)
+
+    def como_dict(self):
+        return {
+            'promedio': round(self.suma / self.cantidad, 2) if self.cantidad else 0,
+            'maximo': round(self.maximo, 2),
+            'buckets': {
+                **{f'<={limite}': n for limite, n in zip(self.limites, self.buckets)},
+                f'>{self.limites[-1]}': self.buckets[-1],
+            },
+        }
+
+
+class Estadisticas:
+    """Histogramas por endpoint ('GET producto-list') y últimas solicitudes lentas"""
+
+    def __init__(self, max_muestras=20):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.muestras = deque(maxlen=max_muestras)
+
+    def observar(self, endpoint, total_ms, db_ms, vista_ms, render_ms, consultas):
+        with self._lock:
+            datos = self._endpoints.get(endpoint)
+            if datos is None:
+                datos = self._endpoints[endpoint] = {
+                    'total_ms': Histograma(LIMITES_MS),
+                    'db_ms': Histograma(LIMITES_MS),
+                    'vista_ms': Histograma(LIMITES_MS),
+                    'render_ms': Histograma(LIMITES_MS),
+                    'consultas': Histograma(LIMITES_CONSULTAS),
+                }
+            datos['total_ms'].observar(total_ms)
+            datos['db_ms'].observar(db_ms)
+            datos['vista_ms'].observar(vista_ms)
+            datos['render_ms'].observar(render_ms)
+            datos['consultas'].observar(consultas)
+
+    def agregar_muestra(self, muestra):
+        with self._lock:
+            self.muestras.append(muestra)
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                'endpoints': {
+                    endpoint: {
+                        'solicitudes': datos['total_ms'].cantidad,
+                        **{nombre: histograma.como_dict() for nombre, histograma in datos.items()},
+                    }
+                    for endpoint, datos in sorted(self._endpoints.items())
+                },
+                'lentas': list(self.muestras),
+            }
+
+    def reiniciar(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.muestras.clear()
+
+
+estadisticas = Estadisticas()
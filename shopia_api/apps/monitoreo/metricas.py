@@ -0,0 +1,89 @@
+# Métricas de Prometheus (texto en /metrics).
+# Con gunicorn varios workers comparten los valores por archivos en
+# PROMETHEUS_MULTIPROC_DIR (ver gunicorn.conf.py); sin esa variable, p. ej.
+# con runserver, se usa el registro normal del proceso.
+import os
+import time
+from functools import wraps
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_FASES = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BUCKETS_BYTES = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 20_000_000)
+
+solicitud_segundos = Histogram(
+    'shopia_solicitud_segundos', 'Duración de las solicitudes por vista',
+    ['metodo', 'vista', 'estado'], buckets=BUCKETS_SEGUNDOS,
+)
+solicitud_consultas = Histogram(
+    'shopia_solicitud_consultas', 'Consultas SQL por solicitud',
+    ['metodo', 'vista'], buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+prediccion_fase_segundos = Histogram(
+    'shopia_prediccion_fase_segundos', 'Duración de cada fase de PrediccionService',
+    ['fase', 'resultado'], buckets=BUCKETS_FASES,
+)
+reporte_segundos = Histogram(
+    'shopia_reporte_segundos', 'Tiempo de generación de reportes',
+    ['reporte', 'formato'], buckets=BUCKETS_SEGUNDOS,
+)
+reporte_bytes = Histogram(
+    'shopia_reporte_bytes', 'Tamaño de los reportes generados',
+    ['reporte', 'formato'], buckets=BUCKETS_BYTES,
+)
+nlp_segundos = Histogram(
+    'shopia_nlp_comando_segundos', 'Latencia de interpretación de comandos de voz',
+    ['accion'], buckets=BUCKETS_SEGUNDOS,
+)
+fcm_envios = Counter(
+    'shopia_fcm_envios', 'Mensajes push enviados a FCM', ['resultado'],
+)
+checkout_espera_lock_segundos = Histogram(
+    'shopia_checkout_espera_lock_segundos', 'Espera del bloqueo de stock al finalizar la compra',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+def medir_fase(fase):
+    """Decorador para las fases de PrediccionService (devuelven True/False)"""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = 'error'
+            try:
+                valor = funcion(*args, **kwargs)
+                resultado = 'ok' if valor is not False and valor is not None else 'fallo'
+                return valor
+            finally:
+                prediccion_fase_segundos.labels(fase=fase, resultado=resultado).observe(time.perf_counter() - inicio)
+        return envoltura
+    return decorador
+
+
+def medir_reporte(reporte, formato):
+    """Decorador para las vistas de reportes: tiempo y tamaño de las respuestas 200"""
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            inicio = time.perf_counter()
+            response = vista(request, *args, **kwargs)
+            if response.status_code == 200:
+                reporte_segundos.labels(reporte=reporte, formato=formato).observe(time.perf_counter() - inicio)
+                reporte_bytes.labels(reporte=reporte, formato=formato).observe(len(response.content))
+            return response
+        return envoltura
+    return decorador
+
+
+def exportar():
+    """(contenido, content_type) en formato texto de Prometheus"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
@@ -0,0 +1,139 @@
+import logging
+import time
+
+from django.conf import settings
+from rest_framework.exceptions import APIException
+
+from apps.usuarios.autenticacion import JWTAutenticacionCacheada
+from . import metricas, perfilado
+from .medicion import estadisticas, registrar_consultas
+
+logger = logging.getLogger('apps.monitoreo')
+
+
+def nombre_vista(request):
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None:
+        return 'sin_ruta'
+    return resolver_match.view_name or resolver_match._func_path
+
+
+def es_admin(usuario):
+    if usuario is None or not usuario.is_authenticated:
+        return False
+    return usuario.is_staff or usuario.tiene_rol('admin')
+
+
+class MedicionMiddleware:
+    """
+    Mide cada request: consultas y tiempo de BD, tiempo de la vista, del
+    render y total, agrupados por vista resuelta ('GET producto-list').
+    A los admins les devuelve el header Server-Timing; las solicitudes
+    lentas o con demasiadas consultas se loguean con su SQL.
+    Va primero en MIDDLEWARE para que el total incluya a los demás.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.MONITOREO_ACTIVO:
+            return self.get_response(request)
+
+        request._medicion = medicion = {'vista': None, 'render': None, 'fin_render': None}
+        inicio = time.perf_counter()
+        with registrar_consultas(settings.MONITOREO_MAX_SQL) as registro:
+            response = self.get_response(request)
+        fin = time.perf_counter()
+
+        # process_view no corre si no hay ruta; sin render (no es TemplateResponse) todo es vista
+        inicio_vista = medicion['vista'] or inicio
+        inicio_render = medicion['render'] or fin
+        total_ms = (fin - inicio) * 1000
+        db_ms = registro.segundos * 1000
+        vista_ms = (inicio_render - inicio_vista) * 1000
+        render_ms = ((medicion['fin_render'] or inicio_render) - inicio_render) * 1000
+
+        vista = nombre_vista(request)
+        endpoint = f"{request.method} {vista}"
+        estadisticas.observar(endpoint, total_ms, db_ms, vista_ms, render_ms, registro.cantidad)
+        metricas.solicitud_segundos.labels(
+            metodo=request.method, vista=vista, estado=f"{response.status_code // 100}xx"
+        ).observe(total_ms / 1000)
+        metricas.solicitud_consultas.labels(metodo=request.method, vista=vista).observe(registro.cantidad)
+
+        if es_admin(getattr(request, 'user', None)):
+            response['Server-Timing'] = ", ".join([
+                f'db;dur={db_ms:.1f};desc="{registro.cantidad} consultas"',
+                f'vista;dur={vista_ms:.1f}',
+                f'render;dur={render_ms:.1f}',
+                f'total;dur={total_ms:.1f}',
+            ])
+
+        if total_ms >= settings.MONITOREO_LENTO_MS or registro.cantidad >= settings.MONITOREO_MAX_CONSULTAS:
+            estadisticas.agregar_muestra({
+                'endpoint': endpoint,
+                'ruta': request.get_full_path(),
+                'status': response.status_code,
+                'total_ms': round(total_ms, 1),
+                'db_ms': round(db_ms, 1),
+                'consultas': registro.cantidad,
+                'sql': [sql[:300] for _, sql in sorted(registro.consultas, reverse=True)[:10]],
+            })
+            logger.warning(
+                "Solicitud lenta %s %s: %.0f ms total, %d consultas en %.0f ms\n%s",
+                endpoint, request.get_full_path(), total_ms, registro.cantidad, db_ms, registro.resumen_sql(),
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_medicion'):
+            request._medicion['vista'] = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        # Las Response de DRF se renderizan (JSON) después de este hook
+        if hasattr(request, '_medicion'):
+            medicion = request._medicion
+            medicion['render'] = time.perf_counter()
+            response.add_post_render_callback(lambda r: medicion.update(fin_render=time.perf_counter()))
+        return response
+
+
+
+class PerfiladoMiddleware:
+    """
+    Con el header X-Perfilar o ?perfilar=1 de un admin, corre la solicitud
+    bajo el muestreador de perfilado.py, guarda el perfil (folded, para
+    flamegraph) y devuelve su nombre en el header X-Perfil. Sin esa marca
+    no hace nada más que revisarla. Va después de AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if 'HTTP_X_PERFILAR' not in request.META and 'perfilar' not in request.GET:
+            return self.get_response(request)
+        if not es_admin(self._usuario(request)):
+            return self.get_response(request)
+
+        inicio = time.perf_counter()
+        response, pilas = perfilado.perfilar(self.get_response, request)
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        nombre = perfilado.guardar(pilas, f"{request.method}_{nombre_vista(request)}", duracion_ms)
+        response['X-Perfil'] = nombre
+        logger.info("Perfil de %s guardado en %s", request.get_full_path(), nombre)
+        return response
+
+    def _usuario(self, request):
+        # Con JWT el usuario recién se conoce dentro de la vista de DRF
+        usuario = getattr(request, 'user', None)
+        if usuario is not None and usuario.is_authenticated:
+            return usuario
+        try:
+            autenticado = JWTAutenticacionCacheada().authenticate(request)
+        except APIException:
+            return None
+        return autenticado[0] if autenticado else None
@@ -0,0 +1,118 @@
+# Perfilado bajo demanda de una solicitud (solo admins). Un hilo toma
+# muestras de la pila del hilo que atiende el request cada pocos ms y las
+# cuenta en formato "folded" (una línea "f1;f2;f3 N" por pila), el que leen
+# flamegraph.pl, speedscope e inferno. Los perfiles quedan en PERFILADO_DIR
+# y solo se guardan los últimos PERFILADO_MAX_ARCHIVOS.
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+
+NOMBRE_VALIDO = re.compile(r'^[\w.-]+\.folded$')
+
+# Prefijos que se recortan de las rutas para que las pilas se lean mejor
+_PREFIJOS = sorted({
+    os.path.join(str(settings.BASE_DIR), ''),
+    *(os.path.join(ruta, '') for ruta in sys.path if ruta.endswith('-packages')),
+}, key=len, reverse=True)
+
+
+def _archivo_corto(ruta):
+    for prefijo in _PREFIJOS:
+        if ruta.startswith(prefijo):
+            return ruta[len(prefijo):]
+    return ruta
+
+
+class Muestreador(threading.Thread):
+    """Cuenta las pilas del hilo hilo_id cada intervalo segundos"""
+
+    def __init__(self, hilo_id, intervalo):
+        super().__init__(daemon=True, name='perfilado')
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_id)
+            if frame is None:
+                continue
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{codigo.co_name} ({_archivo_corto(codigo.co_filename)}:{codigo.co_firstlineno})")
+                frame = frame.f_back
+            # El formato folded va de la raíz a la hoja y usa ';' como separador
+            self.pilas[';'.join(reversed(pila))] += 1
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+
+def perfilar(funcion, *args):
+    """Corre funcion(*args) tomando muestras; devuelve (resultado, pilas)"""
+    muestreador = Muestreador(threading.get_ident(), settings.PERFILADO_INTERVALO_MS / 1000)
+    muestreador.start()
+    try:
+        resultado = funcion(*args)
+    finally:
+        muestreador.detener()
+    return resultado, muestreador.pilas
+
+
+def guardar(pilas, etiqueta, duracion_ms):
+    """Escribe el perfil en PERFILADO_DIR, aplica el límite de archivos y devuelve el nombre"""
+    os.makedirs(settings.PERFILADO_DIR, exist_ok=True)
+    marca = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    etiqueta = re.sub(r'[^\w.-]+', '_', etiqueta)
+    nombre = f"{marca}_{etiqueta}_{duracion_ms:.0f}ms.folded"
+    with open(os.path.join(settings.PERFILADO_DIR, nombre), 'w', encoding='utf-8') as archivo:
+        for pila, muestras in pilas.most_common():
+            archivo.write(f"{pila} {muestras}\n")
+    _recortar()
+    return nombre
+
+
+def _recortar():
+    # Varios workers pueden recortar a la vez: un archivo ya borrado no es error
+    for perfil in listar()[settings.PERFILADO_MAX_ARCHIVOS:]:
+        try:
+            os.remove(os.path.join(settings.PERFILADO_DIR, perfil['nombre']))
+        except FileNotFoundError:
+            pass
+
+
+def listar():
+    """Perfiles guardados, del más nuevo al más viejo"""
+    try:
+        entradas = [e for e in os.scandir(settings.PERFILADO_DIR) if NOMBRE_VALIDO.match(e.name)]
+    except FileNotFoundError:
+        return []
+    perfiles = []
+    for entrada in entradas:
+        try:
+            datos = entrada.stat()
+        except FileNotFoundError:
+            continue
+        perfiles.append({
+            'nombre': entrada.name,
+            'fecha': datetime.fromtimestamp(datos.st_mtime).isoformat(timespec='seconds'),
+            'bytes': datos.st_size,
+        })
+    perfiles.sort(key=lambda perfil: perfil['nombre'], reverse=True)
+    return perfiles
+
+
+def ruta_perfil(nombre):
+    """Ruta del perfil o None si el nombre no es válido o no existe"""
+    if not NOMBRE_VALIDO.match(nombre):
+        return None
+    ruta = os.path.join(settings.PERFILADO_DIR, nombre)
+    return ruta if os.path.isfile(ruta) else None
@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+
+from .medicion import registrar_consultas
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+@contextmanager
+def presupuesto_consultas(maximo, nombre='bloque'):
+    """
+    Falla si el bloque hace más de `maximo` consultas; el error trae el SQL.
+    Las pruebas de apps/*/tests.py lo usan con sus propios datos:
+
+        with presupuesto_consultas(3, 'carrito'):
+            cliente.get('/api/ventas/carrito/')
+    """
+    with registrar_consultas(max_sql=maximo + 20) as registro:
+        yield registro
+    if registro.cantidad > maximo:
+        raise PresupuestoExcedido(
+            f"{nombre}: {registro.cantidad} consultas (máximo {maximo})\n{registro.resumen_sql()}"
+        )
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('solicitudes/', views.metricas_solicitudes, name='monitoreo-solicitudes'),
+    path('perfiles/', views.perfiles, name='monitoreo-perfiles'),
+    path('perfiles/<str:nombre>/', views.descargar_perfil, name='monitoreo-perfil'),
+]
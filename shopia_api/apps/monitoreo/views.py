@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from . import perfilado
+from .medicion import estadisticas
+from .metricas import exportar
+from .middleware import es_admin
+
+
+class EsAdmin(permissions.BasePermission):
+    """Staff o usuarios con el rol admin"""
+
+    def has_permission(self, request, view):
+        return es_admin(request.user)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+def metricas_solicitudes(request):
+    """
+    Histogramas por endpoint y últimas solicitudes lentas de este proceso
+    (cada worker de gunicorn tiene los suyos). DELETE los reinicia.
+    """
+    if request.method == 'DELETE':
+        estadisticas.reiniciar()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(estadisticas.como_dict())
+
+
+def metricas_prometheus(request):
+    """
+    /metrics para Prometheus (todos los workers). Pide el header
+    Authorization: Bearer METRICAS_TOKEN; sin token configurado solo responde con DEBUG.
+    """
+    token = settings.METRICAS_TOKEN
+    if not token and not settings.DEBUG:
+        raise Http404
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    contenido, content_type = exportar()
+    return HttpResponse(contenido, content_type=content_type)
+
+
+@api_view(['GET'])
+@permission_classes([EsAdmin])
+def perfiles(request):
+    """Perfiles guardados con X-Perfilar / ?perfilar=1 (los más nuevos primero)"""
+    return Response({
+        'maximo': settings.PERFILADO_MAX_ARCHIVOS,
+        'perfiles': perfilado.listar(),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([EsAdmin])
+def descargar_perfil(request, nombre):
+    """El perfil en formato folded (flamegraph.pl, speedscope.app)"""
+    ruta = perfilado.ruta_perfil(nombre)
+    if ruta is None:
+        raise Http404
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=nombre, content_type='text/plain')
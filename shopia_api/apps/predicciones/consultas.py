@@ -0,0 +1,30 @@
+# Consultas de ventas de las predicciones (vistas y ml_service). El comando
+# verificar_planes revisa su EXPLAIN, por eso se arman solo desde aquí.
+from django.db.models import F, Sum
+
+from apps.ventas.models import DetalleVenta, Venta
+
+
+def ventas_pagadas_desde(desde):
+    """Ventas pagadas desde una fecha, de la más vieja a la más nueva"""
+    return Venta.objects.filter(fecha__gte=desde, estado='PAGADA').order_by('fecha')
+
+
+def detalles_pagados(desde, hasta=None, categoria=None):
+    """Detalles de ventas pagadas desde una fecha (y antes de hasta), opcionalmente de una categoría"""
+    detalles = DetalleVenta.objects.filter(venta__fecha__gte=desde, venta__estado='PAGADA')
+    if hasta is not None:
+        detalles = detalles.filter(venta__fecha__lt=hasta)
+    if categoria is not None:
+        detalles = detalles.filter(producto__categoria=categoria)
+    return detalles
+
+
+def ranking_productos(anio, mes):
+    """Top 10 de productos del mes por unidades vendidas"""
+    return (
+        DetalleVenta.objects.filter(venta__fecha__year=anio, venta__fecha__month=mes)
+        .values('producto')
+        .annotate(cantidad_total=Sum('cantidad'), monto_total=Sum(F('cantidad') * F('precio_unitario')))
+        .order_by('-cantidad_total')[:10]
+    )
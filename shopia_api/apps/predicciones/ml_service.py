@@ -29,6 +29,9 @@ from django.db.models import Sum, F
 from apps.ventas.models import DetalleVenta, Venta
 from apps.productos.models import Categoria, Producto
 from apps.predicciones.models import PrediccionVenta, CrecimientoCategoria, ProductoMasVendido
+from apps.predicciones import consultas
+from apps.monitoreo.metricas import medir_fase
+from config.bd_analitica import lecturas_analiticas
 
 
 class PrediccionService:
@@ -39,6 +42,8 @@ class PrediccionService:
         # Guardar el modelo en la raíz del proyecto
         self.modelo_path = str(project_root / 'modelo_prediccion_ventas.pkl')
     
+    @medir_fase('preparar_datos')
+    @lecturas_analiticas()
     def preparar_datos(self):
         """Extrae y prepara datos históricos de ventas"""
         print("Extrayendo datos históricos...")
@@ -69,6 +74,7 @@ class PrediccionService:
         print(f"Extraídos {len(df)} registros de ventas")
         return df
     
+    @medir_fase('entrenar_modelo')
     def entrenar_modelo(self):
         """Entrena el modelo de predicción"""
         print("\nEntrenando modelo de predicción...")
@@ -118,6 +124,7 @@ class PrediccionService:
             print("No existe modelo entrenado, entrenando nuevo...")
             return self.entrenar_modelo()
     
+    @medir_fase('generar_predicciones_mes_siguiente')
     def generar_predicciones_mes_siguiente(self):
         """Genera predicciones para el mes siguiente"""
         print("\nGenerando predicciones para el próximo mes...")
@@ -142,11 +149,7 @@ class PrediccionService:
         
         for categoria in categorias:
             # Calcular cantidad y monto promedio histórico
-            detalles = DetalleVenta.objects.filter(
-                producto__categoria=categoria,
-                venta__fecha__gte=fecha_inicio,
-                venta__estado='PAGADA'
-            )
+            detalles = consultas.detalles_pagados(fecha_inicio, categoria=categoria)
             
             cantidad_promedio = sum(d.cantidad for d in detalles)
             monto_total = sum(float(d.precio_unitario) * d.cantidad for d in detalles)
@@ -216,6 +219,7 @@ class PrediccionService:
         print(f"   Total estimado: Bs {monto_total:,.2f}")
         return True
     
+    @medir_fase('analizar_crecimiento_categorias')
     def analizar_crecimiento_categorias(self):
         """Analiza el crecimiento de cada categoría"""
         print("\nAnalizando crecimiento por categoría...")
@@ -281,6 +285,7 @@ class PrediccionService:
         print(f"{analisis_creados} análisis de crecimiento generados")
         return True
     
+    @medir_fase('generar_ranking_productos')
     def generar_ranking_productos(self):
         """Genera ranking de productos más vendidos"""
         print("\nGenerando ranking de productos...")
@@ -289,13 +294,7 @@ class PrediccionService:
         periodo = f"{hoy.year}-{hoy.month:02d}"
         
         # Top 10 productos del mes
-        productos_top = DetalleVenta.objects.filter(
-            venta__fecha__year=hoy.year,
-            venta__fecha__month=hoy.month
-        ).values('producto').annotate(
-            cantidad_total=Sum('cantidad'),
-            monto_total=Sum(F('cantidad') * F('precio_unitario'))
-        ).order_by('-cantidad_total')[:10]
+        productos_top = consultas.ranking_productos(hoy.year, hoy.month)
         
         if not productos_top:
             print("  No hay productos vendidos este mes")
@@ -330,6 +329,7 @@ class PrediccionService:
         print(f"Ranking generado con {ranking - 1} productos")
         return True
     
+    @medir_fase('total')
     def generar_todo(self):
         """Genera todas las predicciones y análisis"""
         print("=" * 60)
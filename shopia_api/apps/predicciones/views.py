@@ -14,7 +14,8 @@ from .serializers import (
     ProductoMasVendidoSerializer
 )
 from .ml_service import PrediccionService
-from apps.ventas.models import Venta, DetalleVenta
+from . import consultas
+from config.bd_analitica import vista_analitica
 
 
 class PrediccionVentaViewSet(viewsets.ReadOnlyModelViewSet):
@@ -254,6 +255,7 @@ class ProductoMasVendidoViewSet(viewsets.ReadOnlyModelViewSet):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@vista_analitica
 def ventas_historicas_y_predicciones(request):
     """
     Combina ventas reales + predicciones con análisis de crecimiento
@@ -267,10 +269,7 @@ def ventas_historicas_y_predicciones(request):
         
         # 1. VENTAS REALES AGRUPADAS POR MES
         ventas_mensuales = {}
-        ventas = Venta.objects.filter(
-            fecha__gte=fecha_inicio, 
-            estado='PAGADA'
-        ).order_by('fecha')
+        ventas = consultas.ventas_pagadas_desde(fecha_inicio)
         
         for venta in ventas:
             periodo = venta.fecha.strftime('%Y-%m')
@@ -358,6 +357,7 @@ def ventas_historicas_y_predicciones(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@vista_analitica
 def crecimiento_categorias(request):
     """
     Calcula el crecimiento REAL de cada categoría.
@@ -376,10 +376,7 @@ def crecimiento_categorias(request):
         
         # 1. VENTAS DEL MES ACTUAL
         ventas_actuales = {}
-        detalles_actuales = DetalleVenta.objects.filter(
-            venta__fecha__gte=primer_dia_actual,
-            venta__estado='PAGADA'
-        ).select_related('producto__categoria')
+        detalles_actuales = consultas.detalles_pagados(primer_dia_actual).select_related('producto__categoria')
         
         for detalle in detalles_actuales:
             cat_id = detalle.producto.categoria_id
@@ -392,10 +389,8 @@ def crecimiento_categorias(request):
         
         # 2. VENTAS DEL MES ANTERIOR
         ventas_anteriores = {}
-        detalles_anteriores = DetalleVenta.objects.filter(
-            venta__fecha__gte=primer_dia_anterior,
-            venta__fecha__lt=primer_dia_actual,
-            venta__estado='PAGADA'
+        detalles_anteriores = consultas.detalles_pagados(
+            primer_dia_anterior, primer_dia_actual
         ).select_related('producto__categoria')
         
         for detalle in detalles_anteriores:
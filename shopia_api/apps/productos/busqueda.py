@@ -0,0 +1,47 @@
+# Búsqueda de productos.
+# En PostgreSQL: texto completo sobre la columna vector_busqueda (la mantiene
+# un trigger, índice GIN) + similitud por trigramas (pg_trgm) en nombre y
+# marca para tolerar errores de tipeo; resultados ordenados por relevancia.
+# En otras BD (SQLite local) se usa el icontains de siempre.
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .models import Producto
+
+CONFIG_TEXTO = 'spanish'
+
+
+def buscar_productos(texto, queryset=None):
+    """Filtra (y ordena por relevancia en PostgreSQL) los productos que coinciden con `texto`"""
+    if queryset is None:
+        queryset = Producto.objects.all()
+    texto = (texto or '').strip()
+    if not texto:
+        return queryset
+
+    if connection.vendor != 'postgresql':
+        return queryset.filter(
+            Q(nombre__icontains=texto)
+            | Q(marca__icontains=texto)
+            | Q(descripcion__icontains=texto)
+        )
+
+    consulta = SearchQuery(texto, config=CONFIG_TEXTO, search_type='websearch')
+    return (
+        queryset
+        .filter(
+            Q(vector_busqueda=consulta)
+            | Q(nombre__trigram_similar=texto)
+            | Q(marca__trigram_similar=texto)
+        )
+        .annotate(
+            rango=SearchRank(F('vector_busqueda'), consulta),
+            similitud=Greatest(
+                TrigramSimilarity('nombre', texto),
+                TrigramSimilarity('marca', texto),
+            ),
+        )
+        .order_by('-rango', '-similitud', '-fecha_creacion')
+    )
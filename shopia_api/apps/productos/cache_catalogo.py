@@ -0,0 +1,92 @@
+# Snapshot del catálogo público ya serializado (bytes JSON) en la caché.
+# Cada cambio de Producto/Categoria/ImagenProducto sube la 'versión' al
+# confirmarse la transacción; el snapshot se regenera recién en la siguiente
+# petición (varios cambios seguidos = una sola regeneración) y solo una
+# petición a la vez lo reconstruye.
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+CLAVE_VERSION = 'catalogo:version'
+CLAVE_MODIFICADO = 'catalogo:modificado'
+
+
+def _version():
+    return cache.get_or_set(CLAVE_VERSION, 1, timeout=None)
+
+
+def invalidar():
+    """Marca el catálogo como modificado cuando se confirme la transacción"""
+    transaction.on_commit(_subir_version)
+
+
+def _subir_version():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 2, timeout=None)
+    cache.set(CLAVE_MODIFICADO, time.time(), timeout=None)
+
+
+def obtener_datos(nombre, construir):
+    """
+    Devuelve el valor `nombre` de la versión actual del catálogo, llamando a
+    `construir()` solo si no está en caché.
+    """
+    clave = f"catalogo:{_version()}:{nombre}"
+    valor = cache.get(clave)
+    if valor is not None:
+        return valor
+
+    # Evita que muchas peticiones reconstruyan a la vez: las demás esperan un poco
+    clave_lock = f"{clave}:lock"
+    es_dueno = cache.add(clave_lock, 1, settings.CATALOGO_LOCK_SEGUNDOS)
+    if not es_dueno:
+        for _ in range(20):
+            time.sleep(0.05)
+            valor = cache.get(clave)
+            if valor is not None:
+                return valor
+
+    try:
+        valor = construir()
+        cache.set(clave, valor, settings.CATALOGO_CACHE_TTL)
+    finally:
+        # Quien se cansó de esperar reconstruye igual, pero el lock es del otro
+        if es_dueno:
+            cache.delete(clave_lock)
+    return valor
+
+
+def obtener_snapshot(nombre, construir):
+    """
+    Devuelve {'cuerpo', 'etag', 'modificado'} del snapshot `nombre`.
+    `construir` es una función que arma los datos (sin serializar).
+    """
+    def renderizar():
+        cuerpo = JSONRenderer().render(construir())
+        return {
+            'cuerpo': cuerpo,
+            'etag': f'"{hashlib.md5(cuerpo).hexdigest()}"',
+            'modificado': cache.get(CLAVE_MODIFICADO) or time.time(),
+        }
+
+    return obtener_datos(nombre, renderizar)
+
+
+def respuesta_snapshot(request, snapshot):
+    """Arma la respuesta con ETag/Last-Modified; 304 si el cliente ya lo tiene"""
+    if snapshot['etag'] in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(snapshot['cuerpo'], content_type='application/json')
+    response['ETag'] = snapshot['etag']
+    response['Last-Modified'] = http_date(snapshot['modificado'])
+    response['Cache-Control'] = 'public, no-cache'
+    return response
@@ -1,14 +1,24 @@
 
 from django_filters import rest_framework as filters
 from .models import Producto
+from .busqueda import buscar_productos
 
 class ProductoFilter(filters.FilterSet):
     precio__gte = filters.NumberFilter(field_name='precio', lookup_expr='gte')
     precio__lte = filters.NumberFilter(field_name='precio', lookup_expr='lte')
+    # Lo que paga el cliente (precio con descuento, ver precios.py)
+    precio_final__gte = filters.NumberFilter(field_name='precio_final', lookup_expr='gte')
+    precio_final__lte = filters.NumberFilter(field_name='precio_final', lookup_expr='lte')
+    search = filters.CharFilter(method='filtrar_busqueda')
 
     class Meta:
         model = Producto
         fields = {
             'categoria': ['exact'],
+            'marca': ['exact'],
+            'estado': ['exact'],
             'precio': ['gte', 'lte'], #permite filtrar por un rango de precios
         }
+
+    def filtrar_busqueda(self, queryset, name, value):
+        return buscar_productos(value, queryset)
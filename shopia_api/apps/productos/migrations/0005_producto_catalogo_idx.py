@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0004_producto_estado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('estado', True)), fields=['categoria', '-fecha_creacion', '-id'], name='producto_catalogo_idx'),
+        ),
+    ]
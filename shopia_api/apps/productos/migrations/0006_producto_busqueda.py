@@ -0,0 +1,74 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:31
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Solo PostgreSQL: extensión pg_trgm, trigger que mantiene vector_busqueda,
+# índices GIN (texto completo y trigramas) y carga inicial del vector.
+# Los índices no van en Meta.indexes porque no existen en SQLite.
+SQL_CREAR = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE OR REPLACE FUNCTION producto_vector_busqueda() RETURNS trigger AS $$
+    BEGIN
+        NEW.vector_busqueda :=
+            setweight(to_tsvector('spanish', coalesce(NEW.nombre, '')), 'A') ||
+            setweight(to_tsvector('spanish', coalesce(NEW.marca, '')), 'B') ||
+            setweight(to_tsvector('spanish', coalesce(NEW.descripcion, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER producto_vector_busqueda_trg
+    BEFORE INSERT OR UPDATE OF nombre, marca, descripcion ON productos_producto
+    FOR EACH ROW EXECUTE FUNCTION producto_vector_busqueda()
+    """,
+    """
+    UPDATE productos_producto SET vector_busqueda =
+        setweight(to_tsvector('spanish', coalesce(nombre, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(marca, '')), 'B') ||
+        setweight(to_tsvector('spanish', coalesce(descripcion, '')), 'C')
+    """,
+    "CREATE INDEX IF NOT EXISTS producto_vector_busqueda_idx ON productos_producto USING gin (vector_busqueda)",
+    "CREATE INDEX IF NOT EXISTS producto_nombre_trgm_idx ON productos_producto USING gin (nombre gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS producto_marca_trgm_idx ON productos_producto USING gin (marca gin_trgm_ops)",
+]
+
+SQL_BORRAR = [
+    "DROP INDEX IF EXISTS producto_marca_trgm_idx",
+    "DROP INDEX IF EXISTS producto_nombre_trgm_idx",
+    "DROP INDEX IF EXISTS producto_vector_busqueda_idx",
+    "DROP TRIGGER IF EXISTS producto_vector_busqueda_trg ON productos_producto",
+    "DROP FUNCTION IF EXISTS producto_vector_busqueda()",
+]
+
+
+def crear_busqueda_pg(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SQL_CREAR:
+        schema_editor.execute(sql)
+
+
+def borrar_busqueda_pg(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SQL_BORRAR:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0005_producto_catalogo_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='vector_busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(crear_busqueda_pg, borrar_busqueda_pg),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0006_producto_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['estado', 'categoria', 'precio'], name='producto_filtro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['marca'], name='producto_marca_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+from apps.productos.precios import expresion_precio_final
+
+
+def calcular_precio_final(apps, schema_editor):
+    # Carga inicial en un solo UPDATE (misma regla que Producto.save)
+    Producto = apps.get_model('productos', 'Producto')
+    Producto.objects.update(precio_final=expresion_precio_final())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0007_producto_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='producto',
+            name='producto_filtro_idx',
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='precio_final',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Precio con el descuento aplicado', max_digits=10),
+        ),
+        migrations.RunPython(calcular_precio_final, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='producto',
+            name='descuento',
+            field=models.FloatField(default=0.0, help_text='Descuento aplicado al producto (fracción: 0.15 = 15 %)'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['estado', 'categoria', 'precio_final'], name='producto_filtro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['precio_final'], name='producto_precio_final_idx'),
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+
+from .precios import calcular_precio_final
 
 # Create your models here.
 class Categoria(models.Model):
@@ -37,17 +40,40 @@ class Producto(models.Model):
     url_imagen_principal = models.URLField(max_length=500, blank=True, null=True, help_text="URL de la imagen principal del producto")
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
-    descuento = models.FloatField(default=0.0, help_text="Descuento aplicado al producto")
+    descuento = models.FloatField(default=0.0, help_text="Descuento aplicado al producto (fracción: 0.15 = 15 %)")
+    # Precio con descuento; se calcula en save() y en precios.recalcular_precios
+    precio_final = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False, help_text="Precio con el descuento aplicado")
+    # Lo mantiene un trigger en PostgreSQL (nombre, marca, descripcion); ver busqueda.py
+    vector_busqueda = SearchVectorField(null=True, editable=False)
 
 
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Top-N por categoría del catálogo (solo productos activos)
+            models.Index(
+                fields=['categoria', '-fecha_creacion', '-id'],
+                condition=models.Q(estado=True),
+                name='producto_catalogo_idx',
+            ),
+            # Filtros y facetas (categoría / rango de precio final, marca)
+            models.Index(fields=['estado', 'categoria', 'precio_final'], name='producto_filtro_idx'),
+            models.Index(fields=['precio_final'], name='producto_precio_final_idx'),
+            models.Index(fields=['marca'], name='producto_marca_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        self.precio_final = calcular_precio_final(self.precio, self.descuento)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'precio', 'descuento'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'precio_final'}
+        super().save(*args, **kwargs)
+
 #modelo para las imagenes de un Producto
 class ImagenProducto(models.Model):
     """
@@ -0,0 +1,47 @@
+# Precio final (lo que paga el cliente) de un producto.
+# Regla única: descuento es una fracción (0.15 = 15 %, así lo guarda el panel),
+# se limita a [0, 1] y se redondea a 4 decimales; el precio final se redondea
+# a 2 decimales. Se guarda en Producto.precio_final (indexado) para filtrar y
+# contar facetas sin calcularlo por fila.
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Cast, Greatest, Least, Round
+
+from . import cache_catalogo
+
+CENTAVOS = Decimal('0.01')
+PRECISION_DESCUENTO = Decimal('0.0001')
+
+
+def calcular_precio_final(precio, descuento):
+    """Precio con el descuento aplicado (mismo resultado que expresion_precio_final)"""
+    precio = Decimal(str(precio or 0))
+    descuento = Decimal(str(min(max(descuento or 0, 0), 1))).quantize(PRECISION_DESCUENTO, ROUND_HALF_UP)
+    return (precio * (1 - descuento)).quantize(CENTAVOS, ROUND_HALF_UP)
+
+
+def expresion_precio_final():
+    """La misma regla como expresión SQL, para recalcular en un solo UPDATE"""
+    # Round explícito: en SQLite el Cast a decimal no redondea a 4 decimales
+    descuento = Cast(
+        Round(Least(Greatest(F('descuento'), Value(0.0)), Value(1.0)), 4),
+        DecimalField(max_digits=5, decimal_places=4),
+    )
+    return Cast(
+        Round(F('precio') * (Value(Decimal('1')) - descuento), 2),
+        DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def recalcular_precios(queryset):
+    """
+    Recalcula precio_final de todo el queryset en un UPDATE. Usar después de
+    cambios masivos (queryset.update / bulk_create / bulk_update) de precio o
+    descuento, que no pasan por Producto.save().
+    """
+    actualizados = queryset.update(precio_final=expresion_precio_final())
+    if actualizados:
+        # update() no dispara señales: el catálogo en caché se invalida aquí
+        cache_catalogo.invalidar()
+    return actualizados
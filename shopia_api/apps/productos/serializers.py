@@ -26,9 +26,16 @@ class ProductoSerializer(serializers.ModelSerializer):
         fields = [
             'id','marca', 'nombre', 'descripcion', 'precio', 'stock','estado',
             'url_imagen_principal', 'categoria', 'categoria_id',
-            'imagenes', 'descuento','fecha_creacion', 'fecha_actualizacion'
+            'imagenes', 'descuento', 'precio_final', 'fecha_creacion', 'fecha_actualizacion'
         ]
-        read_only_fields = ['fecha_creacion', 'fecha_actualizacion']
+        read_only_fields = ['precio_final', 'fecha_creacion', 'fecha_actualizacion']
+
+    def __init__(self, *args, campos=None, **kwargs):
+        # campos: subconjunto de fields a devolver (?fields= en ProductoViewSet)
+        super().__init__(*args, **kwargs)
+        if campos:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
 
     def create(self, validated_data):
         imagenes_data = validated_data.pop('imagenes', [])
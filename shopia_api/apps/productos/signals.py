@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Categoria, Producto, ImagenProducto
+from . import cache_catalogo
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=ImagenProducto)
+@receiver(post_delete, sender=ImagenProducto)
+def invalidar_catalogo(sender, **kwargs):
+    cache_catalogo.invalidar()
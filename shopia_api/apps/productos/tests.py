@@ -1,3 +1,241 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import spacy
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from spacy.matcher import Matcher
+
+from apps.monitoreo.presupuesto import presupuesto_consultas
+from apps.reportes import nlp_service
+from . import cache_catalogo
+from .busqueda import buscar_productos
+from .models import Categoria, ImagenProducto, Producto
+from .precios import calcular_precio_final, recalcular_precios
+
+# (url, máximo de consultas con la caché caliente). Si un cambio mete un
+# N+1 en alguno de estos endpoints la prueba falla mostrando el SQL.
+PRESUPUESTOS = [
+    ('/api/productos/?page_size=24', 3),
+    ('/api/productos/facetas/', 3),
+    ('/api/catalogo/', 1),
+    ('/api/categorias/', 1),
+]
+
+
+class PresupuestoConsultasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for c in range(3):
+            categoria = Categoria.objects.create(nombre=f'Categoría {c}')
+            for i in range(10):
+                producto = Producto.objects.create(
+                    nombre=f'Producto {c}-{i}', marca=f'Marca {i % 4}', descripcion='-',
+                    precio=Decimal('10.00') * (i + 1), descuento=0.1 * (i % 3), stock=5, categoria=categoria,
+                )
+                for orden in range(2):
+                    ImagenProducto.objects.create(producto=producto, url=f'https://img.test/{producto.id}/{orden}.jpg')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_presupuestos(self):
+        cliente = APIClient()
+        for url, maximo in PRESUPUESTOS:
+            with self.subTest(url=url):
+                cliente.get(url)  # calentar cachés
+                with presupuesto_consultas(maximo, url):
+                    respuesta = cliente.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+
+
+class CacheCatalogoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clave = f"catalogo:{cache_catalogo._version()}:prueba"
+
+    def test_el_dueno_del_lock_lo_suelta(self):
+        self.assertEqual(cache_catalogo.obtener_datos('prueba', lambda: [1]), [1])
+        self.assertIsNone(cache.get(f"{self.clave}:lock"))
+        self.assertEqual(cache.get(self.clave), [1])
+
+    @mock.patch('apps.productos.cache_catalogo.time.sleep')
+    def test_quien_se_cansa_de_esperar_no_borra_el_lock_ajeno(self, _sleep):
+        cache.add(f"{self.clave}:lock", 1, 60)  # otra petición está reconstruyendo
+        construir = mock.Mock(return_value=[2])
+
+        self.assertEqual(cache_catalogo.obtener_datos('prueba', construir), [2])
+        construir.assert_called_once()
+        self.assertEqual(cache.get(f"{self.clave}:lock"), 1)
+
+
+class CatalogoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        inicio = timezone.now() - timedelta(days=30)
+        cls.esperados = {}
+        for c, cantidad in enumerate([22, 2]):
+            categoria = Categoria.objects.create(nombre=f'Categoría {c}')
+            productos = []
+            for i in range(cantidad):
+                producto = Producto.objects.create(
+                    nombre=f'Producto {c}-{i}', descripcion='-', precio=Decimal('10.00'), stock=1, categoria=categoria
+                )
+                # Fechas desordenadas respecto al id: el orden sale de fecha_creacion
+                fecha = inicio + timedelta(hours=(i * 7) % cantidad)
+                Producto.objects.filter(id=producto.id).update(fecha_creacion=fecha)
+                productos.append((fecha, producto.id))
+            # Inactivo y más nuevo que todos: no aparece
+            Producto.objects.create(
+                nombre=f'Oculto {c}', descripcion='-', precio=Decimal('10.00'), stock=1, categoria=categoria, estado=False
+            )
+            cls.esperados[categoria.id] = [pid for _, pid in sorted(productos, reverse=True)]
+        cls.vacia = Categoria.objects.create(nombre='Sin productos')
+
+    def setUp(self):
+        cache.clear()
+
+    def catalogo(self, n=None):
+        respuesta = APIClient().get('/api/catalogo/', {} if n is None else {'n': n})
+        self.assertEqual(respuesta.status_code, 200)
+        return {categoria['id']: [p['id'] for p in categoria['productos']] for categoria in respuesta.json()}
+
+    def test_primeros_n_por_categoria_del_mas_nuevo_al_mas_viejo(self):
+        catalogo = self.catalogo(3)
+        for categoria_id, esperados in self.esperados.items():
+            self.assertEqual(catalogo[categoria_id], esperados[:3])
+        self.assertEqual(catalogo[self.vacia.id], [])
+
+    def test_n_por_defecto(self):
+        catalogo = self.catalogo()
+        self.assertEqual([len(ids) for ids in catalogo.values()], [5, 2, 0])
+
+    def test_n_se_limita_entre_1_y_20(self):
+        for n, tope in [(0, 1), (-4, 1), (100, 20), ('abc', 5)]:
+            with self.subTest(n=n):
+                catalogo = self.catalogo(n)
+                self.assertEqual(
+                    {cid: ids for cid, ids in catalogo.items() if ids},
+                    {cid: esperados[:tope] for cid, esperados in self.esperados.items()},
+                )
+
+
+def pipeline_de_voz():
+    """
+    (nlp, matcher) para procesar_comando_voz. Sin es_core_news_sm instalado
+    se usa un pipeline vacío en español con la intención BUSCAR_TEXTO.
+    """
+    if nlp_service.nlp and nlp_service.matcher:
+        return nlp_service.nlp, nlp_service.matcher
+    nlp = spacy.blank('es')
+    matcher = Matcher(nlp.vocab)
+    matcher.add('BUSCAR_TEXTO', [[{'LOWER': {'IN': ['buscar', 'encontrar']}}, {'IS_ASCII': True, 'OP': '+'}]])
+    return nlp, matcher
+
+
+class BusquedaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Periféricos')
+        datos = [
+            ('Teclado Mecánico', 'Redragon', '-', True),
+            ('Combo oficina', 'Genius', 'Incluye TECLADO y mouse', True),
+            ('Kit gamer', 'Teclados SA', '-', True),
+            ('Monitor 24', 'LG', 'Full HD', True),
+            ('Teclado viejo', 'Genius', '-', False),
+        ]
+        cls.productos = {
+            nombre: Producto.objects.create(
+                nombre=nombre, marca=marca, descripcion=descripcion, estado=estado,
+                precio=Decimal('50.00'), stock=1, categoria=categoria,
+            )
+            for nombre, marca, descripcion, estado in datos
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def ids_de_la_api(self, **params):
+        respuesta = APIClient().get('/api/productos/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return {producto['id'] for producto in respuesta.json()}
+
+    def test_busca_en_nombre_marca_y_descripcion_sin_importar_mayusculas(self):
+        esperados = {self.productos[n].id for n in ('Teclado Mecánico', 'Combo oficina', 'Kit gamer', 'Teclado viejo')}
+        self.assertEqual(set(buscar_productos('teclado').values_list('id', flat=True)), esperados)
+        self.assertEqual(self.ids_de_la_api(search='teclado'), esperados)
+        self.assertEqual(buscar_productos('  ').count(), Producto.objects.count())
+
+    def test_comando_de_voz_encuentra_lo_mismo_que_search(self):
+        nlp, matcher = pipeline_de_voz()
+        with mock.patch.object(nlp_service, 'nlp', nlp), mock.patch.object(nlp_service, 'matcher', matcher):
+            resultado = nlp_service.procesar_comando_voz('Buscar teclado')
+
+        self.assertEqual(resultado['url'], '/catalogo/buscar')
+        self.assertEqual(resultado['params'], {'search': 'teclado'})
+        # El catálogo pide ?search= con los productos activos
+        ids = self.ids_de_la_api(search=resultado['params']['search'], estado=True)
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(resultado['total_resultados'], len(ids))
+
+
+class PrecioFinalTests(TestCase):
+    # (precio, descuento): fuera de rango, redondeos y descuentos con más de 4 decimales
+    CASOS = [
+        ('100.00', 0.15), ('100.00', -0.2), ('100.00', 1.5), ('100.00', 1.0), ('100.00', 0.0),
+        ('19.99', 0.333333), ('10.05', 0.5), ('0.99', 0.125), ('1234.56', 0.07), ('59.90', 0.12345),
+        ('59.90', 0.12355), ('33.33', 0.00005),
+    ]
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre='Electrónica')
+
+    def crear_sin_save(self, casos):
+        # bulk_create no pasa por save(): precio_final queda en 0 hasta recalcular
+        return Producto.objects.bulk_create(
+            Producto(nombre=f'Producto {i}', descripcion='-', precio=Decimal(precio), descuento=descuento,
+                     stock=1, categoria=self.categoria)
+            for i, (precio, descuento) in enumerate(casos)
+        )
+
+    def test_limites_del_descuento(self):
+        self.assertEqual(calcular_precio_final(Decimal('100.00'), -0.2), Decimal('100.00'))
+        self.assertEqual(calcular_precio_final(Decimal('100.00'), 1.5), Decimal('0.00'))
+        self.assertEqual(calcular_precio_final(Decimal('100.00'), 0.15), Decimal('85.00'))
+        self.assertEqual(calcular_precio_final(None, None), Decimal('0.00'))
+
+    def test_python_y_sql_dan_el_mismo_precio(self):
+        self.crear_sin_save(self.CASOS)
+        recalcular_precios(Producto.objects.all())
+        for producto in Producto.objects.order_by('id'):
+            with self.subTest(precio=producto.precio, descuento=producto.descuento):
+                self.assertEqual(producto.precio_final, calcular_precio_final(producto.precio, producto.descuento))
+
+    def test_save_con_update_fields_guarda_el_precio_final(self):
+        producto = Producto.objects.create(
+            nombre='Monitor', descripcion='-', precio=Decimal('200.00'), descuento=0.1, stock=1, categoria=self.categoria
+        )
+        producto.precio = Decimal('300.00')
+        producto.save(update_fields=['precio'])
+        producto.refresh_from_db()
+        self.assertEqual(producto.precio_final, Decimal('270.00'))
+
+        producto.descuento = 0.5
+        producto.save(update_fields=['descuento'])
+        producto.refresh_from_db()
+        self.assertEqual(producto.precio_final, Decimal('150.00'))
 
-# Create your tests here.
+    def test_recalcular_precios_es_un_solo_update(self):
+        productos = self.crear_sin_save(self.CASOS)
+        fuera = productos[0]
+        with CaptureQueriesContext(connection) as consultas:
+            actualizados = recalcular_precios(Producto.objects.exclude(id=fuera.id))
+        self.assertEqual(actualizados, len(productos) - 1)
+        self.assertEqual([c['sql'].split()[0] for c in consultas.captured_queries], ['UPDATE'])
+        # Lo que queda fuera del queryset no se toca
+        self.assertEqual(Producto.objects.get(id=fuera.id).precio_final, Decimal('0'))
@@ -1,3 +1,5 @@
+import hashlib
+
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -7,8 +9,11 @@ from .serializers import CategoriaSerializer, ProductoSerializer
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter
 from .filters import ProductoFilter
+from . import cache_catalogo
+from config.paginacion import CursorOpcional
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
 
 class CategoriaViewSet(viewsets.ModelViewSet):
     """
@@ -20,18 +25,54 @@ class CategoriaViewSet(viewsets.ModelViewSet):
     serializer_class = CategoriaSerializer
     permission_classes = [permissions.AllowAny] # Requiere que el usuario esté autenticado
 
+    def list(self, request, *args, **kwargs):
+        """Listado desde el snapshot en caché (con ETag / 304)"""
+        snapshot = cache_catalogo.obtener_snapshot(
+            'categorias',
+            lambda: self.get_serializer(self.filter_queryset(self.get_queryset()), many=True).data,
+        )
+        return cache_catalogo.respuesta_snapshot(request, snapshot)
+
+class ProductoPaginacion(CursorOpcional):
+    # Con paginación el orden es siempre por fecha (el keyset necesita un
+    # orden estable); sin paginar, ?search= mantiene el orden por relevancia.
+    ordering = ('-fecha_creacion', '-id')
+
+
 class ProductoViewSet(viewsets.ModelViewSet):
     """
     API endpoint que permite ver y editar productos.
+    En GET acepta ?fields=id,nombre,precio,... para devolver solo esos campos.
     """
     queryset = Producto.objects.all().order_by('-fecha_creacion')
     serializer_class = ProductoSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter]
-    filterset_fields = ['categoria']
-    search_fields = ['nombre', 'marca', 'descripcion']
-    filter_backends = [DjangoFilterBackend, SearchFilter]
-    filterset_class = ProductoFilter 
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProductoFilter  # ?search= usa busqueda.buscar_productos
+    pagination_class = ProductoPaginacion
+
+    def _campos_pedidos(self):
+        if self.request.method != 'GET':
+            return None
+        campos = self.request.query_params.get('fields')
+        if not campos:
+            return None
+        return {campo.strip() for campo in campos.split(',') if campo.strip()}
+
+    def get_queryset(self):
+        queryset = super().get_queryset().defer('vector_busqueda')
+        campos = self._campos_pedidos()
+        if campos is None or 'categoria' in campos:
+            queryset = queryset.select_related('categoria')
+        if campos is None or 'imagenes' in campos:
+            queryset = queryset.prefetch_related('imagenes')
+        if campos is not None and 'descripcion' not in campos:
+            queryset = queryset.defer('descripcion')
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('campos', self._campos_pedidos())
+        return super().get_serializer(*args, **kwargs)
     
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
@@ -51,6 +92,81 @@ class ProductoViewSet(viewsets.ModelViewSet):
                     print(f"Error al eliminar imagen {imagen.public_id}: {e}")
         
         return super().destroy(request, *args, **kwargs)
+
+    # Límites de los rangos de precio final de la faceta (el último queda abierto)
+    RANGOS_PRECIO = [100, 500, 1000, 5000]
+
+    @action(detail=False, methods=['get'])
+    def facetas(self, request):
+        """
+        Primeros ?limite= productos filtrados + conteos por categoría, marca y
+        rango de precio final. Cada faceta se cuenta con los demás filtros pero sin el
+        suyo, para poder mostrar las otras opciones. Los conteos se guardan en
+        caché hasta que cambie el catálogo.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            limite = max(1, min(int(request.query_params.get('limite', 24)), 100))
+        except ValueError:
+            limite = 24
+
+        params = request.query_params.copy()
+        params.pop('limite', None)
+        clave = hashlib.md5(params.urlencode().encode()).hexdigest()
+        facetas = cache_catalogo.obtener_datos(
+            f'facetas:{clave}', lambda: self._calcular_facetas(params, queryset)
+        )
+
+        return Response({
+            'total': facetas['total'],
+            'resultados': self.get_serializer(queryset[:limite], many=True).data,
+            'facetas': facetas['facetas'],
+        })
+
+    def _filtrar_sin(self, params, *nombres):
+        datos = params.copy()
+        for nombre in nombres:
+            datos.pop(nombre, None)
+        return ProductoFilter(datos, queryset=self.get_queryset(), request=self.request).qs.order_by()
+
+    def _calcular_facetas(self, params, queryset):
+        categorias = (
+            self._filtrar_sin(params, 'categoria')
+            .values('categoria_id', 'categoria__nombre')
+            .annotate(total=Count('id'))
+            .order_by('-total', 'categoria__nombre')
+        )
+        marcas = (
+            self._filtrar_sin(params, 'marca')
+            .values('marca')
+            .annotate(total=Count('id'))
+            .order_by('-total', 'marca')
+        )
+
+        # Un solo aggregate con un COUNT condicional por rango
+        limites = [0] + self.RANGOS_PRECIO + [None]
+        rangos = list(zip(limites[:-1], limites[1:]))
+        conteos = self._filtrar_sin(
+            params, 'precio__gte', 'precio__lte', 'precio_final__gte', 'precio_final__lte'
+        ).aggregate(**{
+            f'r{i}': Count('id', filter=Q(precio_final__gte=desde) & (Q(precio_final__lt=hasta) if hasta else Q()))
+            for i, (desde, hasta) in enumerate(rangos)
+        })
+
+        return {
+            'total': queryset.order_by().count(),
+            'facetas': {
+                'categorias': [
+                    {'id': c['categoria_id'], 'nombre': c['categoria__nombre'], 'total': c['total']}
+                    for c in categorias
+                ],
+                'marcas': [{'marca': m['marca'], 'total': m['total']} for m in marcas],
+                'precios': [
+                    {'desde': desde, 'hasta': hasta, 'total': conteos[f'r{i}']}
+                    for i, (desde, hasta) in enumerate(rangos)
+                ],
+            },
+        }
     
     @action(detail=False, methods=['post'])
     def delete_image(self, request):
@@ -66,27 +182,44 @@ class ProductoViewSet(viewsets.ModelViewSet):
 
 class CatalogoView(APIView):
     """
-    Devuelve las categorías con sus primeros 5 productos destacados, optimizado.
+    Devuelve las categorías con sus primeros N productos (?n=, por defecto 5).
+    La BD numera los productos por categoría (ROW_NUMBER) y solo devuelve
+    categorías×N filas; las imágenes se traen solo para esas.
+    La respuesta sale del snapshot en caché (ver cache_catalogo).
     """
+    N_POR_DEFECTO = 5
+    N_MAXIMO = 20
+
     def get(self, request):
+        try:
+            n = int(request.query_params.get('n', self.N_POR_DEFECTO))
+        except (TypeError, ValueError):
+            n = self.N_POR_DEFECTO
+        n = max(1, min(n, self.N_MAXIMO))
+
+        snapshot = cache_catalogo.obtener_snapshot(f'catalogo:{n}', lambda: self._construir(n))
+        return cache_catalogo.respuesta_snapshot(request, snapshot)
+
+    def _construir(self, n):
         categorias = Categoria.objects.all()
-        # Trae todos los productos con sus imágenes en una sola consulta
         productos_por_categoria = (
             Producto.objects
             .filter(estado=True)
+            .annotate(fila=Window(
+                RowNumber(),
+                partition_by=[F('categoria_id')],
+                order_by=[F('fecha_creacion').desc(), F('id').desc()],
+            ))
+            .filter(fila__lte=n)
             .select_related('categoria')
             .prefetch_related('imagenes')
-            .order_by('categoria_id', '-fecha_creacion')
+            .order_by('categoria_id', 'fila')
         )
 
-        # Agrupa los productos por categoría (solo los primeros 5 de cada una)
+        # Agrupa los productos por categoría (ya vienen limitados a N)
         productos_dict = {}
         for prod in productos_por_categoria:
-            cat_id = prod.categoria_id
-            if cat_id not in productos_dict:
-                productos_dict[cat_id] = []
-            if len(productos_dict[cat_id]) < 5:
-                productos_dict[cat_id].append(prod)
+            productos_dict.setdefault(prod.categoria_id, []).append(prod)
 
         data = []
         for cat in categorias:
@@ -97,4 +230,4 @@ class CatalogoView(APIView):
                 "descripcion": cat.descripcion,
                 "productos": ProductoSerializer(productos, many=True).data
             })
-        return Response(data)
+        return data
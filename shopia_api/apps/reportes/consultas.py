@@ -0,0 +1,73 @@
+# Consultas de los reportes. Las vistas y el comando verificar_planes las arman
+# desde aquí, así el EXPLAIN que revisa el comando es el de la consulta real.
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from apps.usuarios.models import Usuario
+from apps.ventas.models import DetalleVenta, Venta
+
+
+def rango_dias(campo, fecha_inicio, fecha_fin):
+    """
+    Equivale a campo__date__range=[fecha_inicio, fecha_fin] pero compara la
+    columna sin convertirla, así PostgreSQL puede usar el índice de la fecha.
+    """
+    desde = timezone.make_aware(datetime.combine(fecha_inicio, time.min))
+    hasta = timezone.make_aware(datetime.combine(fecha_fin + timedelta(days=1), time.min))
+    return {f'{campo}__gte': desde, f'{campo}__lt': hasta}
+
+
+def clientes(cliente_rol, fecha_inicio=None, fecha_fin=None):
+    """Clientes por nombre, opcionalmente registrados entre dos fechas"""
+    clientes_qs = Usuario.objects.filter(roles=cliente_rol).order_by('nombre')
+    if fecha_inicio and fecha_fin:
+        clientes_qs = clientes_qs.filter(**rango_dias('date_joined', fecha_inicio, fecha_fin))
+    return clientes_qs
+
+
+def ventas(fecha_inicio=None, fecha_fin=None):
+    """Ventas con su usuario, de la más nueva a la más vieja, opcionalmente entre dos fechas"""
+    ventas_qs = Venta.objects.select_related('usuario').order_by('-fecha')
+    if fecha_inicio and fecha_fin:
+        ventas_qs = ventas_qs.filter(**rango_dias('fecha', fecha_inicio, fecha_fin))
+    return ventas_qs
+
+
+def ventas_pagadas_por_dia(fecha_inicio, fecha_fin):
+    """Total vendido y número de ventas pagadas por día (fecha_fin incluida)"""
+    return (
+        Venta.objects.filter(estado='PAGADA', **rango_dias('fecha', fecha_inicio, fecha_fin))
+        .annotate(dia=TruncDate('fecha'))
+        .values('dia')
+        .annotate(total_vendido=Sum('monto_total'), num_ventas=Count('id'))
+        .order_by('dia')
+    )
+
+
+def clientes_por_mes(cliente_rol, fecha_inicio, fecha_fin):
+    """Clientes nuevos por mes de registro"""
+    return (
+        Usuario.objects.filter(roles=cliente_rol, **rango_dias('date_joined', fecha_inicio, fecha_fin))
+        .annotate(mes_registro=TruncMonth('date_joined'))
+        .values('mes_registro')
+        .annotate(total=Count('id'))
+        .order_by('mes_registro')
+    )
+
+
+def mas_vendidos(fecha_inicio=None, fecha_fin=None, categoria_id=None):
+    """Top 10 de productos por unidades vendidas"""
+    detalle_qs = DetalleVenta.objects.all()
+    if fecha_inicio and fecha_fin:
+        detalle_qs = detalle_qs.filter(**rango_dias('venta__fecha', fecha_inicio, fecha_fin))
+    if categoria_id:
+        detalle_qs = detalle_qs.filter(producto__categoria__id=categoria_id)
+    return (
+        detalle_qs
+        .values('producto__id', 'producto__nombre', 'producto__categoria__nombre')
+        .annotate(total_unidades=Sum('cantidad'))
+        .order_by('-total_unidades')[:10]
+    )
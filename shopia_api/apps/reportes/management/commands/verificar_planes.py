@@ -0,0 +1,136 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.predicciones import consultas as consultas_predicciones
+from apps.productos.filters import ProductoFilter
+from apps.productos.models import Categoria, Producto
+from apps.productos.views import ProductoPaginacion
+from apps.reportes import consultas as consultas_reportes
+from apps.usuarios.models import Rol
+from apps.ventas.models import DetalleVenta, Venta
+from apps.ventas.views import VentaPaginacion
+
+# Crecen con cada compra: además del índice esperado, ninguna consulta las
+# recorre enteras (productos y usuarios sí pueden ir enteros a un Hash Join)
+TABLAS_CALIENTES = {Venta._meta.db_table, DetalleVenta._meta.db_table}
+
+
+def consultas_calientes():
+    """
+    (nombre, queryset, índices que su plan tiene que usar). Los querysets salen
+    de los mismos helpers que usan las vistas y ml_service; 'a|b' acepta
+    cualquiera de los dos. ml_service.preparar_datos no está: lee todo el
+    histórico a propósito.
+    """
+    # El índice parcial de ventas pagadas solo le gana a venta_fecha_idx cuando
+    # las pagadas son minoría; cualquiera de los dos sirve para el rango
+    fecha_pagadas = 'venta_pagada_fecha_idx|venta_fecha_idx'
+    ahora = timezone.now()
+    hoy = ahora.date()
+    inicio_mes = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    rol_cliente = Rol.objects.filter(nombre='cliente').values_list('id', flat=True).first() or 0
+    categoria = Categoria.objects.values_list('id', flat=True).first() or 0
+    # Sin categorías ProductoFilter descarta el filtro; igual debe usar un índice de productos
+    filtro_productos = ProductoFilter(
+        {'estado': True, 'categoria': categoria, 'precio_final__lte': 500}, queryset=Producto.objects.all()
+    ).qs
+    pagina = 51  # page_size + 1, como CursorPagination
+
+    return [
+        ('reportes: ventas por rango (PDF/Excel)',
+         consultas_reportes.ventas(hoy - timedelta(days=30), hoy),
+         ['venta_fecha_idx']),
+        ('reportes: ventas pagadas por día',
+         consultas_reportes.ventas_pagadas_por_dia(hoy - timedelta(days=29), hoy),
+         [fecha_pagadas]),
+        ('reportes: clientes nuevos por mes',
+         consultas_reportes.clientes_por_mes(rol_cliente, hoy - timedelta(days=364), hoy),
+         ['usuario_date_joined_idx']),
+        ('reportes: más vendidos por rango',
+         consultas_reportes.mas_vendidos(hoy - timedelta(days=30), hoy),
+         ['venta_fecha_idx', 'detalle_venta_producto_idx']),
+        ('predicciones: ventas históricas',
+         consultas_predicciones.ventas_pagadas_desde(ahora - timedelta(days=180)),
+         [fecha_pagadas]),
+        ('predicciones: crecimiento por categoría',
+         consultas_predicciones.detalles_pagados(inicio_mes).select_related('producto__categoria'),
+         [fecha_pagadas, 'detalle_venta_producto_idx']),
+        ('ml_service: ventas recientes de una categoría',
+         consultas_predicciones.detalles_pagados(ahora - timedelta(days=90), categoria=categoria),
+         [fecha_pagadas]),  # los detalles pueden llegar por producto; los cubre el control de Seq Scan
+        ('ml_service: ranking de productos del mes',
+         consultas_predicciones.ranking_productos(hoy.year, hoy.month),
+         ['venta_fecha_idx', 'detalle_venta_producto_idx']),
+        ('ventas: listado (página)',
+         Venta.objects.order_by(*VentaPaginacion.ordering)[:pagina],
+         ['venta_fecha_idx']),
+        ('ventas: compras de un cliente (página)',
+         Venta.objects.filter(usuario_id=1).order_by(*VentaPaginacion.ordering)[:pagina],
+         ['venta_usuario_fecha_idx']),
+        ('productos: filtro por categoría y precio final (página)',
+         filtro_productos.order_by(*ProductoPaginacion.ordering)[:pagina],
+         ['producto_catalogo_idx|producto_filtro_idx']),
+    ]
+
+
+def _nodos(plan):
+    yield plan
+    for hijo in plan.get('Plans', []):
+        yield from _nodos(hijo)
+
+
+class Command(BaseCommand):
+    help = (
+        "Corre EXPLAIN de las consultas calientes en PostgreSQL y falla (código 1) "
+        "si el plan de alguna no usa los índices que le corresponden"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plan', action='store_true', help='Mostrar el plan completo de cada consulta')
+        parser.add_argument('--con-seqscan', action='store_true',
+                            help='No desactivar enable_seqscan (planes reales, requiere datos cargados)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("verificar_planes necesita PostgreSQL (los índices parciales e INCLUDE son de PostgreSQL)")
+
+        fallidas = []
+        for nombre, queryset, esperados in consultas_calientes():
+            with transaction.atomic():
+                if not options['con_seqscan']:
+                    # Con tablas chicas el planificador prefiere Seq Scan aunque
+                    # el índice sirva. Apagarlo no basta para aprobar: se exige
+                    # el índice de la consulta, no cualquiera (p. ej. la PK)
+                    with connection.cursor() as cursor:
+                        cursor.execute("SET LOCAL enable_seqscan = off")
+                plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+                texto = queryset.explain() if options['plan'] else None
+
+            nodos = list(_nodos(plan))
+            usados = {n['Index Name'] for n in nodos if 'Index Name' in n}
+            faltan = [e for e in esperados if not usados & set(e.split('|'))]
+            secuenciales = sorted({
+                n['Relation Name'] for n in nodos
+                if n['Node Type'] == 'Seq Scan' and n.get('Relation Name') in TABLAS_CALIENTES
+            })
+
+            if faltan or secuenciales:
+                fallidas.append(nombre)
+                problemas = [f"no usa {', '.join(faltan)}"] if faltan else []
+                if secuenciales:
+                    problemas.append(f"Seq Scan en {', '.join(secuenciales)}")
+                self.stdout.write(
+                    f"❌ {nombre}: {'; '.join(problemas)} (usa: {', '.join(sorted(usados)) or 'ningún índice'})"
+                )
+            else:
+                self.stdout.write(f"✅ {nombre}: {', '.join(sorted(usados))}")
+            if texto:
+                self.stdout.write(texto)
+
+        if fallidas:
+            raise CommandError(f"{len(fallidas)} consultas sin su índice: {'; '.join(fallidas)}")
+        self.stdout.write(self.style.SUCCESS("Todas las consultas calientes usan sus índices"))
@@ -6,6 +6,9 @@ from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import re
 
+from apps.productos.models import Producto
+from apps.productos.busqueda import buscar_productos
+
 
 nlp = None
 matcher = None
@@ -15,23 +18,23 @@ def _extraer_precios(texto: str) -> dict:
     
     match_rango = re.search(r"(?:entre|de)\s+(\d+)\s*(?:y|a)\s*(\d+)", texto, re.IGNORECASE)
     if match_rango:
-        params["precio__gte"] = int(match_rango.group(1)) 
-        params["precio__lte"] = int(match_rango.group(2)) 
+        params["precio_final__gte"] = int(match_rango.group(1)) 
+        params["precio_final__lte"] = int(match_rango.group(2)) 
         return params
 
     match_max = re.search(r"(?:menos de|hasta)\s+(\d+)", texto, re.IGNORECASE)
     if match_max:
-        params["precio__lte"] = int(match_max.group(1))
+        params["precio_final__lte"] = int(match_max.group(1))
         return params
 
     match_min = re.search(r"(?:más de|desde)\s+(\d+)", texto, re.IGNORECASE)
     if match_min:
-        params["precio__gte"] = int(match_min.group(1))
+        params["precio_final__gte"] = int(match_min.group(1))
         return params
     
     match_simple_max = re.search(r"(\d+)", texto, re.IGNORECASE)
     if match_simple_max:
-        params["precio__lte"] = int(match_simple_max.group(1))
+        params["precio_final__lte"] = int(match_simple_max.group(1))
         return params
         
     return params
@@ -305,12 +308,12 @@ def procesar_comando_voz(texto: str) -> dict:
 
     
     #busqueda en la tienda por categorias, o precios
-    if 'categoria' in params or 'precio__gte' in params or 'precio__lte' in params:
+    if 'categoria' in params or 'precio_final__gte' in params or 'precio_final__lte' in params:
         
         if intent_string == "BUSCAR_TEXTO":
              print("habla bien rwey.")
         
-        if 'categoria' in params and 'precio__gte' not in params and 'precio__lte' not in params:
+        if 'categoria' in params and 'precio_final__gte' not in params and 'precio_final__lte' not in params:
              print("Navegar a página de Categoría.")
              return {
                 "accion": "navegar",
@@ -330,10 +333,15 @@ def procesar_comando_voz(texto: str) -> dict:
         texto_busqueda = doc[start + 1 : end].text.strip()
         if texto_busqueda and "precio" not in texto_busqueda and " de " not in texto_busqueda:
             params["search"] = texto_busqueda 
+            # Mismo motor que /api/productos/?search= (texto completo + trigramas)
+            total_resultados = buscar_productos(
+                texto_busqueda, Producto.objects.filter(estado=True)
+            ).count()
             return {
                 "accion": "navegar",
                 "url": "/catalogo/buscar",
-                "params": params 
+                "params": params,
+                "total_resultados": total_resultados,
             }
             
     #si no entendio nada
@@ -1,3 +1,75 @@
-from django.test import TestCase
+from contextlib import contextmanager
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.usuarios.models import Rol, Usuario
+from apps.ventas.models import Venta
+from config.bd_analitica import ALIAS_ANALITICA
+
+URL_REPORTE = '/api/reportes/ventasjson/'
+
+
+@contextmanager
+def consultas_por_alias():
+    """SQL ejecutado en cada base mientras dura el bloque"""
+    ejecutadas = {alias: [] for alias in ('default', ALIAS_ANALITICA)}
+
+    def anotar(alias):
+        def envoltura(execute, sql, params, many, context):
+            ejecutadas[alias].append(sql)
+            return execute(sql, params, many, context)
+        return envoltura
+
+    with connections['default'].execute_wrapper(anotar('default')), \
+            connections[ALIAS_ANALITICA].execute_wrapper(anotar(ALIAS_ANALITICA)):
+        yield ejecutadas
+
+
+def lee_ventas(sqls):
+    return any(Venta._meta.db_table in sql for sql in sqls)
+
+
+# TransactionTestCase: en tests 'analytics' es un espejo de 'default' (ver
+# settings.PRUEBAS) con su propia conexión, que no ve lo que un TestCase deja
+# sin confirmar
+class LecturasAnaliticasTests(TransactionTestCase):
+    databases = {'default', ALIAS_ANALITICA}
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user('admin@shopia.test', password='clave-segura-123', is_staff=True)
+        self.usuario.roles.add(Rol.objects.get_or_create(nombre='admin')[0])
+        Venta.objects.create(usuario=self.usuario, monto_total=Decimal('100.00'), direccion='Calle 1', estado='PAGADA')
+        self.cliente = APIClient(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.usuario).access_token}')
+
+    def test_reporte_lee_de_la_replica(self):
+        with consultas_por_alias() as ejecutadas:
+            respuesta = self.cliente.get(URL_REPORTE)
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.data['datos_grafico_ventas']), 1)
+        self.assertTrue(lee_ventas(ejecutadas[ALIAS_ANALITICA]))
+        self.assertFalse(lee_ventas(ejecutadas['default']))
+
+    def test_despues_de_escribir_el_usuario_lee_de_la_primaria(self):
+        respuesta = self.cliente.post('/api/categorias/', {'nombre': 'Hogar'}, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+
+        with consultas_por_alias() as ejecutadas:
+            respuesta = self.cliente.get(URL_REPORTE)
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(lee_ventas(ejecutadas['default']))
+        self.assertFalse(ejecutadas[ALIAS_ANALITICA])
+
+        # Otro usuario sin escrituras recientes sigue en la réplica
+        otro = Usuario.objects.create_user('otro@shopia.test', password='clave-segura-123', is_staff=True)
+        otro.roles.add(Rol.objects.get(nombre='admin'))
+        with consultas_por_alias() as ejecutadas:
+            APIClient(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(otro).access_token}').get(URL_REPORTE)
+        self.assertTrue(lee_ventas(ejecutadas[ALIAS_ANALITICA]))
@@ -1,10 +1,9 @@
 import os
+import time
 import traceback
 from io import BytesIO
 from datetime import datetime, timedelta
 
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncDate, TruncMonth
 from django.http import HttpResponse
 from django.utils import timezone
 
@@ -13,6 +12,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from apps.monitoreo.metricas import medir_reporte, nlp_segundos
+from config.bd_analitica import vista_analitica
+from . import consultas
+
 
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
@@ -123,7 +126,7 @@ def _get_user_permission(request):
 
     is_super_admin = usuario_perfil.is_superuser
     
-    is_admin = usuario_perfil.roles.filter(nombre='admin').exists()
+    is_admin = usuario_perfil.tiene_rol('admin')
 
     if not (is_super_admin or is_admin):
         raise PermissionError("Acceso denegado. Se requiere rol de Administrador.")
@@ -134,6 +137,8 @@ def _get_user_permission(request):
 #listado de clientes en pdf
 @api_view(['GET']) 
 @permission_classes([IsAuthenticated])
+@medir_reporte('clientes', 'pdf')
+@vista_analitica
 def generar_reporte_clientes_pdf(request):
     
     try:
@@ -150,11 +155,9 @@ def generar_reporte_clientes_pdf(request):
     try:
         # Filtra usuarios que tengan el rol 'cliente'
         cliente_rol = Rol.objects.get(nombre='cliente')
-        clientes_qs = Usuario.objects.filter(roles=cliente_rol).order_by('nombre')
+        clientes_qs = consultas.clientes(cliente_rol, fecha_inicio, fecha_fin)
         
         if fecha_inicio and fecha_fin:
-            # Filtra por 'date_joined' (campo del modelo Usuario)
-            clientes_qs = clientes_qs.filter(date_joined__date__range=[fecha_inicio, fecha_fin])
             print(f"Filtrando PDF de Clientes por fechas: {fecha_inicio} a {fecha_fin}")
         
         clientes_filtrados = clientes_qs.all()
@@ -253,6 +256,8 @@ def generar_reporte_clientes_pdf(request):
 #listado de clientes en excel 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@medir_reporte('clientes', 'excel')
+@vista_analitica
 def generar_reporte_clientes_excel(request):
     """
     Genera un listado en Excel de todos los usuarios con el rol 'Cliente'.
@@ -266,10 +271,7 @@ def generar_reporte_clientes_excel(request):
 
     try:
         cliente_rol = Rol.objects.get(nombre='cliente')
-        clientes_qs = Usuario.objects.filter(roles=cliente_rol).order_by('nombre')
-        
-        if fecha_inicio and fecha_fin:
-            clientes_qs = clientes_qs.filter(date_joined=[fecha_inicio, fecha_fin])
+        clientes_qs = consultas.clientes(cliente_rol, fecha_inicio, fecha_fin)
         
         clientes_filtrados = clientes_qs.all()
         titulo_reporte = "Reporte de Clientes"
@@ -348,6 +350,8 @@ def generar_reporte_clientes_excel(request):
 #reportes de ventas en pdf
 @api_view(['GET']) 
 @permission_classes([IsAuthenticated])
+@medir_reporte('ventas', 'pdf')
+@vista_analitica
 def generar_reporte_ventas_pdf(request):
     """
     Genera un listado en PDF de todas las Ventas, filtrado por fecha,
@@ -366,10 +370,9 @@ def generar_reporte_ventas_pdf(request):
     filtros_aplicados = []
     
     try:
-        ventas_qs = Venta.objects.select_related('usuario').order_by('-fecha')
+        ventas_qs = consultas.ventas(fecha_inicio, fecha_fin)
         
         if fecha_inicio and fecha_fin:
-            ventas_qs = ventas_qs.filter(fecha__date__range=[fecha_inicio, fecha_fin])
             filtros_aplicados.append(f"Fechas: {fecha_inicio} a {fecha_fin}")
             print(f"[DEBUG] Filtrando PDF de Ventas por fechas: {fecha_inicio} a {fecha_fin}")
         
@@ -506,6 +509,8 @@ def generar_reporte_ventas_pdf(request):
 #reportes de ventas en excel 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@medir_reporte('ventas', 'excel')
+@vista_analitica
 def generar_reporte_ventas_excel(request):
     
     try:
@@ -521,10 +526,9 @@ def generar_reporte_ventas_excel(request):
     filtros_aplicados_str = ""
     
     try:
-        ventas_qs = Venta.objects.select_related('usuario').order_by('-fecha')
+        ventas_qs = consultas.ventas(fecha_inicio, fecha_fin)
         
         if fecha_inicio and fecha_fin:
-            ventas_qs = ventas_qs.filter(fecha__date__range=[fecha_inicio, fecha_fin])
             filtros_aplicados_str += f"de {fecha_inicio} a {fecha_fin} "
 
         filtro_producto_aplicado = False
@@ -628,6 +632,7 @@ def generar_reporte_ventas_excel(request):
 #reporte de ventas para hacer los graficos
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@vista_analitica
 def reporte_ventas_por_dia_json(request):
     """
     Devuelve un JSON con el total de ventas y número de ventas, agrupado por día.
@@ -659,21 +664,7 @@ def reporte_ventas_por_dia_json(request):
     # Consulta
     try:
         
-        ventas_qs_base = Venta.objects.filter(
-            fecha__range=[fecha_inicio_dt, fecha_fin_dt],
-            estado='PAGADA'
-        )
-
-        data_agrupada = ventas_qs_base.annotate(
-            dia=TruncDate('fecha')
-        ).values(
-            'dia'
-        ).annotate(
-            total_vendido=Sum('monto_total'), 
-            num_ventas=Count('id')      
-        ).order_by(
-            'dia'
-        )
+        data_agrupada = consultas.ventas_pagadas_por_dia(fecha_inicio_dt, fecha_fin_dt)
         
         datos_grafico = [
             {
@@ -699,6 +690,7 @@ def reporte_ventas_por_dia_json(request):
 #reporte de clientes para hacer graficos
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@vista_analitica
 def reporte_clientes_por_mes_json(request):
     """
     Devuelve un JSON con el total de nuevos clientes registrados, agrupado por mes.
@@ -726,19 +718,7 @@ def reporte_clientes_por_mes_json(request):
     # Consulta
     try:
         cliente_rol = Rol.objects.get(nombre='cliente')
-        clientes_qs = Usuario.objects.filter(
-            roles=cliente_rol,
-            date_joined__date__range=[fecha_inicio, fecha_fin]
-        )
-
-        
-        datos_grafico = (
-            clientes_qs
-            .annotate(mes_registro=TruncMonth('date_joined'))
-            .values('mes_registro')
-            .annotate(total=Count('id'))
-            .order_by('mes_registro')
-        )
+        datos_grafico = consultas.clientes_por_mes(cliente_rol, fecha_inicio, fecha_fin)
         
         datos_grafico_formato = [
             {"mes": item['mes_registro'].strftime('%Y-%m'), "total": item['total']}
@@ -771,7 +751,11 @@ def procesar_comando_voz_json(request):
         )
 
     try:
+        inicio = time.perf_counter()
         resultado_nlp = procesar_comando_voz(texto_comando)
+        nlp_segundos.labels(
+            accion=resultado_nlp.get('accion', 'error' if 'error' in resultado_nlp else 'otra')
+        ).observe(time.perf_counter() - inicio)
         
         if "error" in resultado_nlp:
             return Response(resultado_nlp, status=status.HTTP_400_BAD_REQUEST)
@@ -800,29 +784,19 @@ def get_mas_vendidos_data(request):
     filtros_aplicados = []
 
     try:
-        detalle_qs = DetalleVenta.objects.all()
+        top_productos_data = consultas.mas_vendidos(fecha_inicio, fecha_fin, categoria_id)
 
         if fecha_inicio and fecha_fin:
-            detalle_qs = detalle_qs.filter(venta__fecha__date__range=[fecha_inicio, fecha_fin])
             filtros_aplicados.append(f"Fechas: {fecha_inicio} a {fecha_fin}")
         
         if categoria_id:
             try:
-                detalle_qs = detalle_qs.filter(producto__categoria__id=categoria_id)
                 categoria_obj = Categoria.objects.get(id=categoria_id)
                 filtros_aplicados.append(f"Categoría: {categoria_obj.nombre}")
             except Categoria.DoesNotExist:
                 print(f"[WARN] Categoria ID {categoria_id} no encontrada.")
                 pass
         
-        top_productos_data = detalle_qs.values(
-            'producto__id', 
-            'producto__nombre',
-            'producto__categoria__nombre' 
-        ).annotate(
-            total_unidades=Sum('cantidad') 
-        ).order_by('-total_unidades')[:10] 
-
         if filtros_aplicados:
             titulo_reporte = f"Top 10 Más Vendidos ({', '.join(filtros_aplicados)})"
         else:
@@ -837,6 +811,8 @@ def get_mas_vendidos_data(request):
 
 @api_view(['GET']) 
 @permission_classes([IsAuthenticated])
+@medir_reporte('mas_vendidos', 'pdf')
+@vista_analitica
 def generar_reporte_mas_vendidos_pdf(request):
     
     try:
@@ -925,6 +901,8 @@ def generar_reporte_mas_vendidos_pdf(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@medir_reporte('mas_vendidos', 'excel')
+@vista_analitica
 def generar_reporte_mas_vendidos_excel(request):
     
     try:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Usuario, Rol
+from .models import Usuario, Rol, EmailSaliente
 
 @admin.register(Rol)
 class RolAdmin(admin.ModelAdmin):
@@ -12,3 +12,9 @@ class UsuarioAdmin(admin.ModelAdmin):
     search_fields = ('correo', 'nombre', 'apellido')
     filter_horizontal = ('roles',)
     list_filter = ('estado', 'roles')
+
+@admin.register(EmailSaliente)
+class EmailSalienteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'destinatario', 'asunto', 'estado', 'intentos', 'proximo_intento', 'fecha_envio')
+    search_fields = ('destinatario', 'asunto')
+    list_filter = ('estado',)
@@ -0,0 +1,74 @@
+# Autenticación JWT con una copia del usuario (campos + roles) en caché.
+# En lecturas (GET/HEAD/OPTIONS) se arma el usuario desde la caché sin
+# consultar la BD; en escrituras se carga de la BD como siempre, para que
+# un save() nunca parta de la copia (que no guarda password ni tokens).
+# Las señales en signals.py borran la copia al cambiar el usuario o sus roles.
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Usuario, Rol
+
+CAMPOS_EXCLUIDOS = {'password', 'token_recuperacion', 'token_expira'}
+
+
+def _clave(usuario_id):
+    return f"auth_usuario:{usuario_id}"
+
+
+def invalidar_usuario(*usuario_ids):
+    cache.delete_many([_clave(usuario_id) for usuario_id in usuario_ids])
+
+
+def _guardar_copia(usuario):
+    campos = {
+        f.attname: getattr(usuario, f.attname)
+        for f in Usuario._meta.concrete_fields
+        if f.attname not in CAMPOS_EXCLUIDOS
+    }
+    roles = [(rol.id, rol.nombre) for rol in usuario.roles.all()]
+    cache.set(_clave(usuario.pk), {'campos': campos, 'roles': roles}, settings.AUTH_USUARIO_CACHE_TTL)
+    _fijar_roles(usuario, roles)
+
+
+def _fijar_roles(usuario, roles):
+    # Deja roles.all() resuelto en memoria (igual que prefetch_related)
+    queryset = usuario.roles.all()
+    queryset._result_cache = [Rol(id=rol_id, nombre=nombre) for rol_id, nombre in roles]
+    queryset._prefetch_done = True
+    usuario._prefetched_objects_cache = {'roles': queryset}
+
+
+def _desde_copia(copia):
+    usuario = Usuario(**copia['campos'])
+    usuario._state.adding = False
+    usuario._state.db = 'default'
+    _fijar_roles(usuario, copia['roles'])
+    return usuario
+
+
+class JWTAutenticacionCacheada(JWTAuthentication):
+    def authenticate(self, request):
+        # DRF crea una instancia por request, se puede guardar el método aquí
+        self._solo_lectura = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not getattr(self, '_solo_lectura', False):
+            return super().get_user(validated_token)
+
+        try:
+            usuario_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("El token no contiene un identificador de usuario reconocible")
+
+        copia = cache.get(_clave(usuario_id))
+        if copia is not None:
+            return _desde_copia(copia)
+
+        usuario = super().get_user(validated_token)
+        _guardar_copia(usuario)
+        return usuario
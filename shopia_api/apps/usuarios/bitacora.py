@@ -0,0 +1,98 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger('apps.usuarios')
+
+
+class EscritorBitacora:
+    """
+    Acumula registros de bitácora en memoria y los guarda con bulk_create
+    desde un hilo en segundo plano, cuando se llena el lote o pasa el
+    intervalo. Con BITACORA_ASINCRONA=False escribe en el momento (pruebas).
+    """
+
+    def __init__(self):
+        self._cola = queue.Queue()
+        self._despertar = threading.Event()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pid = None
+
+    def registrar(self, entrada):
+        if not settings.BITACORA_ASINCRONA:
+            entrada.save()
+            return
+
+        self._asegurar_hilo()
+        self._cola.put(entrada)
+        if self._cola.qsize() >= settings.BITACORA_TAMANO_LOTE:
+            self._despertar.set()
+
+    def vaciar(self):
+        """Guarda todo lo pendiente; se llama también al terminar el worker"""
+        from .models import Bitacora
+
+        lote = []
+        while True:
+            try:
+                lote.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+            if len(lote) >= settings.BITACORA_TAMANO_LOTE:
+                self._guardar(Bitacora, lote)
+                lote = []
+        if lote:
+            self._guardar(Bitacora, lote)
+
+    def _guardar(self, modelo, lote):
+        try:
+            with transaction.atomic():
+                modelo.objects.bulk_create(lote)
+            return
+        except Exception:
+            logger.exception("Error al guardar %s registros de bitácora; se reintentan de a uno", len(lote))
+
+        # Un registro malo no se lleva al resto del lote: solo se descarta ese
+        for entrada in lote:
+            try:
+                with transaction.atomic():
+                    entrada.save()
+            except Exception:
+                logger.exception(
+                    "Registro de bitácora descartado (usuario=%s, accion=%r)", entrada.usuario_id, entrada.accion
+                )
+
+    def _asegurar_hilo(self):
+        # Con gunicorn --preload el módulo se importa antes del fork:
+        # cada proceso worker arranca su propio hilo.
+        if self._pid == os.getpid() and self._hilo and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo and self._hilo.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._cola = queue.Queue()
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(
+                target=self._bucle, name='bitacora-escritor', daemon=True
+            )
+            self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            self._despertar.wait(settings.BITACORA_INTERVALO)
+            self._despertar.clear()
+            try:
+                self.vaciar()
+            finally:
+                connection.close()
+
+
+escritor_bitacora = EscritorBitacora()
+atexit.register(escritor_bitacora.vaciar)
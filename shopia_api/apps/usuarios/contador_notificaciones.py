@@ -0,0 +1,90 @@
+# Contador de notificaciones no leídas por usuario, guardado en la caché.
+# Se ajusta al crear/leer notificaciones y se reconcilia con la BD cuando no
+# está en caché. Los cambios que afectan a todos los clientes suben la
+# 'generación', lo que invalida todos los contadores sin recorrerlos.
+# Un contador no vive más allá del próximo cambio de vigencia de sus
+# notificaciones (una programada que empieza o una que vence), así no hace
+# falta ningún proceso que lo invalide en ese momento.
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+
+CLAVE_GENERACION = 'notif_no_leidas:gen'
+
+
+def _generacion():
+    return cache.get_or_set(CLAVE_GENERACION, 1, timeout=None)
+
+
+def _clave(usuario_id, generacion=None):
+    return f"notif_no_leidas:{generacion or _generacion()}:{usuario_id}"
+
+
+def obtener_no_leidas(usuario):
+    """Devuelve (total_no_leidas, generacion); consulta la BD solo si no está en caché"""
+    from .models import Notificacion
+
+    generacion = _generacion()
+    clave = _clave(usuario.id, generacion)
+    total = cache.get(clave)
+    if total is None:
+        total = (
+            Notificacion.objects.vigentes()
+            .dirigidas_a(usuario)
+            .exclude(lecturas__usuario=usuario)
+            .count()
+        )
+        cache.set(clave, total, segundos_vigencia(usuario))
+    return total, generacion
+
+
+def segundos_vigencia(usuario):
+    """TTL del contador: NOTIF_CONTADOR_TTL o menos si antes empieza o vence una notificación del usuario"""
+    from .models import Notificacion
+
+    ahora = timezone.now()
+    proximos = Notificacion.objects.filter(estado=True).dirigidas_a(usuario).aggregate(
+        inicio=Min('fecha_inicio', filter=Q(fecha_inicio__gt=ahora)),
+        fin=Min('fecha_fin', filter=Q(fecha_fin__gte=ahora)),
+    )
+    ttl = settings.NOTIF_CONTADOR_TTL
+    for momento in proximos.values():
+        if momento is not None:
+            # vigentes() incluye fecha_fin: recién deja de contar un instante después
+            ttl = min(ttl, math.ceil((momento - ahora).total_seconds()) + 1)
+    return max(ttl, 1)
+
+
+def incrementar(usuario_ids):
+    """Suma 1 a los contadores que estén en caché (los demás se calculan al pedirlos)"""
+    generacion = _generacion()
+    for usuario_id in usuario_ids:
+        try:
+            cache.incr(_clave(usuario_id, generacion))
+        except ValueError:
+            pass
+
+
+def decrementar(usuario_id, cantidad=1):
+    clave = _clave(usuario_id)
+    try:
+        if cache.decr(clave, cantidad) < 0:
+            cache.delete(clave)
+    except ValueError:
+        pass
+
+
+def reiniciar(usuario_id):
+    # Se borra en vez de dejarlo en 0: el próximo pedido lo recalcula con su TTL
+    cache.delete(_clave(usuario_id))
+
+
+def invalidar_todos():
+    """Invalida los contadores de todos los usuarios (nueva generación)"""
+    try:
+        cache.incr(CLAVE_GENERACION)
+    except ValueError:
+        cache.set(CLAVE_GENERACION, 2, timeout=None)
@@ -0,0 +1,13 @@
+from django_filters import rest_framework as filters
+from .models import Bitacora
+
+class BitacoraFilter(filters.FilterSet):
+    fecha__gte = filters.IsoDateTimeFilter(field_name='fecha', lookup_expr='gte')
+    fecha__lte = filters.IsoDateTimeFilter(field_name='fecha', lookup_expr='lte')
+
+    class Meta:
+        model = Bitacora
+        fields = {
+            'usuario': ['exact'],
+            'accion': ['exact'],
+        }
@@ -1,7 +1,14 @@
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import firebase_admin
 from firebase_admin import credentials, messaging
+from firebase_admin import exceptions as firebase_exceptions
 from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.monitoreo.metricas import fcm_envios
 
 # Inicializar Firebase Admin SDK
 def inicializar_firebase():
@@ -49,16 +56,19 @@ def enviar_push_notification(token, titulo, descripcion, data=None):
         )
         
         response = messaging.send(message)
+        fcm_envios.labels(resultado='exito').inc()
         print(f"✅ Notificación enviada exitosamente: {response}")
         return {'success': True, 'message_id': response}
     except Exception as e:
+        fcm_envios.labels(resultado='fallo').inc()
         print(f"❌ Error al enviar notificación: {e}")
         return {'success': False, 'error': str(e)}
 
 # Enviar notificación push a múltiples tokens
 def enviar_push_notifications_masivas(tokens, titulo, descripcion, data=None):
     """
-    Envía notificaciones push a múltiples dispositivos
+    Envía notificaciones push a múltiples dispositivos, en lotes de
+    FCM_TAMANO_LOTE (FCM acepta como máximo 500 mensajes por llamada).
     
     Args:
         tokens: Lista de tokens FCM
@@ -73,44 +83,174 @@ def enviar_push_notifications_masivas(tokens, titulo, descripcion, data=None):
         return {'success': False, 'error': 'No hay tokens para enviar'}
     
     try:
-        # Crear mensajes para cada token
-        messages = [
-            messaging.Message(
-                notification=messaging.Notification(
-                    title=titulo,
-                    body=descripcion,
-                ),
-                data=data or {},
-                token=token,
-                android=messaging.AndroidConfig(
-                    priority='high',
-                    notification=messaging.AndroidNotification(
-                        channel_id='shopia_channel',
-                        priority='high',
-                        default_sound=True,
-                        default_vibrate_timings=True,
-                    )
-                ),
-            )
-            for token in tokens
-        ]
-        
-        # ✅ Método correcto: send_each() no send_all()
-        response = messaging.send_each(messages)
-        
-        print(f"📱 Notificaciones enviadas: {response.success_count} éxito, {response.failure_count} fallidas")
-        
-        # Mostrar errores si hay
-        if response.failure_count > 0:
-            for idx, resp in enumerate(response.responses):
-                if not resp.success:
-                    print(f"❌ Error en token {idx}: {resp.exception}")
-        
+        exitos = fallidos = 0
+        for lote in _agrupar_en_lotes(tokens, settings.FCM_TAMANO_LOTE):
+            resultado = enviar_push_multicast(lote, titulo, descripcion, data)
+            exitos += resultado['success_count']
+            fallidos += resultado['failure_count']
+
+        print(f"📱 Notificaciones enviadas: {exitos} éxito, {fallidos} fallidas")
         return {
             'success': True,
-            'success_count': response.success_count,
-            'failure_count': response.failure_count,
+            'success_count': exitos,
+            'failure_count': fallidos,
         }
     except Exception as e:
         print(f"❌ Error al enviar notificaciones masivas: {e}")
-        return {'success': False, 'error': str(e)}
\ No newline at end of file
+        return {'success': False, 'error': str(e)}
+
+def enviar_push_multicast(tokens, titulo, descripcion, data=None):
+    """
+    Envía un único lote multicast (máximo 500 tokens).
+    Devuelve los conteos y la lista de tokens que FCM reportó como inválidos.
+    """
+    inicializar_firebase()
+
+    message = messaging.MulticastMessage(
+        notification=messaging.Notification(
+            title=titulo,
+            body=descripcion,
+        ),
+        data=data or {},
+        tokens=list(tokens),
+        android=messaging.AndroidConfig(
+            priority='high',
+            notification=messaging.AndroidNotification(
+                channel_id='shopia_channel',
+                priority='high',
+                default_sound=True,
+                default_vibrate_timings=True,
+            )
+        ),
+    )
+    try:
+        response = messaging.send_each_for_multicast(message)
+    except Exception:
+        fcm_envios.labels(resultado='fallo').inc(len(message.tokens))
+        raise
+    fcm_envios.labels(resultado='exito').inc(response.success_count)
+    fcm_envios.labels(resultado='fallo').inc(response.failure_count)
+
+    tokens_invalidos = [
+        token
+        for token, resp in zip(message.tokens, response.responses)
+        if not resp.success and _es_token_invalido(resp.exception)
+    ]
+    return {
+        'success_count': response.success_count,
+        'failure_count': response.failure_count,
+        'tokens_invalidos': tokens_invalidos,
+    }
+
+def _es_token_invalido(exc):
+    """True si el error indica que el token ya no sirve y debe borrarse"""
+    if isinstance(exc, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+        return True
+    return (
+        isinstance(exc, firebase_exceptions.InvalidArgumentError)
+        and 'registration token' in str(exc).lower()
+    )
+
+def _agrupar_en_lotes(iterable, tamano):
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+# ===================== DESPACHO EN SEGUNDO PLANO =====================
+# Un hilo coordina cada notificación y un pool acotado envía los lotes.
+_coordinador = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fcm-coordinador')
+_pool_envio = ThreadPoolExecutor(max_workers=settings.FCM_MAX_HILOS, thread_name_prefix='fcm-envio')
+
+def programar_push_notificacion(notificacion_id):
+    """
+    Agenda el envío push de una notificación para después del commit.
+    Con FCM_ASINCRONO=False se envía en el mismo hilo (útil en pruebas).
+    """
+    def _lanzar():
+        if settings.FCM_ASINCRONO:
+            _coordinador.submit(_despachar_en_hilo, notificacion_id)
+        else:
+            despachar_push_notificacion(notificacion_id)
+
+    transaction.on_commit(_lanzar)
+
+def _despachar_en_hilo(notificacion_id):
+    try:
+        despachar_push_notificacion(notificacion_id)
+    except Exception as e:
+        print(f"❌ Error en el despacho push de la notificación {notificacion_id}: {e}")
+    finally:
+        # El hilo abre su propia conexión; se cierra para no dejarla colgada
+        connection.close()
+
+def despachar_push_notificacion(notificacion_id):
+    """
+    Recorre los tokens de los usuarios objetivo con un iterator (sin
+    cargarlos todos en memoria), los envía en lotes multicast concurrentes,
+    guarda los conteos en la notificación y limpia los tokens inválidos.
+    """
+    from .models import Notificacion, Usuario
+
+    notificacion = Notificacion.objects.get(id=notificacion_id)
+    tokens = (
+        notificacion.usuarios_objetivo()
+        .filter(estado=True, fcm_token__isnull=False)
+        .exclude(fcm_token='')
+        .values_list('fcm_token', flat=True)
+        .iterator(chunk_size=settings.FCM_TAMANO_LOTE)
+    )
+    data = {
+        'notificacion_id': str(notificacion.id),
+        'tipo': notificacion.tipo,
+    }
+
+    exitos = fallidos = 0
+    tokens_invalidos = []
+    # Como máximo 2 lotes en vuelo por hilo para no leer todos los tokens de golpe
+    en_vuelo = threading.BoundedSemaphore(settings.FCM_MAX_HILOS * 2)
+    futuros = []
+
+    def _enviar(lote):
+        try:
+            return enviar_push_multicast(lote, notificacion.titulo, notificacion.descripcion, data)
+        except Exception as e:
+            print(f"❌ Error al enviar lote push: {e}")
+            return {'success_count': 0, 'failure_count': len(lote), 'tokens_invalidos': []}
+        finally:
+            en_vuelo.release()
+
+    for lote in _agrupar_en_lotes(tokens, settings.FCM_TAMANO_LOTE):
+        en_vuelo.acquire()
+        futuros.append(_pool_envio.submit(_enviar, lote))
+
+    for futuro in futuros:
+        resultado = futuro.result()
+        exitos += resultado['success_count']
+        fallidos += resultado['failure_count']
+        tokens_invalidos.extend(resultado['tokens_invalidos'])
+
+    if tokens_invalidos:
+        Usuario.objects.filter(fcm_token__in=tokens_invalidos).update(
+            fcm_token=None, fcm_token_actualizado=None
+        )
+
+    Notificacion.objects.filter(id=notificacion.id).update(
+        push_exitosos=exitos,
+        push_fallidos=fallidos,
+        push_fecha_envio=timezone.now(),
+    )
+    print(
+        f"📱 Push notificación {notificacion.id}: {exitos} éxito, {fallidos} fallidas, "
+        f"{len(tokens_invalidos)} tokens inválidos eliminados"
+    )
+    return {
+        'success_count': exitos,
+        'failure_count': fallidos,
+        'tokens_invalidos': len(tokens_invalidos),
+    }
@@ -0,0 +1,86 @@
+# Control de intentos de login en la caché (no en la tabla usuarios).
+# Los contadores son ventanas deslizantes aproximadas: se guardan dos cubetas
+# (la ventana actual y la anterior) y se pondera la anterior según cuánto
+# de ella sigue dentro de la ventana. Solo se escribe en la BD cuando se
+# bloquea un usuario.
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def normalizar_correo(correo):
+    return (correo or '').strip().lower()
+
+
+def _cubetas(prefijo, clave, ventana):
+    ahora = time.time()
+    actual = int(ahora // ventana)
+    transcurrido = (ahora % ventana) / ventana
+    return (
+        f"login:{prefijo}:{clave}:{actual}",
+        f"login:{prefijo}:{clave}:{actual - 1}",
+        1 - transcurrido,
+    )
+
+
+def _contar(prefijo, clave, ventana, sumar=False):
+    clave_actual, clave_anterior, peso_anterior = _cubetas(prefijo, clave, ventana)
+    if sumar:
+        # add + incr es atómico en los backends de caché de Django
+        if not cache.add(clave_actual, 1, ventana * 2):
+            try:
+                cache.incr(clave_actual)
+            except ValueError:
+                cache.set(clave_actual, 1, ventana * 2)
+    valores = cache.get_many([clave_actual, clave_anterior])
+    return valores.get(clave_actual, 0) + valores.get(clave_anterior, 0) * peso_anterior
+
+
+def _version(correo):
+    # Al limpiar se cambia la versión y los contadores (correo, ip) viejos quedan huérfanos
+    return cache.get(f"login:ver:{correo}", 0)
+
+
+def ip_excede_limite(ip):
+    """Cuenta el intento de la IP y dice si pasó el límite (se rechaza antes de verificar la contraseña)"""
+    if not ip:
+        return False
+    total = _contar('ip', ip, settings.LOGIN_IP_VENTANA, sumar=True)
+    return total > settings.LOGIN_IP_MAX_INTENTOS
+
+
+def esta_bloqueado(correo):
+    """Devuelve los segundos de bloqueo restantes (0 si no está bloqueado)"""
+    hasta = cache.get(f"login:bloqueo:{normalizar_correo(correo)}")
+    if not hasta:
+        return 0
+    return max(int(hasta - time.time()), 0)
+
+
+def registrar_fallo(correo, ip):
+    """
+    Suma un fallo para (correo, ip) y para el correo desde cualquier IP.
+    Devuelve (intentos_restantes, debe_bloquear).
+    """
+    correo = normalizar_correo(correo)
+    ventana = settings.LOGIN_VENTANA_SEGUNDOS
+    version = _version(correo)
+    fallos = _contar('fallo', f"{correo}:{version}:{ip}", ventana, sumar=True)
+    fallos_cuenta = _contar('fallo_cuenta', f"{correo}:{version}", ventana, sumar=True)
+
+    restantes = settings.LOGIN_MAX_INTENTOS - int(fallos)
+    debe_bloquear = restantes <= 0 or fallos_cuenta >= settings.LOGIN_MAX_INTENTOS_CUENTA
+    return max(restantes, 0), debe_bloquear
+
+
+def bloquear(correo):
+    segundos = settings.LOGIN_BLOQUEO_MINUTOS * 60
+    cache.set(f"login:bloqueo:{normalizar_correo(correo)}", time.time() + segundos, segundos)
+
+
+def limpiar(correo):
+    """Quita el bloqueo y los contadores (login exitoso o recuperación de contraseña)"""
+    correo = normalizar_correo(correo)
+    cache.delete(f"login:bloqueo:{correo}")
+    cache.set(f"login:ver:{correo}", _version(correo) + 1, settings.LOGIN_VENTANA_SEGUNDOS * 2)
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.usuarios.models import Bitacora, BitacoraHistorica
+
+
+class Command(BaseCommand):
+    help = "Archiva la bitácora antigua en bitacora_historica y borra lo que pasó la retención"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias-activos', type=int, default=settings.BITACORA_DIAS_ACTIVOS,
+                            help='Días que se mantienen en la tabla bitacora')
+        parser.add_argument('--dias-historico', type=int, default=settings.BITACORA_DIAS_HISTORICO,
+                            help='Días totales de retención (después se borran del histórico)')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por transacción')
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        lote = options['lote']
+
+        archivados = self._archivar(ahora - timedelta(days=options['dias_activos']), lote)
+        self.stdout.write(f"📦 Registros archivados: {archivados}")
+
+        borrados = self._borrar(
+            BitacoraHistorica.objects.filter(fecha__lt=ahora - timedelta(days=options['dias_historico'])),
+            lote,
+        )
+        self.stdout.write(f"🗑️ Registros históricos eliminados: {borrados}")
+
+    def _archivar(self, corte, lote):
+        """Mueve por lotes (insert + delete en la misma transacción) lo anterior al corte"""
+        total = 0
+        while True:
+            with transaction.atomic():
+                filas = list(
+                    Bitacora.objects.filter(fecha__lt=corte)
+                    .order_by('fecha', 'id')
+                    .values('id', 'usuario_id', 'accion', 'descripcion', 'ip', 'fecha')[:lote]
+                )
+                if not filas:
+                    return total
+                BitacoraHistorica.objects.bulk_create(
+                    [BitacoraHistorica(**fila) for fila in filas], ignore_conflicts=True
+                )
+                Bitacora.objects.filter(id__in=[fila['id'] for fila in filas]).delete()
+            total += len(filas)
+
+    def _borrar(self, queryset, lote):
+        total = 0
+        while True:
+            ids = list(queryset.order_by('fecha').values_list('id', flat=True)[:lote])
+            if not ids:
+                return total
+            borrados, _ = queryset.model.objects.filter(id__in=ids).delete()
+            total += borrados
@@ -0,0 +1,31 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from apps.usuarios.utils import procesar_bandeja_emails
+
+
+class Command(BaseCommand):
+    help = "Envía los emails pendientes de la bandeja de salida (email_saliente)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Quedarse procesando indefinidamente')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos de espera cuando no hay pendientes')
+        parser.add_argument('--lote', type=int, default=None, help='Cantidad máxima de emails por lote')
+
+    def handle(self, *args, **options):
+        session = requests.Session()
+        try:
+            while True:
+                enviados, fallidos = procesar_bandeja_emails(lote=options['lote'], session=session)
+                if enviados or fallidos:
+                    self.stdout.write(f"📧 Emails enviados: {enviados}, fallidos: {fallidos}")
+
+                if not options['loop']:
+                    break
+                # Si el lote vino vacío se espera; si no, se sigue drenando
+                if not (enviados or fallidos):
+                    time.sleep(options['intervalo'])
+        finally:
+            session.close()
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0005_email_saliente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='push_exitosos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='push_fallidos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='push_fecha_envio',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
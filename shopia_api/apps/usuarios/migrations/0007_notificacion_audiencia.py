@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0006_notificacion_push_resultado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='audiencia',
+            field=models.CharField(choices=[('todos_clientes', 'Todos los clientes activos'), ('seleccion', 'Usuarios seleccionados')], default='seleccion', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='notificacion',
+            name='usuarios',
+            field=models.ManyToManyField(blank=True, help_text="Usuarios que deberían ver esta notificación (solo audiencia 'seleccion')", related_name='notificaciones_recibidas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['audiencia', 'estado', 'fecha_inicio'], name='notificacio_audienc_75b08f_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0008_bitacora_fecha_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BitacoraHistorica',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('accion', models.CharField(max_length=100)),
+                ('descripcion', models.TextField(blank=True)),
+                ('ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('fecha', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'bitacora_historica',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['fecha', 'id'], name='bitacora_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['usuario', 'fecha'], name='bitacora_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['accion', 'fecha'], name='bitacora_accion_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='bitacorahistorica',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bitacora_historica', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='bitacorahistorica',
+            index=models.Index(fields=['fecha'], name='bitacora_hist_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacorahistorica',
+            index=models.Index(fields=['usuario', 'fecha'], name='bitacora_hist_usuario_idx'),
+        ),
+    ]
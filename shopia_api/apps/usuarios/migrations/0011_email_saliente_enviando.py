@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0010_usuario_date_joined_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailsaliente',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIANDO', 'Enviando'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20),
+        ),
+    ]
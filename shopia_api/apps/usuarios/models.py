@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 class Rol(models.Model):
@@ -83,6 +84,14 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
         ordering = ['correo']
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
+        indexes = [
+            # Reportes de clientes nuevos por fecha de registro
+            models.Index(fields=['date_joined'], name='usuario_date_joined_idx'),
+        ]
+
+    def tiene_rol(self, nombre):
+        """Revisa los roles con roles.all(): usa el prefetch/caché si ya está cargado"""
+        return any(rol.nombre == nombre for rol in self.roles.all())
 
     def esta_bloqueado(self):
         """Verifica si el usuario está bloqueado por intentos fallidos"""
@@ -90,34 +99,141 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
             return True
         return False
     
-    def incrementar_intentos_fallidos(self):
-        """Incrementa los intentos fallidos y bloquea si llega a 3"""
-        self.intentos_fallidos += 1
-        if self.intentos_fallidos >= 3:
-            # Bloquear por 30 minutos
-            self.bloqueado_hasta = timezone.now() + timezone.timedelta(minutes=30)
-        self.save()
+    def bloquear(self, intentos, minutos):
+        """Guarda el bloqueo (los intentos en sí se cuentan en caché, ver limite_login)"""
+        self.intentos_fallidos = intentos
+        self.bloqueado_hasta = timezone.now() + timezone.timedelta(minutes=minutos)
+        self.save(update_fields=['intentos_fallidos', 'bloqueado_hasta'])
     
     def resetear_intentos_fallidos(self):
-        """Resetea los intentos fallidos al login exitoso"""
+        """Resetea los intentos fallidos al login exitoso (solo escribe si hace falta)"""
+        if not self.intentos_fallidos and not self.bloqueado_hasta:
+            return
         self.intentos_fallidos = 0
         self.bloqueado_hasta = None
-        self.save()
+        self.save(update_fields=['intentos_fallidos', 'bloqueado_hasta'])
 
 class Bitacora(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
     accion = models.CharField(max_length=100)  
     descripcion = models.TextField(blank=True)
     ip = models.GenericIPAddressField(null=True, blank=True)
-    fecha = models.DateTimeField(auto_now_add=True)
+    # Se fija al registrar la acción, no cuando el lote llega a la BD
+    fecha = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = 'bitacora'
         ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['fecha', 'id'], name='bitacora_fecha_idx'),
+            models.Index(fields=['usuario', 'fecha'], name='bitacora_usuario_fecha_idx'),
+            models.Index(fields=['accion', 'fecha'], name='bitacora_accion_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.usuario.correo} - {self.accion} - {self.fecha}"
 
+
+class BitacoraHistorica(models.Model):
+    """Registros de bitácora archivados por depurar_bitacora (fuera de la tabla activa)"""
+    id = models.BigIntegerField(primary_key=True)  # se conserva el id original
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='bitacora_historica')
+    accion = models.CharField(max_length=100)
+    descripcion = models.TextField(blank=True)
+    ip = models.GenericIPAddressField(null=True, blank=True)
+    fecha = models.DateTimeField()
+
+    class Meta:
+        db_table = 'bitacora_historica'
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['fecha'], name='bitacora_hist_fecha_idx'),
+            models.Index(fields=['usuario', 'fecha'], name='bitacora_hist_usuario_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} - {self.accion} - {self.fecha}"
+
+class NotificacionQuerySet(models.QuerySet):
+    def vigentes(self):
+        """Notificaciones activas dentro de su rango de fechas"""
+        ahora = timezone.now()
+        return self.filter(
+            estado=True,
+            fecha_inicio__lte=ahora
+        ).filter(
+            models.Q(fecha_fin__isnull=True) | models.Q(fecha_fin__gte=ahora)
+        )
+
+    def dirigidas_a(self, usuario):
+        """
+        Notificaciones que le llegan al usuario: las de audiencia
+        'todos_clientes' (sin filas M2M) más las que lo tienen en la selección.
+        """
+        en_seleccion = Notificacion.usuarios.through.objects.filter(
+            notificacion_id=models.OuterRef('pk'),
+            usuario_id=usuario.id
+        )
+        return self.filter(
+            models.Q(audiencia=Notificacion.AUDIENCIA_TODOS_CLIENTES)
+            | models.Q(models.Exists(en_seleccion))
+        )
+
+    def con_estadisticas(self):
+        """
+        Anota 'num_lecturas' y 'num_usuarios_objetivo' con subconsultas
+        (una sola consulta para todo el listado del admin).
+        """
+        lecturas = (
+            NotificacionLeida.objects
+            .filter(notificacion_id=models.OuterRef('pk'))
+            .order_by()
+            .values('notificacion_id')
+            .annotate(total=models.Count('id'))
+            .values('total')
+        )
+        seleccionados = (
+            Notificacion.usuarios.through.objects
+            .filter(notificacion_id=models.OuterRef('pk'))
+            .order_by()
+            .values('notificacion_id')
+            .annotate(total=models.Count('id'))
+            .values('total')
+        )
+        # Subconsulta no correlacionada: la BD la evalúa una sola vez
+        clientes_activos = (
+            Usuario.objects
+            .filter(roles__nombre='cliente', estado=True)
+            .order_by()
+            .values('estado')
+            .annotate(total=models.Count('id'))
+            .values('total')
+        )
+        return self.annotate(
+            num_lecturas=Coalesce(models.Subquery(lecturas), 0),
+            num_usuarios_objetivo=models.Case(
+                models.When(
+                    audiencia=Notificacion.AUDIENCIA_TODOS_CLIENTES,
+                    then=Coalesce(models.Subquery(clientes_activos), 0),
+                ),
+                default=Coalesce(models.Subquery(seleccionados), 0),
+            ),
+        )
+
+    def con_lectura_de(self, usuario):
+        """
+        Anota 'leida' y 'fecha_lectura' del usuario en la misma consulta,
+        para no hacer una consulta por notificación al serializar.
+        """
+        lecturas = NotificacionLeida.objects.filter(
+            notificacion_id=models.OuterRef('pk'),
+            usuario_id=usuario.id
+        )
+        return self.annotate(
+            leida=models.Exists(lecturas),
+            fecha_lectura=models.Subquery(lecturas.values('fecha_lectura')[:1])
+        )
+
 class Notificacion(models.Model):
     TIPO_CHOICES = (
         ('info', 'Información'),
@@ -134,6 +250,13 @@ class Notificacion(models.Model):
         ('push', 'Push'),
         ('sms', 'SMS'),
     )
+
+    AUDIENCIA_TODOS_CLIENTES = 'todos_clientes'
+    AUDIENCIA_SELECCION = 'seleccion'
+    AUDIENCIA_CHOICES = (
+        (AUDIENCIA_TODOS_CLIENTES, 'Todos los clientes activos'),
+        (AUDIENCIA_SELECCION, 'Usuarios seleccionados'),
+    )
     
     titulo = models.CharField(max_length=200)
     descripcion = models.TextField()
@@ -142,12 +265,19 @@ class Notificacion(models.Model):
     fecha_inicio = models.DateTimeField(default=timezone.now)
     fecha_fin = models.DateTimeField(null=True, blank=True)
     estado = models.BooleanField(default=True) 
+
+    # 'todos_clientes' se resuelve al consultar; solo 'seleccion' usa la tabla M2M
+    audiencia = models.CharField(
+        max_length=20,
+        choices=AUDIENCIA_CHOICES,
+        default=AUDIENCIA_SELECCION
+    )
     
     usuarios = models.ManyToManyField(
         Usuario, 
         related_name='notificaciones_recibidas',
         blank=True,
-        help_text="Usuarios que deberían ver esta notificación"
+        help_text="Usuarios que deberían ver esta notificación (solo audiencia 'seleccion')"
     )
     
     # Campos de auditoria
@@ -161,6 +291,13 @@ class Notificacion(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
+    # Resultado del último envío push (lo completa el despacho en segundo plano)
+    push_exitosos = models.PositiveIntegerField(default=0)
+    push_fallidos = models.PositiveIntegerField(default=0)
+    push_fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    objects = NotificacionQuerySet.as_manager()
+
     def __str__(self):
         return self.titulo
 
@@ -177,11 +314,28 @@ class Notificacion(models.Model):
 
     def total_lecturas(self):
         """Retorna el total de usuarios que han leído esta notificación"""
+        # Usa el valor anotado por NotificacionQuerySet.con_estadisticas si existe
+        if hasattr(self, 'num_lecturas'):
+            return self.num_lecturas
         return NotificacionLeida.objects.filter(notificacion=self).count()
 
+    def usuarios_objetivo(self):
+        """Queryset de los usuarios que deberían ver esta notificación"""
+        if self.audiencia == self.AUDIENCIA_TODOS_CLIENTES:
+            return Usuario.objects.filter(roles__nombre='cliente', estado=True)
+        return self.usuarios.all()
+
+    def es_para(self, usuario):
+        """Verifica si la notificación está dirigida al usuario"""
+        if self.audiencia == self.AUDIENCIA_TODOS_CLIENTES:
+            return True
+        return self.usuarios.filter(id=usuario.id).exists()
+
     def total_usuarios_objetivo(self):
         """Retorna el total de usuarios que deberían ver esta notificación"""
-        return self.usuarios.count()
+        if hasattr(self, 'num_usuarios_objetivo'):
+            return self.num_usuarios_objetivo
+        return self.usuarios_objetivo().count()
 
     def porcentaje_leido(self):
         """Retorna el porcentaje de usuarios que han leído la notificación"""
@@ -196,6 +350,9 @@ class Notificacion(models.Model):
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
         ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['audiencia', 'estado', 'fecha_inicio']),
+        ]
 
 class NotificacionLeida(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
@@ -211,4 +368,48 @@ class NotificacionLeida(models.Model):
         ordering = ['-fecha_lectura']
 
     def __str__(self):
-        return f"{self.usuario.correo} leyó '{self.notificacion.titulo}'"
\ No newline at end of file
+        return f"{self.usuario.correo} leyó '{self.notificacion.titulo}'"
+
+class EmailSaliente(models.Model):
+    """
+    Bandeja de salida de emails. Las vistas solo insertan filas y el
+    worker (manage.py procesar_emails) las envía por lotes con reintentos.
+    """
+    ESTADO_CHOICES = (
+        ('PENDIENTE', 'Pendiente'),
+        ('ENVIANDO', 'Enviando'),
+        ('ENVIADO', 'Enviado'),
+        ('FALLIDO', 'Fallido'),
+    )
+
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=255)
+    contenido_html = models.TextField()
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+    message_id = models.CharField(max_length=255, blank=True)
+
+    # Origen opcional (para trazar emails de una notificación)
+    notificacion = models.ForeignKey(
+        Notificacion,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='emails'
+    )
+
+    class Meta:
+        db_table = 'email_saliente'
+        verbose_name = 'Email Saliente'
+        verbose_name_plural = 'Emails Salientes'
+        ordering = ['proximo_intento']
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento']),
+        ]
+
+    def __str__(self):
+        return f"{self.destinatario} - {self.asunto} ({self.estado})"
@@ -1,6 +1,10 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import escape
 from rest_framework import serializers
-from .models import Usuario, Rol, Bitacora, Notificacion, NotificacionLeida
-from .firebase_service import enviar_push_notifications_masivas
+from .models import Usuario, Rol, Bitacora, Notificacion, NotificacionLeida, EmailSaliente
+from .firebase_service import programar_push_notificacion
+from . import contador_notificaciones
 
 class RolSerializer(serializers.ModelSerializer):
     class Meta:
@@ -140,10 +144,11 @@ class NotificacionReadSerializer(serializers.ModelSerializer):
         model = Notificacion
         fields = [
             'id', 'titulo', 'descripcion', 'tipo', 'plataforma',
-            'fecha_inicio', 'fecha_fin', 'estado', 'creado_por',
+            'fecha_inicio', 'fecha_fin', 'estado', 'audiencia', 'creado_por',
             'creado_por_nombre', 'fecha_creacion', 'fecha_actualizacion',
             'total_lecturas', 'total_usuarios_objetivo', 'porcentaje_leido',
-            'es_activa', 'usuarios_count'
+            'es_activa', 'usuarios_count', 'push_exitosos', 'push_fallidos',
+            'push_fecha_envio'
         ]
 
     def get_total_lecturas(self, obj):
@@ -159,7 +164,7 @@ class NotificacionReadSerializer(serializers.ModelSerializer):
         return obj.esta_activa()
 
     def get_usuarios_count(self, obj):
-        return obj.usuarios.count()
+        return obj.total_usuarios_objetivo()
 
 class NotificacionWriteSerializer(serializers.ModelSerializer):
     """Serializer para crear/editar notificaciones"""
@@ -179,6 +184,12 @@ class NotificacionWriteSerializer(serializers.ModelSerializer):
 
     def validate_usuarios_ids(self, value):
         """Validar que los usuarios existen y son clientes"""
+        if len(value) > settings.NOTIFICACION_MAX_SELECCION:
+            raise serializers.ValidationError(
+                f"Máximo {settings.NOTIFICACION_MAX_SELECCION} usuarios por selección. "
+                "Para más usuarios envíe la lista vacía (todos los clientes)."
+            )
+        value = list(dict.fromkeys(value))
         if value:
             usuarios_validos = Usuario.objects.filter(
                 id__in=value,
@@ -199,53 +210,57 @@ class NotificacionWriteSerializer(serializers.ModelSerializer):
         if request and request.user:
             validated_data['creado_por'] = request.user
 
+        # Sin usuarios explícitos = todos los clientes activos, resuelto al consultar
+        # (no se escribe una fila M2M por cliente)
+        if usuarios_ids:
+            validated_data['audiencia'] = Notificacion.AUDIENCIA_SELECCION
+        else:
+            validated_data['audiencia'] = Notificacion.AUDIENCIA_TODOS_CLIENTES
+
         notificacion = Notificacion.objects.create(**validated_data)
 
-        # Asignar usuarios objetivo
+        # Asignar usuarios objetivo (solo listas explícitas)
         if usuarios_ids:
-            usuarios = Usuario.objects.filter(
-                id__in=usuarios_ids,
-                roles__nombre='cliente',
-                estado=True
-            )
-        else:
-            # Si no se especifican usuarios, enviar a todos los clientes activos
-            usuarios = Usuario.objects.filter(
-                roles__nombre='cliente',
-                estado=True
-            )
+            notificacion.usuarios.set(usuarios_ids)
 
-        notificacion.usuarios.set(usuarios)
+        self._actualizar_contadores(notificacion, usuarios_ids)
         
         # 🆕 Enviar notificaciones push SOLO si plataforma='push' y estado=True
+        # (el envío corre en segundo plano después del commit)
         if notificacion.plataforma == 'push' and notificacion.estado:
-            self._enviar_notificaciones_push(notificacion, usuarios)
+            programar_push_notificacion(notificacion.id)
+
+        # Plataforma email: se encola un email por usuario objetivo
+        if notificacion.plataforma == 'email' and notificacion.estado:
+            self._encolar_emails(notificacion, notificacion.usuarios_objetivo())
         
         return notificacion
 
-    def _enviar_notificaciones_push(self, notificacion, usuarios):
-        """Envía notificaciones push a los usuarios con token FCM"""
-        # Obtener tokens FCM de usuarios activos
-        tokens = list(
-            usuarios.filter(fcm_token__isnull=False)
-            .exclude(fcm_token='')
-            .values_list('fcm_token', flat=True)
-        )
-        
-        if tokens:
-            resultado = enviar_push_notifications_masivas(
-                tokens=tokens,
-                titulo=notificacion.titulo,
-                descripcion=notificacion.descripcion,
-                data={
-                    'notificacion_id': str(notificacion.id),
-                    'tipo': notificacion.tipo,
-                }
-            )
-            
-            print(f"📱 Push notifications enviadas: {resultado}")
-        else:
-            print("⚠️ No hay usuarios con tokens FCM registrados")
+    def _encolar_emails(self, notificacion, usuarios):
+        """Inserta en la bandeja de salida un email por cada usuario objetivo"""
+        # Título y descripción los escribe un admin: se escapan para el HTML
+        html = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <h2 style="color: #1f2937;">{escape(notificacion.titulo)}</h2>
+            <p>{escape(notificacion.descripcion)}</p>
+            <hr style="margin: 30px 0; border: none; height: 1px; background: #e5e7eb;">
+            <p style="color: #6b7280; font-size: 14px;"><strong>Equipo Shopia</strong></p>
+        </div>
+        """
+        correos = usuarios.values_list('correo', flat=True).iterator(chunk_size=1000)
+        lote = []
+        for correo in correos:
+            lote.append(EmailSaliente(
+                destinatario=correo,
+                asunto=notificacion.titulo,
+                contenido_html=html,
+                notificacion=notificacion,
+            ))
+            if len(lote) >= 1000:
+                EmailSaliente.objects.bulk_create(lote)
+                lote = []
+        if lote:
+            EmailSaliente.objects.bulk_create(lote)
 
     def update(self, instance, validated_data):
         usuarios_ids = validated_data.pop('usuarios_ids', None)
@@ -258,20 +273,27 @@ class NotificacionWriteSerializer(serializers.ModelSerializer):
         # Actualizar usuarios objetivo si se proporcionaron
         if usuarios_ids is not None:
             if usuarios_ids:
-                usuarios = Usuario.objects.filter(
-                    id__in=usuarios_ids,
-                    roles__nombre='cliente',
-                    estado=True
-                )
+                instance.audiencia = Notificacion.AUDIENCIA_SELECCION
+                instance.usuarios.set(usuarios_ids)
             else:
-                usuarios = Usuario.objects.filter(
-                    roles__nombre='cliente',
-                    estado=True
-                )
-            instance.usuarios.set(usuarios)
+                instance.audiencia = Notificacion.AUDIENCIA_TODOS_CLIENTES
+                instance.usuarios.clear()
+            instance.save(update_fields=['audiencia'])
+
+        # Cambian fechas/estado/audiencia: se recalculan los contadores al pedirlos
+        transaction.on_commit(contador_notificaciones.invalidar_todos)
 
         return instance
 
+    def _actualizar_contadores(self, notificacion, usuarios_ids):
+        """Ajusta los contadores de no leídas en caché después del commit"""
+        if not notificacion.esta_activa():
+            return
+        if notificacion.audiencia == Notificacion.AUDIENCIA_TODOS_CLIENTES:
+            transaction.on_commit(contador_notificaciones.invalidar_todos)
+        else:
+            transaction.on_commit(lambda: contador_notificaciones.incrementar(usuarios_ids))
+
 class NotificacionLeidaSerializer(serializers.ModelSerializer):
     """Serializer para notificaciones leídas"""
     usuario_nombre = serializers.CharField(source='usuario.nombre', read_only=True)
@@ -299,6 +321,9 @@ class NotificacionClienteSerializer(serializers.ModelSerializer):
 
     def get_leida(self, obj):
         """Verificar si el usuario actual ha leído esta notificación"""
+        # Valor anotado por NotificacionQuerySet.con_lectura_de (sin consulta extra)
+        if hasattr(obj, 'leida'):
+            return obj.leida
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return NotificacionLeida.objects.filter(
@@ -309,6 +334,8 @@ class NotificacionClienteSerializer(serializers.ModelSerializer):
 
     def get_fecha_lectura(self, obj):
         """Obtener la fecha de lectura si existe"""
+        if hasattr(obj, 'fecha_lectura'):
+            return obj.fecha_lectura
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             lectura = NotificacionLeida.objects.filter(
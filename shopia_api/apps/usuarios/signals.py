@@ -0,0 +1,31 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Usuario, Rol
+from .autenticacion import invalidar_usuario
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_copia_usuario(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
+
+
+@receiver(m2m_changed, sender=Usuario.roles.through)
+def invalidar_copia_por_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidar_usuario(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # rol.usuarios.add/remove(...): instance es el Rol, pk_set son usuarios
+        invalidar_usuario(*pk_set)
+    elif action == 'pre_clear':
+        invalidar_usuario(*instance.usuarios.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Rol)
+@receiver(pre_delete, sender=Rol)
+def invalidar_copias_de_rol(sender, instance, **kwargs):
+    ids = list(instance.usuarios.values_list('id', flat=True))
+    if ids:
+        invalidar_usuario(*ids)
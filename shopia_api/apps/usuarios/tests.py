@@ -1,3 +1,544 @@
-from django.test import TestCase
+import importlib.util
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from firebase_admin import exceptions as firebase_exceptions, messaging
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.monitoreo.presupuesto import presupuesto_consultas
+from . import contador_notificaciones, limite_login
+from .autenticacion import JWTAutenticacionCacheada
+from .bitacora import EscritorBitacora, escritor_bitacora
+from .firebase_service import programar_push_notificacion
+from .models import Bitacora, EmailSaliente, Notificacion, NotificacionLeida, Rol, Usuario
+from .serializers import NotificacionWriteSerializer
+from .utils import obtener_ip, procesar_bandeja_emails
+from .views import registrar_bitacora
+
+
+def crear_cliente(correo='cliente@shopia.test'):
+    usuario = Usuario.objects.create_user(correo, password='clave-segura-123')
+    usuario.roles.add(Rol.objects.get_or_create(nombre='cliente')[0])
+    return usuario
+
+
+class ObtenerIpTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_sin_proxies_usa_remote_addr(self):
+        request = self.factory.get('/', HTTP_X_FORWARDED_FOR='1.1.1.1', REMOTE_ADDR='10.0.0.1')
+        with override_settings(PROXIES_CONFIABLES=0):
+            self.assertEqual(obtener_ip(request), '10.0.0.1')
+
+    def test_ignora_las_entradas_que_manda_el_cliente(self):
+        # El cliente manda "1.1.1.1, 2.2.2.2"; el proxy agrega la IP real al final
+        request = self.factory.get('/', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2, 203.0.113.7', REMOTE_ADDR='10.0.0.1')
+        with override_settings(PROXIES_CONFIABLES=1):
+            self.assertEqual(obtener_ip(request), '203.0.113.7')
+        with override_settings(PROXIES_CONFIABLES=2):
+            self.assertEqual(obtener_ip(request), '2.2.2.2')
+
+    def test_header_mas_corto_que_la_cadena_de_proxies(self):
+        request = self.factory.get('/', HTTP_X_FORWARDED_FOR='203.0.113.7', REMOTE_ADDR='10.0.0.1')
+        with override_settings(PROXIES_CONFIABLES=2):
+            self.assertEqual(obtener_ip(request), '10.0.0.1')
+
+
+def cargar_conf_gunicorn():
+    ruta = Path(settings.BASE_DIR) / 'gunicorn.conf.py'
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+class BitacoraEnPruebasTests(TestCase):
+    @mock.patch.object(EscritorBitacora, '_asegurar_hilo')
+    def test_manage_py_test_guarda_en_el_momento(self, _asegurar_hilo):
+        self.assertFalse(settings.BITACORA_ASINCRONA)
+        registrar_bitacora(crear_cliente(), 'LOGIN')
+        _asegurar_hilo.assert_not_called()
+        self.assertEqual(Bitacora.objects.get().accion, 'LOGIN')
+
+
+# El hilo no arranca: sus pasadas se simulan llamando a vaciar()
+@override_settings(BITACORA_ASINCRONA=True, BITACORA_TAMANO_LOTE=3, BITACORA_INTERVALO=3600)
+@mock.patch.object(EscritorBitacora, '_asegurar_hilo')
+class EscritorBitacoraTests(TestCase):
+    def setUp(self):
+        self.usuario = crear_cliente()
+        self.escritor = EscritorBitacora()
+
+    def registrar(self, escritor, cantidad):
+        for i in range(cantidad):
+            escritor.registrar(Bitacora(usuario=self.usuario, accion=f'accion {i}'))
+
+    def test_lote_lleno_despierta_al_hilo(self, _asegurar_hilo):
+        self.registrar(self.escritor, 2)
+        self.assertFalse(self.escritor._despertar.is_set())
+        self.registrar(self.escritor, 1)
+        self.assertTrue(self.escritor._despertar.is_set())
+        self.assertFalse(Bitacora.objects.exists())
+
+        self.escritor.vaciar()
+        self.assertEqual(Bitacora.objects.count(), 3)
+
+    def test_intervalo_guarda_un_lote_incompleto(self, _asegurar_hilo):
+        self.registrar(self.escritor, 2)
+        self.assertFalse(self.escritor._despertar.is_set())
+
+        self.escritor.vaciar()  # lo que hace el hilo al vencer BITACORA_INTERVALO
+        self.assertEqual(Bitacora.objects.count(), 2)
+
+    def test_worker_exit_guarda_lo_pendiente(self, _asegurar_hilo):
+        escritor_bitacora.vaciar()
+        self.registrar(escritor_bitacora, 2)
+        self.assertFalse(Bitacora.objects.exists())
+
+        cargar_conf_gunicorn().worker_exit(None, None)
+        self.assertEqual(Bitacora.objects.count(), 2)
+
+    def test_un_registro_malo_no_descarta_el_lote(self, _asegurar_hilo):
+        lote = [Bitacora(usuario=self.usuario, accion=f'accion {i}') for i in range(3)]
+        lote.insert(1, Bitacora(usuario=self.usuario, accion=None))  # NOT NULL
+
+        with self.assertLogs('apps.usuarios', 'ERROR') as logs:
+            self.escritor._guardar(Bitacora, lote)
+
+        self.assertEqual(
+            sorted(Bitacora.objects.values_list('accion', flat=True)), ['accion 0', 'accion 1', 'accion 2']
+        )
+        self.assertEqual(len(logs.records), 2)  # el lote y el registro descartado
+        self.assertTrue(all(registro.exc_info for registro in logs.records))
+
+
+URL_LOGIN = '/api/cuenta/token/'
+
+
+def escrituras_de_usuarios(consultas):
+    tabla = Usuario._meta.db_table
+    return [c['sql'] for c in consultas if c['sql'].startswith(f'UPDATE "{tabla}"')]
+
+
+@override_settings(
+    PROXIES_CONFIABLES=0, LOGIN_MAX_INTENTOS=3, LOGIN_MAX_INTENTOS_CUENTA=5,
+    LOGIN_IP_MAX_INTENTOS=20, LOGIN_BLOQUEO_MINUTOS=30,
+)
+class LimiteLoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_cliente()
+        self.cliente = APIClient()
+
+    def login(self, password='incorrecta', ip='203.0.113.7', **extra):
+        return self.cliente.post(
+            URL_LOGIN, {'correo': self.usuario.correo, 'password': password}, format='json', REMOTE_ADDR=ip, **extra
+        )
+
+    @override_settings(LOGIN_IP_MAX_INTENTOS=2)
+    def test_limite_por_ip_responde_429_sin_verificar_la_contrasena(self):
+        with mock.patch('apps.usuarios.views.authenticate', return_value=None) as authenticate:
+            self.assertEqual(self.login().status_code, 401)
+            self.assertEqual(self.login().status_code, 401)
+            respuesta = self.login()
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertEqual(respuesta['Retry-After'], str(settings.LOGIN_IP_VENTANA))
+        self.assertEqual(authenticate.call_count, 2)
+        # Otra IP no queda afectada
+        self.assertEqual(self.login(ip='198.51.100.1').status_code, 401)
+
+    def test_fallos_por_correo_e_ip_bloquean_la_cuenta(self):
+        self.assertEqual(self.login().data['intentos_restantes'], 2)
+        self.assertEqual(self.login().data['intentos_restantes'], 1)
+        respuesta = self.login()
+        self.assertEqual(respuesta.status_code, 423)
+        self.assertTrue(respuesta.data['debe_recuperar'])
+
+        # Bloqueada también con la contraseña correcta
+        self.assertEqual(self.login('clave-segura-123').status_code, 423)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.esta_bloqueado())
+
+    def test_contador_por_cuenta_bloquea_aunque_cambie_la_ip(self):
+        for i in range(4):
+            self.assertEqual(self.login(ip=f'198.51.100.{i}').status_code, 401)
+        self.assertEqual(self.login(ip='198.51.100.9').status_code, 423)
+
+    def test_la_fila_de_usuarios_solo_se_escribe_al_bloquear(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.login()
+            self.login()
+        self.assertEqual(escrituras_de_usuarios(consultas.captured_queries), [])
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.login()
+        self.assertEqual(len(escrituras_de_usuarios(consultas.captured_queries)), 1)
+
+    def test_login_exitoso_no_escribe_la_fila_y_limpia_los_contadores(self):
+        self.login()
+        self.login()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.login('clave-segura-123').status_code, 200)
+        self.assertEqual(escrituras_de_usuarios(consultas.captured_queries), [])
+        self.assertEqual(self.login().data['intentos_restantes'], 2)
+
+    def test_limpiar_quita_el_bloqueo_y_los_contadores(self):
+        for _ in range(3):
+            self.login()
+        self.assertTrue(limite_login.esta_bloqueado(self.usuario.correo))
+
+        limite_login.limpiar(self.usuario.correo.upper())
+        self.assertEqual(limite_login.esta_bloqueado(self.usuario.correo), 0)
+        self.assertEqual(limite_login.registrar_fallo(self.usuario.correo, '203.0.113.7'), (2, False))
+
+    @override_settings(PROXIES_CONFIABLES=1)
+    def test_bitacora_guarda_la_ip_confiable(self):
+        self.login(ip='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7')
+        registro = Bitacora.objects.get(accion='LOGIN_FALLIDO')
+        self.assertEqual(registro.ip, '203.0.113.7')
+        self.assertEqual(registro.descripcion, 'Intento de login fallido desde 203.0.113.7')
+
+
+def lecturas_de_usuarios(consultas):
+    tablas = (f'"{Usuario._meta.db_table}"', f'"{Usuario.roles.through._meta.db_table}"')
+    return [c['sql'] for c in consultas if c['sql'].startswith('SELECT') and any(t in c['sql'] for t in tablas)]
+
+
+@override_settings(AUTH_USUARIO_CACHE_TTL=300)
+class AutenticacionCacheadaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_cliente()
+        self.rol_cliente = Rol.objects.get(nombre='cliente')
+        self.token = str(RefreshToken.for_user(self.usuario).access_token)
+        self.cliente = APIClient(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.factory = RequestFactory()
+
+    def autenticar(self, metodo='get'):
+        request = getattr(self.factory, metodo)('/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        return JWTAutenticacionCacheada().authenticate(request)[0]
+
+    def lecturas_del_perfil(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.cliente.get('/api/cuenta/perfil/')
+        return respuesta, lecturas_de_usuarios(consultas.captured_queries)
+
+    def roles_del_perfil(self):
+        return [rol['nombre'] for rol in self.lecturas_del_perfil()[0].data['roles']]
+
+    def test_segunda_lectura_no_consulta_usuarios(self):
+        respuesta, lecturas = self.lecturas_del_perfil()
+        self.assertTrue(lecturas)
+        respuesta, lecturas = self.lecturas_del_perfil()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(lecturas, [])
+        self.assertEqual(respuesta.data['roles'], [{'id': self.rol_cliente.id, 'nombre': 'cliente'}])
+
+    def test_cambiar_estado_invalida_la_copia(self):
+        self.assertTrue(self.autenticar().estado)
+        self.usuario.estado = False
+        self.usuario.save(update_fields=['estado'])
+        self.assertFalse(self.autenticar().estado)
+
+    def test_cambiar_is_staff_invalida_la_copia(self):
+        self.assertFalse(self.autenticar().is_staff)
+        self.usuario.is_staff = True
+        self.usuario.save(update_fields=['is_staff'])
+        self.assertTrue(self.autenticar().is_staff)
+        self.usuario.is_staff = False
+        self.usuario.save(update_fields=['is_staff'])
+        self.assertFalse(self.autenticar().is_staff)
+
+    def test_cambios_de_roles_invalidan_la_copia(self):
+        admin = Rol.objects.create(nombre='admin')
+        self.assertEqual(self.roles_del_perfil(), ['cliente'])
+
+        self.usuario.roles.add(admin)
+        self.assertEqual(sorted(self.roles_del_perfil()), ['admin', 'cliente'])
+        self.usuario.roles.remove(self.rol_cliente)
+        self.assertEqual(self.roles_del_perfil(), ['admin'])
+        admin.usuarios.remove(self.usuario)  # desde el lado del rol
+        self.assertEqual(self.roles_del_perfil(), [])
+
+    def test_guardar_o_borrar_un_rol_invalida_la_copia(self):
+        self.assertEqual(self.roles_del_perfil(), ['cliente'])
+        self.rol_cliente.nombre = 'comprador'
+        self.rol_cliente.save()
+        self.assertEqual(self.roles_del_perfil(), ['comprador'])
+        self.rol_cliente.delete()
+        self.assertEqual(self.roles_del_perfil(), [])
+
+    def test_escrituras_cargan_el_usuario_de_la_bd(self):
+        self.autenticar()
+        # Una copia vieja no debe llegar a un save()
+        Usuario.objects.filter(pk=self.usuario.pk).update(nombre='Actual')
+        self.assertNotEqual(self.autenticar().nombre, 'Actual')
+        self.assertEqual(self.autenticar('put').nombre, 'Actual')
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.cliente.put('/api/cuenta/perfil/', {'telefono': '70000000'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['nombre'], 'Actual')
+        self.assertTrue(lecturas_de_usuarios(consultas.captured_queries))
+
+
+@override_settings(NOTIF_CONTADOR_TTL=300)
+class ContadorNotificacionesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_cliente()
+
+    def test_notificacion_programada_se_cuenta_cuando_empieza(self):
+        ahora = timezone.now()
+        Notificacion.objects.create(
+            titulo='Oferta', descripcion='-', audiencia=Notificacion.AUDIENCIA_TODOS_CLIENTES,
+            fecha_inicio=ahora + timedelta(seconds=60),
+        )
+        self.assertEqual(contador_notificaciones.obtener_no_leidas(self.usuario)[0], 0)
+        self.assertLessEqual(contador_notificaciones.segundos_vigencia(self.usuario), 61)
+
+        # 62 s después el contador en caché ya venció y se recalcula
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 62), \
+                mock.patch('django.utils.timezone.now', return_value=ahora + timedelta(seconds=62)):
+            self.assertEqual(contador_notificaciones.obtener_no_leidas(self.usuario)[0], 1)
+
+    def test_sin_cambios_programados_usa_el_ttl_configurado(self):
+        Notificacion.objects.create(titulo='Hola', descripcion='-', audiencia=Notificacion.AUDIENCIA_TODOS_CLIENTES)
+        self.assertEqual(contador_notificaciones.segundos_vigencia(self.usuario), 300)
+
+
+class MisNotificacionesConsultasTests(TestCase):
+    """El listado no debe hacer una consulta por notificación (N+1)"""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_cliente()
+        # JWT real: en GET el usuario y sus roles salen de la caché (autenticacion.py)
+        self.cliente = APIClient(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.usuario).access_token}')
+
+    def crear_notificaciones(self, cantidad):
+        for i in range(cantidad):
+            notificacion = Notificacion.objects.create(titulo=f'Aviso {i}', descripcion='-')
+            notificacion.usuarios.add(self.usuario)
+            if i % 2:
+                NotificacionLeida.objects.create(usuario=self.usuario, notificacion=notificacion)
+        Notificacion.objects.create(
+            titulo='Para todos', descripcion='-', audiencia=Notificacion.AUDIENCIA_TODOS_CLIENTES
+        )
+
+    def consultas_del_listado(self, cantidad):
+        self.crear_notificaciones(cantidad)
+        self.cliente.get('/api/cuenta/mis-notificaciones/')  # deja el usuario en la caché
+        with self.assertNumQueries(1):
+            respuesta = self.cliente.get('/api/cuenta/mis-notificaciones/')
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta
+
+    def test_consultas_no_crecen_con_las_notificaciones(self):
+        respuesta = self.consultas_del_listado(3)
+        self.assertEqual(len(respuesta.data), 4)
+
+    def test_consultas_con_muchas_notificaciones(self):
+        respuesta = self.consultas_del_listado(25)
+        self.assertEqual(len(respuesta.data), 26)
+        leidas = [notificacion['leida'] for notificacion in respuesta.data]
+        self.assertEqual(leidas.count(True), 12)
+
+
+# (quién, url, máximo de consultas con la caché caliente)
+PRESUPUESTOS = [
+    ('cliente', '/api/cuenta/mis-notificaciones/', 3),
+    ('admin', '/api/cuenta/bitacora/?page_size=50', 2),
+]
+
+
+class PresupuestoConsultasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cliente = crear_cliente()
+        admin = Usuario.objects.create_user('admin@shopia.test', password='clave-segura-123', is_staff=True)
+        admin.roles.add(Rol.objects.get_or_create(nombre='admin')[0])
+        cls.usuarios = {'cliente': cliente, 'admin': admin}
+
+        for i in range(10):
+            notificacion = Notificacion.objects.create(titulo=f'Aviso {i}', descripcion='-')
+            notificacion.usuarios.add(cliente)
+        Bitacora.objects.bulk_create([
+            Bitacora(usuario=cliente if i % 2 else admin, accion='LOGIN', descripcion='-', ip='10.0.0.1')
+            for i in range(80)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_presupuestos(self):
+        for rol, url, maximo in PRESUPUESTOS:
+            cliente = APIClient(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.usuarios[rol]).access_token}')
+            with self.subTest(rol=rol, url=url):
+                cliente.get(url)  # calentar cachés
+                with presupuesto_consultas(maximo, url):
+                    respuesta = cliente.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+
+
+class BrevoFalso:
+    """Hace de requests.Session: anota cada envío y responde como Brevo (o falla)"""
+
+    def __init__(self, falla=False, al_enviar=None):
+        self.falla = falla
+        self.al_enviar = al_enviar
+        self.enviados = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.enviados.append(json['to'][0]['email'])
+        if self.al_enviar:
+            self.al_enviar(json)
+        respuesta = requests.Response()
+        respuesta.status_code = 500 if self.falla else 201
+        respuesta._content = b'{"messageId": "<id@brevo>"}'
+        respuesta.url = url
+        return respuesta
+
+
+def crear_email(destinatario='cliente@shopia.test', **campos):
+    return EmailSaliente.objects.create(destinatario=destinatario, asunto='Hola', contenido_html='<p>Hola</p>', **campos)
+
+
+@override_settings(EMAIL_OUTBOX_MAX_INTENTOS=2)
+class BandejaEmailsTests(TransactionTestCase):
+    def test_envia_fuera_de_transaccion_con_la_fila_ya_reclamada(self):
+        email = crear_email()
+        vistos = []
+        brevo = BrevoFalso(al_enviar=lambda datos: vistos.append(
+            (connection.in_atomic_block, EmailSaliente.objects.get(pk=email.pk).estado)
+        ))
+
+        self.assertEqual(procesar_bandeja_emails(session=brevo), (1, 0))
+        self.assertEqual(vistos, [(False, 'ENVIANDO')])
+        email.refresh_from_db()
+        self.assertEqual((email.estado, email.intentos, email.message_id), ('ENVIADO', 1, '<id@brevo>'))
+        self.assertEqual(procesar_bandeja_emails(session=BrevoFalso()), (0, 0))
+
+    def test_error_reintenta_con_espera_y_luego_falla(self):
+        email = crear_email()
+        self.assertEqual(procesar_bandeja_emails(session=BrevoFalso(falla=True)), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.estado, email.intentos), ('PENDIENTE', 1))
+        self.assertGreater(email.proximo_intento, timezone.now())
+        self.assertIn('500', email.ultimo_error)
+
+        EmailSaliente.objects.filter(pk=email.pk).update(proximo_intento=timezone.now())
+        procesar_bandeja_emails(session=BrevoFalso(falla=True))
+        email.refresh_from_db()
+        self.assertEqual((email.estado, email.intentos), ('FALLIDO', 2))
+
+    def test_retoma_solo_los_envios_con_el_plazo_vencido(self):
+        en_curso = crear_email('a@shopia.test', estado='ENVIANDO', proximo_intento=timezone.now() + timedelta(minutes=5))
+        abandonado = crear_email('b@shopia.test', estado='ENVIANDO', proximo_intento=timezone.now() - timedelta(minutes=1))
+        brevo = BrevoFalso()
+
+        procesar_bandeja_emails(session=brevo)
+        self.assertEqual(brevo.enviados, ['b@shopia.test'])
+        self.assertEqual(EmailSaliente.objects.get(pk=en_curso.pk).estado, 'ENVIANDO')
+        self.assertEqual(EmailSaliente.objects.get(pk=abandonado.pk).estado, 'ENVIADO')
+
+    def test_no_pisa_el_resultado_si_otro_worker_lo_retomo(self):
+        email = crear_email()
+        # Mientras se envía vence el plazo y otro worker lo reclama (intentos + 1)
+        brevo = BrevoFalso(al_enviar=lambda datos: EmailSaliente.objects.filter(pk=email.pk).update(intentos=2))
+
+        procesar_bandeja_emails(session=brevo)
+        email.refresh_from_db()
+        self.assertEqual((email.estado, email.intentos), ('ENVIANDO', 2))
+
+
+class EmailNotificacionTests(TestCase):
+    def test_titulo_y_descripcion_se_escapan(self):
+        usuario = crear_cliente()
+        notificacion = Notificacion.objects.create(
+            titulo='<script>alert(1)</script>', descripcion='<img src=x onerror=alert(1)>', plataforma='email'
+        )
+        NotificacionWriteSerializer()._encolar_emails(notificacion, Usuario.objects.filter(pk=usuario.pk))
+
+        html = EmailSaliente.objects.get(notificacion=notificacion).contenido_html
+        self.assertIn('&lt;script&gt;alert(1)&lt;/script&gt;', html)
+        self.assertIn('&lt;img src=x onerror=alert(1)&gt;', html)
+        self.assertNotIn('<script>', html)
+
+
+class FCMFalso:
+    """Reemplaza messaging.send_each_for_multicast; errores = {token: excepción}"""
+
+    def __init__(self, errores=None):
+        self.errores = errores or {}
+        self.lotes = []
+        self._lock = threading.Lock()
+
+    def __call__(self, mensaje):
+        with self._lock:
+            self.lotes.append(list(mensaje.tokens))
+        respuestas = [
+            SimpleNamespace(success=token not in self.errores, exception=self.errores.get(token))
+            for token in mensaje.tokens
+        ]
+        exitos = sum(r.success for r in respuestas)
+        return SimpleNamespace(responses=respuestas, success_count=exitos, failure_count=len(respuestas) - exitos)
+
+
+@override_settings(FCM_ASINCRONO=False, FCM_TAMANO_LOTE=500)
+@mock.patch('apps.usuarios.firebase_service.inicializar_firebase')
+class DespachoPushTests(TestCase):
+    def crear_notificacion(self, tokens):
+        usuarios = Usuario.objects.bulk_create(
+            Usuario(correo=f'push{i}@shopia.test', fcm_token=token) for i, token in enumerate(tokens)
+        )
+        notificacion = Notificacion.objects.create(titulo='Oferta', descripcion='-', plataforma='push')
+        notificacion.usuarios.set(usuarios)
+        return notificacion
+
+    def despachar(self, notificacion, fcm):
+        with mock.patch('apps.usuarios.firebase_service.messaging.send_each_for_multicast', fcm):
+            with self.captureOnCommitCallbacks(execute=True):
+                programar_push_notificacion(notificacion.id)
+
+    def test_tokens_en_lotes_de_a_lo_sumo_500(self, _inicializar):
+        tokens = [f'token-{i}' for i in range(1001)]
+        notificacion = self.crear_notificacion(tokens)
+        fcm = FCMFalso()
+
+        self.despachar(notificacion, fcm)
+        self.assertEqual(sorted(len(lote) for lote in fcm.lotes), [1, 500, 500])
+        self.assertEqual(sorted(token for lote in fcm.lotes for token in lote), sorted(tokens))
+
+    def test_limpia_tokens_invalidos_y_guarda_los_conteos(self, _inicializar):
+        notificacion = self.crear_notificacion(['bueno', 'desinstalado', 'mal-formado', 'caido'])
+        fcm = FCMFalso({
+            'desinstalado': messaging.UnregisteredError('Requested entity was not found.'),
+            'mal-formado': firebase_exceptions.InvalidArgumentError('The registration token is not a valid FCM registration token'),
+            'caido': firebase_exceptions.UnavailableError('FCM no disponible'),
+        })
+
+        self.despachar(notificacion, fcm)
+        tokens = dict(Usuario.objects.filter(correo__startswith='push').values_list('correo', 'fcm_token'))
+        self.assertEqual(tokens, {
+            'push0@shopia.test': 'bueno',
+            'push1@shopia.test': None,
+            'push2@shopia.test': None,
+            'push3@shopia.test': 'caido',  # error transitorio: el token se conserva
+        })
+        notificacion.refresh_from_db()
+        self.assertEqual((notificacion.push_exitosos, notificacion.push_fallidos), (1, 3))
+        self.assertIsNotNone(notificacion.push_fecha_envio)
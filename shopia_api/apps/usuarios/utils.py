@@ -1,8 +1,26 @@
 import requests
+from datetime import timedelta
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
-def enviar_email_brevo(to_email, subject, html_content):
-    url = "https://api.brevo.com/v3/smtp/email"
+def obtener_ip(request):
+    """
+    IP del cliente. Las primeras entradas de X-Forwarded-For las elige el
+    cliente; solo es confiable la que agregó el proxy más externo de los
+    PROXIES_CONFIABLES que hay delante (contando desde la derecha).
+    Sin proxies, o si el header no pasó por todos, se usa REMOTE_ADDR.
+    """
+    saltos = settings.PROXIES_CONFIABLES
+    reenviadas = [
+        ip.strip() for ip in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if ip.strip()
+    ]
+    if saltos and len(reenviadas) >= saltos:
+        return reenviadas[-saltos]
+    return request.META.get("REMOTE_ADDR")
+
+def enviar_email_brevo(to_email, subject, html_content, session=None):
+    url = settings.BREVO_API_URL
     headers = {
         "accept": "application/json",
         "api-key": settings.BREVO_API_KEY,
@@ -14,5 +32,92 @@ def enviar_email_brevo(to_email, subject, html_content):
         "subject": subject,
         "htmlContent": html_content
     }
-    r = requests.post(url, headers=headers, json=data)
+    cliente = session or requests
+    r = cliente.post(url, headers=headers, json=data, timeout=settings.EMAIL_OUTBOX_TIMEOUT)
+    r.raise_for_status()
     return r.json()
+
+def encolar_email(to_email, subject, html_content, notificacion=None):
+    """Inserta el email en la bandeja de salida; el worker se encarga del envío"""
+    from .models import EmailSaliente
+
+    return EmailSaliente.objects.create(
+        destinatario=to_email,
+        asunto=subject,
+        contenido_html=html_content,
+        notificacion=notificacion,
+    )
+
+def reclamar_emails(lote):
+    """
+    Marca como ENVIANDO hasta `lote` emails vencidos y los devuelve. La
+    transacción es corta: las filas quedan tomadas por el estado (y por
+    proximo_intento como plazo), no por un bloqueo abierto durante el envío.
+    Un ENVIANDO con el plazo vencido es de un worker que se cayó y se retoma.
+    """
+    from .models import EmailSaliente
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            EmailSaliente.objects
+            .select_for_update(skip_locked=True)
+            .filter(estado__in=['PENDIENTE', 'ENVIANDO'], proximo_intento__lte=ahora)
+            .order_by('proximo_intento')[:lote]
+        )
+        plazo = ahora + timedelta(seconds=settings.EMAIL_OUTBOX_PLAZO_ENVIO)
+        for email in emails:
+            email.estado = 'ENVIANDO'
+            email.intentos += 1
+            email.proximo_intento = plazo
+        EmailSaliente.objects.bulk_update(emails, ['estado', 'intentos', 'proximo_intento'])
+    return emails
+
+def procesar_bandeja_emails(lote=None, session=None):
+    """
+    Envía un lote de emails pendientes reutilizando una sola sesión HTTP.
+    Las filas se reclaman en una transacción corta (reclamar_emails) y cada
+    envío se hace fuera de transacción: si algo falla después de que Brevo
+    aceptó el email, no hay rollback que lo vuelva a dejar pendiente.
+    Devuelve (enviados, fallidos).
+    """
+    from .models import EmailSaliente
+
+    lote = lote or settings.EMAIL_OUTBOX_LOTE
+    max_intentos = settings.EMAIL_OUTBOX_MAX_INTENTOS
+    enviados = fallidos = 0
+    propia = session is None
+    session = session or requests.Session()
+
+    try:
+        for email in reclamar_emails(lote):
+            try:
+                respuesta = enviar_email_brevo(
+                    email.destinatario, email.asunto, email.contenido_html, session=session
+                )
+                resultado = {
+                    'estado': 'ENVIADO',
+                    'fecha_envio': timezone.now(),
+                    'message_id': str(respuesta.get('messageId', ''))[:255],
+                    'ultimo_error': '',
+                }
+                enviados += 1
+            except Exception as e:
+                resultado = {'ultimo_error': str(e)}
+                if email.intentos >= max_intentos:
+                    resultado['estado'] = 'FALLIDO'
+                else:
+                    # Backoff exponencial: 1, 2, 4, 8... minutos
+                    resultado['estado'] = 'PENDIENTE'
+                    resultado['proximo_intento'] = timezone.now() + timedelta(minutes=2 ** (email.intentos - 1))
+                fallidos += 1
+
+            # Solo si sigue siendo nuestro (otro worker lo retoma si venció el plazo)
+            EmailSaliente.objects.filter(
+                pk=email.pk, estado='ENVIANDO', intentos=email.intentos
+            ).update(**resultado)
+    finally:
+        if propia:
+            session.close()
+
+    return enviados, fallidos
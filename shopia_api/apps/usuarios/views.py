@@ -1,15 +1,16 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
-from .utils import enviar_email_brevo
+from .utils import encolar_email, obtener_ip
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils import timezone
+from django.utils.html import escape
+from django.conf import settings
 import secrets
 from django.db import models
-from django.db.models import Q
 
 from .models import Usuario, Rol, Bitacora, Notificacion, NotificacionLeida
 from .serializers import (
@@ -28,7 +29,11 @@ from .serializers import (
     NotificacionLeidaSerializer,
     GuardarTokenFCMSerializer,
 )
-from .firebase_service import enviar_push_notifications_masivas
+from . import contador_notificaciones, limite_login
+from .bitacora import escritor_bitacora
+from .filters import BitacoraFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from config.paginacion import CursorOpcional
 
 
 # LOGIN usando correo + password => devuelve access / refresh y usuario
@@ -38,12 +43,32 @@ class LoginJWTView(APIView):
     def post(self, request):
         correo = request.data.get("correo")
         password = request.data.get("password")
+        ip = obtener_ip(request)
+
+        # Límite por IP: se rechaza antes de tocar la BD o verificar el hash
+        if limite_login.ip_excede_limite(ip):
+            return Response(
+                {"detail": "Demasiados intentos de login. Intenta de nuevo en un momento."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(settings.LOGIN_IP_VENTANA)},
+            )
+
+        segundos_bloqueo = limite_login.esta_bloqueado(correo)
+        if segundos_bloqueo:
+            return Response(
+                {
+                    "detail": "Usuario bloqueado por múltiples intentos fallidos",
+                    "bloqueado": True,
+                    "minutos_restantes": segundos_bloqueo // 60,
+                },
+                status=status.HTTP_423_LOCKED,
+            )
 
         # Verificar si existe el usuario
         try:
             usuario = Usuario.objects.get(correo=correo)
 
-            # Verificar si está bloqueado
+            # Bloqueo guardado en la BD (p. ej. de otro proceso o tras reiniciar la caché)
             if usuario.esta_bloqueado():
                 tiempo_restante = (
                     usuario.bloqueado_hasta - timezone.now()
@@ -66,16 +91,18 @@ class LoginJWTView(APIView):
         # Autenticar
         user = authenticate(request, correo=correo, password=password)
         if not user:
-            # Incrementar intentos fallidos
-            usuario.incrementar_intentos_fallidos()
+            # Los intentos se cuentan en caché; la fila solo se escribe al bloquear
+            intentos_restantes, debe_bloquear = limite_login.registrar_fallo(correo, ip)
             registrar_bitacora(
                 usuario,
                 "LOGIN_FALLIDO",
-                f'Intento de login fallido desde {request.META.get("REMOTE_ADDR", "IP desconocida")}',
+                f'Intento de login fallido desde {ip or "IP desconocida"}',
                 request,
             )
 
-            if usuario.intentos_fallidos >= 3:
+            if debe_bloquear:
+                limite_login.bloquear(correo)
+                usuario.bloquear(settings.LOGIN_MAX_INTENTOS, settings.LOGIN_BLOQUEO_MINUTOS)
                 return Response(
                     {
                         "detail": "Usuario bloqueado por múltiples intentos fallidos. Solicita recuperación de contraseña.",
@@ -88,7 +115,7 @@ class LoginJWTView(APIView):
             return Response(
                 {
                     "detail": "Credenciales inválidas",
-                    "intentos_restantes": 3 - usuario.intentos_fallidos,
+                    "intentos_restantes": intentos_restantes,
                 },
                 status=status.HTTP_401_UNAUTHORIZED,
             )
@@ -99,11 +126,12 @@ class LoginJWTView(APIView):
             )
 
         # Login exitoso - resetear intentos fallidos
+        limite_login.limpiar(correo)
         user.resetear_intentos_fallidos()
         registrar_bitacora(
             user,
             "LOGIN",
-            f'Login exitoso desde {request.META.get("REMOTE_ADDR", "IP desconocida")}',
+            f'Login exitoso desde {ip or "IP desconocida"}',
             request,
         )
 
@@ -262,54 +290,43 @@ class SolicitarRecuperacionView(APIView):
                 usuario.token_expira = timezone.now() + timezone.timedelta(hours=1)
                 usuario.save()
 
-                # Enviar email con Brevo
-                try:
-                    enviar_email_brevo(
-                        to_email=correo,
-                        subject="Recuperación de Contraseña - Shopia",
-                        html_content=f"""
-                        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                            <h2 style="color: #1f2937; text-align: center;">Recuperación de Contraseña</h2>
-                            <p>Hola <strong>{usuario.nombre}</strong>,</p>
-                            <p>Has solicitado recuperar tu contraseña en Shopia. Usa el siguiente token para crear una nueva contraseña:</p>
-                            <div style="background: #f3f4f6; padding: 15px; border-radius: 8px; text-align: center; margin: 20px 0;">
-                                <h3 style="color: #2563eb; margin: 0; font-size: 18px;">{token}</h3>
-                            </div>
-                            <p style="color: #ef4444;"><strong>Este token expira en 1 hora.</strong></p>
-                            <p>Si no solicitaste este cambio, ignora este email.</p>
-                            <hr style="margin: 30px 0; border: none; height: 1px; background: #e5e7eb;">
-                            <p style="color: #6b7280; font-size: 14px;">
-                                Saludos,<br>
-                                <strong>Equipo Shopia</strong><br>
-                                Ecommerce potenciado con IA
-                            </p>
+                # Encolar email (lo envía el worker procesar_emails)
+                encolar_email(
+                    to_email=correo,
+                    subject="Recuperación de Contraseña - Shopia",
+                    html_content=f"""
+                    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+                        <h2 style="color: #1f2937; text-align: center;">Recuperación de Contraseña</h2>
+                        <p>Hola <strong>{escape(usuario.nombre)}</strong>,</p>
+                        <p>Has solicitado recuperar tu contraseña en Shopia. Usa el siguiente token para crear una nueva contraseña:</p>
+                        <div style="background: #f3f4f6; padding: 15px; border-radius: 8px; text-align: center; margin: 20px 0;">
+                            <h3 style="color: #2563eb; margin: 0; font-size: 18px;">{token}</h3>
                         </div>
-                        """,
-                    )
-
-                    registrar_bitacora(
-                        usuario,
-                        "SOLICITAR_RECUPERACION",
-                        f'Token de recuperación enviado desde {request.META.get("REMOTE_ADDR", "IP desconocida")}',
-                        request,
-                    )
-
-                    return Response(
-                        {
-                            "detail": "Se ha enviado un token de recuperación a tu email",
-                            "email_enviado": True,
-                        }
-                    )
-
-                except Exception as e:
-                    return Response(
-                        {
-                            "detail": "Error al enviar email",
-                            "error": str(e),
-                            "token_temporal": token,  # Solo para desarrollo
-                        },
-                        status=500,
-                    )
+                        <p style="color: #ef4444;"><strong>Este token expira en 1 hora.</strong></p>
+                        <p>Si no solicitaste este cambio, ignora este email.</p>
+                        <hr style="margin: 30px 0; border: none; height: 1px; background: #e5e7eb;">
+                        <p style="color: #6b7280; font-size: 14px;">
+                            Saludos,<br>
+                            <strong>Equipo Shopia</strong><br>
+                            Ecommerce potenciado con IA
+                        </p>
+                    </div>
+                    """,
+                )
+
+                registrar_bitacora(
+                    usuario,
+                    "SOLICITAR_RECUPERACION",
+                    f'Token de recuperación encolado desde {request.META.get("REMOTE_ADDR", "IP desconocida")}',
+                    request,
+                )
+
+                return Response(
+                    {
+                        "detail": "Se ha enviado un token de recuperación a tu email",
+                        "email_enviado": True,
+                    }
+                )
 
             except Usuario.DoesNotExist:
                 pass
@@ -342,8 +359,10 @@ class ConfirmarRecuperacionView(APIView):
                 usuario.token_recuperacion = None
                 usuario.token_expira = None
                 # Desbloquear usuario y resetear intentos
-                usuario.resetear_intentos_fallidos()
+                usuario.intentos_fallidos = 0
+                usuario.bloqueado_hasta = None
                 usuario.save()
+                limite_login.limpiar(usuario.correo)
 
                 registrar_bitacora(
                     usuario,
@@ -365,10 +384,18 @@ class ConfirmarRecuperacionView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BitacoraPaginacion(CursorOpcional):
+    # Keyset sobre (fecha, id): no usa OFFSET, va por los índices de fecha
+    ordering = ('-fecha', '-id')
+
+
 class BitacoraViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Bitacora.objects.all().select_related("usuario").order_by("-fecha")
+    queryset = Bitacora.objects.all().select_related("usuario").order_by("-fecha", "-id")
     serializer_class = BitacoraSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = BitacoraPaginacion
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = BitacoraFilter
 
 
 # ===================== NOTIFICACIONES =====================
@@ -377,7 +404,12 @@ class NotificacionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Notificacion.objects.all().select_related('creado_por').order_by('-fecha_creacion')
+        return (
+            Notificacion.objects.all()
+            .select_related('creado_por')
+            .con_estadisticas()
+            .order_by('-fecha_creacion')
+        )
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -390,7 +422,7 @@ class NotificacionViewSet(viewsets.ModelViewSet):
         registrar_bitacora(
             self.request.user,
             "NOTIFICACION_CREADA",
-            f'Notificación "{notificacion.titulo}" creada para {notificacion.usuarios.count()} usuarios',
+            f'Notificación "{notificacion.titulo}" creada para {notificacion.total_usuarios_objetivo()} usuarios',
             self.request
         )
 
@@ -413,6 +445,7 @@ class NotificacionViewSet(viewsets.ModelViewSet):
             self.request
         )
         super().perform_destroy(instance)
+        contador_notificaciones.invalidar_todos()
 
     @action(detail=True, methods=['get'])
     def estadisticas(self, request, pk=None):
@@ -425,14 +458,14 @@ class NotificacionViewSet(viewsets.ModelViewSet):
         ).select_related('usuario').order_by('-fecha_lectura')
 
         # Usuarios objetivo que NO han leído
-        usuarios_objetivo = notificacion.usuarios.all()
+        usuarios_objetivo = notificacion.usuarios_objetivo()
         usuarios_leidos = lecturas.values_list('usuario_id', flat=True)
         usuarios_no_leidos = usuarios_objetivo.exclude(id__in=usuarios_leidos)
 
         return Response({
             'notificacion': NotificacionReadSerializer(notificacion).data,
-            'total_objetivo': usuarios_objetivo.count(),
-            'total_leidos': lecturas.count(),
+            'total_objetivo': notificacion.total_usuarios_objetivo(),
+            'total_leidos': notificacion.total_lecturas(),
             'total_no_leidos': usuarios_no_leidos.count(),
             'porcentaje_leido': notificacion.porcentaje_leido(),
             'lecturas_recientes': NotificacionLeidaSerializer(
@@ -446,8 +479,10 @@ class NotificacionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def resumen(self, request):
         """Resumen general de notificaciones"""
-        total_notificaciones = Notificacion.objects.count()
-        notificaciones_activas = Notificacion.objects.filter(estado=True).count()
+        conteos = Notificacion.objects.aggregate(
+            total=models.Count('id'),
+            activas=models.Count('id', filter=models.Q(estado=True)),
+        )
         total_lecturas = NotificacionLeida.objects.count()
         
         # Notificaciones más leídas (últimos 30 días)
@@ -456,13 +491,11 @@ class NotificacionViewSet(viewsets.ModelViewSet):
         
         mas_leidas = Notificacion.objects.filter(
             fecha_creacion__gte=hace_30_dias
-        ).annotate(
-            total_lecturas=models.Count('lecturas')
-        ).order_by('-total_lecturas')[:5]
+        ).select_related('creado_por').con_estadisticas().order_by('-num_lecturas')[:5]
 
         return Response({
-            'total_notificaciones': total_notificaciones,
-            'notificaciones_activas': notificaciones_activas,
+            'total_notificaciones': conteos['total'],
+            'notificaciones_activas': conteos['activas'],
             'total_lecturas': total_lecturas,
             'notificaciones_mas_leidas': NotificacionReadSerializer(
                 mas_leidas, many=True
@@ -479,16 +512,15 @@ class NotificacionClienteViewSet(viewsets.ReadOnlyModelViewSet):
         user = self.request.user
         
         # Verificar que el usuario es cliente
-        if not user.roles.filter(nombre='cliente').exists():
+        if not user.tiene_rol('cliente'):
             return Notificacion.objects.none()
 
-        return Notificacion.objects.filter(
-            usuarios=user,
-            estado=True,
-            fecha_inicio__lte=timezone.now()
-        ).filter(
-            Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=timezone.now())
-        ).order_by('-fecha_creacion')
+        return (
+            Notificacion.objects.vigentes()
+            .dirigidas_a(user)
+            .con_lectura_de(user)
+            .order_by('-fecha_creacion')
+        )
 
     @action(detail=True, methods=['post'])
     def marcar_leida(self, request, pk=None):
@@ -497,14 +529,14 @@ class NotificacionClienteViewSet(viewsets.ReadOnlyModelViewSet):
         user = request.user
         
         # Verificar que el usuario es cliente
-        if not user.roles.filter(nombre='cliente').exists():
+        if not user.tiene_rol('cliente'):
             return Response(
                 {'detail': 'Solo los clientes pueden marcar notificaciones como leídas'},
                 status=status.HTTP_403_FORBIDDEN
             )
 
         # Verificar que la notificación está dirigida a este usuario
-        if not notificacion.usuarios.filter(id=user.id).exists():
+        if not notificacion.es_para(user):
             return Response(
                 {'detail': 'Esta notificación no está dirigida a ti'},
                 status=status.HTTP_403_FORBIDDEN
@@ -520,6 +552,7 @@ class NotificacionClienteViewSet(viewsets.ReadOnlyModelViewSet):
         )
 
         if creada:
+            contador_notificaciones.decrementar(user.id)
             registrar_bitacora(
                 user,
                 "NOTIFICACION_LEIDA",
@@ -541,19 +574,13 @@ class NotificacionClienteViewSet(viewsets.ReadOnlyModelViewSet):
         """Obtener solo notificaciones no leídas"""
         user = request.user
         
-        if not user.roles.filter(nombre='cliente').exists():
+        if not user.tiene_rol('cliente'):
             return Response([])
 
         # Notificaciones activas no leídas por el usuario
-        no_leidas = Notificacion.objects.filter(
-            usuarios=user,
-            estado=True,
-            fecha_inicio__lte=timezone.now()
-        ).filter(
-            Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=timezone.now())
-        ).exclude(
+        no_leidas = Notificacion.objects.vigentes().dirigidas_a(user).exclude(
             lecturas__usuario=user
-        ).order_by('-fecha_creacion')
+        ).con_lectura_de(user).order_by('-fecha_creacion')
 
         serializer = self.get_serializer(no_leidas, many=True)
         return Response({
@@ -561,25 +588,41 @@ class NotificacionClienteViewSet(viewsets.ReadOnlyModelViewSet):
             'results': serializer.data
         })
 
+    @action(detail=False, methods=['get'])
+    def conteo_no_leidas(self, request):
+        """
+        Solo el número de no leídas (para el badge), desde la caché.
+        Soporta If-None-Match: si no cambió responde 304 sin cuerpo.
+        """
+        user = request.user
+
+        if not user.tiene_rol('cliente'):
+            return Response({'count': 0})
+
+        total, generacion = contador_notificaciones.obtener_no_leidas(user)
+        etag = f'W/"{generacion}-{total}"'
+
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({'count': total})
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
     @action(detail=False, methods=['post'])
     def marcar_todas_leidas(self, request):
         """Marcar todas las notificaciones como leídas"""
         user = request.user
         
-        if not user.roles.filter(nombre='cliente').exists():
+        if not user.tiene_rol('cliente'):
             return Response(
                 {'detail': 'Solo los clientes pueden marcar notificaciones como leídas'},
                 status=status.HTTP_403_FORBIDDEN
             )
 
         # Obtener notificaciones no leídas
-        notificaciones_no_leidas = Notificacion.objects.filter(
-            usuarios=user,
-            estado=True,
-            fecha_inicio__lte=timezone.now()
-        ).filter(
-            Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=timezone.now())
-        ).exclude(
+        notificaciones_no_leidas = Notificacion.objects.vigentes().dirigidas_a(user).exclude(
             lecturas__usuario=user
         )
 
@@ -603,6 +646,8 @@ class NotificacionClienteViewSet(viewsets.ReadOnlyModelViewSet):
                 request
             )
 
+        contador_notificaciones.reiniciar(user.id)
+
         return Response({
             'detail': f'{len(lecturas_nuevas)} notificaciones marcadas como leídas'
         })
@@ -647,12 +692,9 @@ class GuardarTokenFCMView(APIView):
 
 # Función helper para registrar en bitácora
 def registrar_bitacora(usuario, accion, descripcion="", request=None):
-    ip = None
-    if request:
-        ip = request.META.get("HTTP_X_FORWARDED_FOR", request.META.get("REMOTE_ADDR"))
-        if ip and ',' in ip:
-            ip = ip.split(',')[0].strip()
-    
-    Bitacora.objects.create(
+    ip = obtener_ip(request) if request else None
+
+    # Se encola y se guarda en lote desde segundo plano
+    escritor_bitacora.registrar(Bitacora(
         usuario=usuario, accion=accion, descripcion=descripcion, ip=ip
-    )
\ No newline at end of file
+    ))
\ No newline at end of file
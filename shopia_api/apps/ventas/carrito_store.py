@@ -0,0 +1,216 @@
+# Almacenamiento del carrito.
+# Un carrito es un dict {producto_id: {'cantidad', 'precio_unitario'}} y se
+# guarda en uno de dos "stores" con la misma interfaz (leer / escribir /
+# persistir / olvidar):
+#   - CarritoBD: directo en Carrito / ItemCarrito. Los invitados (X-Carrito-Id)
+#     siempre van aquí, en un Carrito sin usuario con token_invitado.
+#   - CarritoCache: solo usuarios y solo con CARRITO_WRITE_BEHIND (requiere
+#     caché compartida, CACHE_URL). Cada cambio queda en la caché y el
+#     EscritorCarritos lo baja a la BD por lotes cada CARRITO_FLUSH_INTERVALO.
+# Cada escritura en la caché lleva una versión. El escritor y el checkout
+# bloquean la fila del Carrito (select_for_update) y el escritor recién ahí
+# compara su versión con la de la caché: si el checkout ya cambió la BD (y la
+# versión), el estado pendiente viejo no se vuelve a escribir.
+import atexit
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from apps.productos.models import Producto
+from .models import Carrito, ItemCarrito
+
+
+def items_en_bd(**carrito):
+    """Items del carrito filtrado por usuario_id o token_invitado"""
+    filtro = {f'carrito__{campo}': valor for campo, valor in carrito.items()}
+    return {
+        item.producto_id: {'cantidad': item.cantidad, 'precio_unitario': item.precio_unitario}
+        for item in ItemCarrito.objects.filter(**filtro).only('producto_id', 'cantidad', 'precio_unitario')
+    }
+
+
+def bloquear_carrito(**carrito):
+    """Trae (o crea) el carrito y bloquea su fila hasta el final de la transacción"""
+    existente, _ = Carrito.objects.get_or_create(**carrito)
+    return Carrito.objects.select_for_update().get(pk=existente.pk)
+
+
+def guardar_items_en_bd(items, **carrito):
+    """Deja los ItemCarrito del carrito igual a `items` (borra, actualiza y crea por lotes)"""
+    with transaction.atomic():
+        carrito = bloquear_carrito(**carrito)
+        existentes = {item.producto_id: item for item in ItemCarrito.objects.filter(carrito=carrito)}
+
+        borrar = [item.id for producto_id, item in existentes.items() if producto_id not in items]
+        nuevos = set(items) - set(existentes)
+        # Productos eliminados mientras estaban en el carrito
+        validos = set(Producto.objects.filter(id__in=nuevos).values_list('id', flat=True)) if nuevos else set()
+
+        actualizar, crear = [], []
+        for producto_id, datos in items.items():
+            item = existentes.get(producto_id)
+            if item is None:
+                if producto_id in validos:
+                    crear.append(ItemCarrito(carrito=carrito, producto_id=producto_id, **datos))
+            elif item.cantidad != datos['cantidad'] or item.precio_unitario != datos['precio_unitario']:
+                item.cantidad = datos['cantidad']
+                item.precio_unitario = datos['precio_unitario']
+                actualizar.append(item)
+
+        if borrar:
+            ItemCarrito.objects.filter(id__in=borrar).delete()
+        if actualizar:
+            ItemCarrito.objects.bulk_update(actualizar, ['cantidad', 'precio_unitario'])
+        if crear:
+            ItemCarrito.objects.bulk_create(crear)
+        carrito.save(update_fields=['fecha_actualizacion'])
+
+
+class CarritoBD:
+    def __init__(self, usuario_id=None, token_invitado=None):
+        self.carrito = {'usuario_id': usuario_id} if usuario_id else {'token_invitado': token_invitado}
+
+    def leer(self):
+        return items_en_bd(**self.carrito)
+
+    def escribir(self, items):
+        guardar_items_en_bd(items, **self.carrito)
+
+    def persistir(self):
+        pass
+
+    def olvidar(self):
+        # El de invitado ya se sumó al del usuario (fusionar)
+        if 'token_invitado' in self.carrito:
+            Carrito.objects.filter(usuario__isnull=True, **self.carrito).delete()
+
+
+class CarritoCache:
+    def __init__(self, usuario_id):
+        self.clave = f"carrito:usuario:{usuario_id}"
+        self.usuario_id = usuario_id
+
+    def leer(self):
+        estado = cache.get(self.clave)
+        if estado is None:
+            pendiente = escritor_carritos.pendiente(self.usuario_id)
+            estado = pendiente or {'version': time.time_ns(), 'items': items_en_bd(usuario_id=self.usuario_id)}
+            cache.set(self.clave, estado, settings.CARRITO_CACHE_TTL)
+        return dict(estado['items'])
+
+    def escribir(self, items):
+        estado = {'version': time.time_ns(), 'items': items}
+        cache.set(self.clave, estado, settings.CARRITO_CACHE_TTL)
+        escritor_carritos.marcar(self.usuario_id, self.clave, estado)
+
+    def persistir(self):
+        """Baja a la BD ya mismo (en el checkout, con el carrito bloqueado)"""
+        escritor_carritos.descartar(self.usuario_id)
+        guardar_items_en_bd(self.leer(), usuario_id=self.usuario_id)
+
+    def olvidar(self):
+        """
+        Tras cambiar la BD por fuera (checkout) recarga la caché desde la BD con
+        una versión nueva, así ningún pendiente viejo (de este u otro proceso)
+        vuelve a escribir encima. El checkout lo llama con el carrito bloqueado.
+        """
+        escritor_carritos.descartar(self.usuario_id)
+        estado = {'version': time.time_ns(), 'items': items_en_bd(usuario_id=self.usuario_id)}
+        cache.set(self.clave, estado, settings.CARRITO_CACHE_TTL)
+
+
+def carrito_de_usuario(usuario_id):
+    if settings.CARRITO_WRITE_BEHIND:
+        return CarritoCache(usuario_id)
+    return CarritoBD(usuario_id=usuario_id)
+
+
+def carrito_invitado(token_invitado):
+    return CarritoBD(token_invitado=token_invitado)
+
+
+def fusionar(origen, destino):
+    """Suma el carrito de invitado al del usuario (al iniciar sesión) y borra el de invitado"""
+    items_origen = origen.leer()
+    if not items_origen:
+        return
+    items = destino.leer()
+    for producto_id, datos in items_origen.items():
+        if producto_id in items:
+            items[producto_id] = {**items[producto_id], 'cantidad': items[producto_id]['cantidad'] + datos['cantidad']}
+        else:
+            items[producto_id] = datos
+    destino.escribir(items)
+    origen.olvidar()
+
+
+class EscritorCarritos:
+    """Guarda en la BD, cada cierto intervalo, los carritos de usuario modificados en la caché"""
+
+    def __init__(self):
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pid = None
+
+    def marcar(self, usuario_id, clave, estado):
+        with self._lock:
+            self._pendientes[usuario_id] = (clave, estado)
+        self._asegurar_hilo()
+
+    def pendiente(self, usuario_id):
+        with self._lock:
+            clave_estado = self._pendientes.get(usuario_id)
+        return clave_estado[1] if clave_estado else None
+
+    def descartar(self, usuario_id):
+        with self._lock:
+            self._pendientes.pop(usuario_id, None)
+
+    def vaciar(self):
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+
+        for usuario_id, (clave, estado) in pendientes.items():
+            try:
+                self._guardar(usuario_id, clave, estado)
+            except Exception as e:
+                print(f"❌ Error al guardar el carrito del usuario {usuario_id}: {e}")
+        return len(pendientes)
+
+    def _guardar(self, usuario_id, clave, estado):
+        with transaction.atomic():
+            # Con la fila bloqueada un checkout no puede estar a mitad de camino:
+            # o ya terminó (y cambió la versión) o espera a que esto termine
+            bloquear_carrito(usuario_id=usuario_id)
+            actual = cache.get(clave)
+            if actual is not None and actual['version'] != estado['version']:
+                return  # hay un estado más nuevo: lo guardará quien lo escribió
+            guardar_items_en_bd(estado['items'], usuario_id=usuario_id)
+
+    def _asegurar_hilo(self):
+        # Igual que en la bitácora: un hilo por proceso (gunicorn --preload hace fork)
+        if self._pid == os.getpid() and self._hilo and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo and self._hilo.is_alive():
+                return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._bucle, name='carritos-escritor', daemon=True)
+            self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            time.sleep(settings.CARRITO_FLUSH_INTERVALO)
+            try:
+                self.vaciar()
+            finally:
+                connection.close()
+
+
+escritor_carritos = EscritorCarritos()
+atexit.register(escritor_carritos.vaciar)
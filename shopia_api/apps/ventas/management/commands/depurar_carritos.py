@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.ventas.models import Carrito
+
+
+class Command(BaseCommand):
+    help = "Borra los carritos de invitado que no cambiaron en CARRITO_INVITADO_DIAS días"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.CARRITO_INVITADO_DIAS,
+                            help='Días sin cambios después de los que se borra un carrito de invitado')
+
+    def handle(self, *args, **options):
+        corte = timezone.now() - timedelta(days=options['dias'])
+        borrados, _ = Carrito.objects.filter(usuario__isnull=True, fecha_actualizacion__lt=corte).delete()
+        self.stdout.write(f"🗑️ Carritos de invitado eliminados (con sus items): {borrados}")
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0008_producto_precio_final'),
+        ('ventas', '0003_alter_venta_fecha'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detalleventa',
+            index=models.Index(fields=['venta', 'producto'], include=('cantidad', 'precio_unitario'), name='detalle_venta_producto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['-fecha', '-id'], name='venta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['usuario', '-fecha', '-id'], name='venta_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(condition=models.Q(('estado', 'PAGADA')), fields=['estado', 'fecha'], name='venta_pagada_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0004_indices_ventas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carrito',
+            name='token_invitado',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='Token de Invitado'),
+        ),
+        migrations.AlterField(
+            model_name='carrito',
+            name='usuario',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='carrito', to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+        ),
+    ]
@@ -20,7 +20,8 @@ class Venta(models.Model):
         'usuarios.Usuario', 
         on_delete=models.PROTECT,
         related_name="ventas",
-        verbose_name="Usuario"
+        verbose_name="Usuario",
+        db_index=False,  # lo cubre venta_usuario_fecha_idx
     )
     # CAMBIO: Ahora permite fecha manual o automática
     fecha = models.DateTimeField(
@@ -57,6 +58,18 @@ class Venta(models.Model):
         verbose_name = "Venta"
         verbose_name_plural = "Ventas"
         ordering = ['-fecha']
+        indexes = [
+            # Listado de ventas y reportes por rango de fechas
+            models.Index(fields=['-fecha', '-id'], name='venta_fecha_idx'),
+            # Compras de un cliente
+            models.Index(fields=['usuario', '-fecha', '-id'], name='venta_usuario_fecha_idx'),
+            # Reportes y predicciones: solo ventas pagadas por fecha
+            models.Index(
+                fields=['estado', 'fecha'],
+                condition=models.Q(estado='PAGADA'),
+                name='venta_pagada_fecha_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Venta #{self.id} - {self.usuario.correo}"
@@ -67,7 +80,8 @@ class DetalleVenta(models.Model):
         Venta,
         on_delete=models.CASCADE, 
         related_name="detalles",
-        verbose_name="Venta"
+        verbose_name="Venta",
+        db_index=False,  # lo cubre detalle_venta_producto_idx
     )
     producto = models.ForeignKey(
         'productos.Producto', 
@@ -85,6 +99,14 @@ class DetalleVenta(models.Model):
     class Meta:
         verbose_name = "Detalle de Venta"
         verbose_name_plural = "Detalles de Venta"
+        indexes = [
+            # Totales por producto/categoría sin leer la tabla (INCLUDE solo en PostgreSQL)
+            models.Index(
+                fields=['venta', 'producto'],
+                include=['cantidad', 'precio_unitario'],
+                name='detalle_venta_producto_idx',
+            ),
+        ]
 
     def __str__(self):
         try:
@@ -141,12 +163,16 @@ class Pago(models.Model):
         return f"Pago de {self.monto} para Venta #{self.venta.id} ({self.get_estado_display()})"
 
 class Carrito(models.Model):
+    # Sin usuario = carrito de invitado, identificado por token_invitado (header X-Carrito-Id)
     usuario = models.OneToOneField(
         'usuarios.Usuario',
         on_delete=models.CASCADE,
         related_name="carrito",
-        verbose_name="Usuario"
+        verbose_name="Usuario",
+        null=True,
+        blank=True
     )
+    token_invitado = models.UUIDField(null=True, blank=True, unique=True, editable=False, verbose_name="Token de Invitado")
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
 
@@ -155,13 +181,23 @@ class Carrito(models.Model):
         verbose_name_plural = "Carritos"
 
     def __str__(self):
+        if self.usuario_id is None:
+            return f"Carrito de invitado {self.token_invitado}"
         return f"Carrito de {self.usuario.correo}"
 
     def total_items(self):
-        return sum(item.cantidad for item in self.items.all())
+        return self.totales()[0]
 
     def total_precio(self):
-        return sum(item.subtotal() for item in self.items.all())
+        return self.totales()[1]
+
+    def totales(self):
+        """(total_items, total_precio) en una sola pasada sobre items.all() (usa el prefetch si existe)"""
+        total_items, total_precio = 0, 0
+        for item in self.items.all():
+            total_items += item.cantidad
+            total_precio += item.subtotal()
+        return total_items, total_precio
 
 class ItemCarrito(models.Model):
     carrito = models.ForeignKey(
@@ -1,10 +1,29 @@
 from rest_framework import serializers
 from .models import TipoPago, Carrito, ItemCarrito, Venta, DetalleVenta, Pago
 from apps.productos.models import Producto  # Cambia esta línea
-from apps.productos.serializers import ProductoSerializer  # Cambia esta línea
+from apps.productos.serializers import ProductoSerializer, CategoriaSerializer, ImagenProductoSerializer
+
+class ProductoCarritoSerializer(serializers.ModelSerializer):
+    """Producto resumido para el carrito: imagenes trae solo la primera"""
+    categoria = CategoriaSerializer(read_only=True)
+    imagenes = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Producto
+        fields = [
+            'id', 'marca', 'nombre', 'precio', 'descuento', 'precio_final', 'stock',
+            'url_imagen_principal', 'categoria', 'imagenes'
+        ]
+
+    def get_imagenes(self, obj):
+        # CarritoViewSet la deja precargada en primera_imagen
+        imagenes = getattr(obj, 'primera_imagen', None)
+        if imagenes is None:
+            imagenes = obj.imagenes.order_by('id')[:1]
+        return ImagenProductoSerializer(imagenes, many=True).data
 
 class ItemCarritoSerializer(serializers.ModelSerializer):
-    producto = ProductoSerializer(read_only=True)
+    producto = ProductoCarritoSerializer(read_only=True)
     producto_id = serializers.PrimaryKeyRelatedField(
         queryset=Producto.objects.all(),
         source='producto',
@@ -27,12 +46,27 @@ class CarritoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Carrito
         fields = ['id', 'usuario', 'fecha_creacion', 'items', 'total_items', 'total_precio']
+        read_only_fields = ['usuario']
 
     def get_total_items(self, obj):
-        return obj.total_items()
+        return obj.totales()[0]
 
     def get_total_precio(self, obj):
-        return obj.total_precio()
+        return obj.totales()[1]
+
+class ItemSyncSerializer(serializers.Serializer):
+    producto_id = serializers.IntegerField()
+    cantidad = serializers.IntegerField(min_value=0)  # 0 = quitar del carrito
+
+class SincronizarCarritoSerializer(serializers.Serializer):
+    items = ItemSyncSerializer(many=True, allow_empty=True)
+    # True: los productos que no vengan en items se quitan del carrito
+    reemplazar = serializers.BooleanField(default=False)
+
+    def validate_items(self, value):
+        if len(value) > 100:
+            raise serializers.ValidationError("Máximo 100 productos por sincronización.")
+        return value
 
 class TipoPagoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -46,8 +80,8 @@ class DetalleVentaSerializer(serializers.ModelSerializer):
         model = DetalleVenta
         fields = ['id', 'producto', 'precio_unitario', 'cantidad']
 
-class VentaSerializer(serializers.ModelSerializer):
-    detalles = DetalleVentaSerializer(many=True, read_only=True)
+class VentaResumenSerializer(serializers.ModelSerializer):
+    """Venta sin los detalles (listados con ?view=summary)"""
     usuario = serializers.StringRelatedField(read_only=True)
     pagos = serializers.SerializerMethodField()
 
@@ -55,11 +89,19 @@ class VentaSerializer(serializers.ModelSerializer):
         model = Venta
         fields = [
             'id', 'usuario', 'fecha', 'monto_total', 'direccion', 
-            'numero_int', 'estado', 'detalles', 'pagos'
+            'numero_int', 'estado', 'pagos'
         ]
 
     def get_pagos(self, obj):
-        return obj.pagos.count()
+        # VentaViewSet lo deja anotado en num_pagos
+        num_pagos = getattr(obj, 'num_pagos', None)
+        return obj.pagos.count() if num_pagos is None else num_pagos
+
+class VentaSerializer(VentaResumenSerializer):
+    detalles = DetalleVentaSerializer(many=True, read_only=True)
+
+    class Meta(VentaResumenSerializer.Meta):
+        fields = VentaResumenSerializer.Meta.fields + ['detalles']
 
 class CrearVentaSerializer(serializers.Serializer):
     direccion = serializers.CharField(max_length=255)
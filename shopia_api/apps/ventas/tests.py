@@ -1,3 +1,296 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.monitoreo.presupuesto import presupuesto_consultas
+from apps.productos.models import Categoria, ImagenProducto, Producto
+from apps.usuarios.models import Rol, Usuario
+from .carrito_store import escritor_carritos
+from .models import Carrito, DetalleVenta, ItemCarrito, Pago, TipoPago, Venta
+from .serializers import SincronizarCarritoSerializer
+from .views import CarritoViewSet
+
+URL_CARRITO = '/api/ventas/carrito/'
+
+
+def crear_cliente(correo='cliente@shopia.test'):
+    usuario = Usuario.objects.create_user(correo, password='clave-segura-123')
+    usuario.roles.add(Rol.objects.get_or_create(nombre='cliente')[0])
+    return usuario
+
+
+def crear_admin(correo='admin@shopia.test'):
+    usuario = Usuario.objects.create_user(correo, password='clave-segura-123', is_staff=True)
+    usuario.roles.add(Rol.objects.get_or_create(nombre='admin')[0])
+    return usuario
+
+
+def cliente_jwt(usuario):
+    # JWT real: en GET el usuario y sus roles salen de la caché (usuarios/autenticacion.py)
+    return APIClient(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(usuario).access_token}')
+
+
+def crear_productos(cantidad, stock=10):
+    categoria = Categoria.objects.create(nombre='Electrónica')
+    return [
+        Producto.objects.create(
+            nombre=f'Producto {i}', descripcion='-', precio=Decimal('100.00'), stock=stock, categoria=categoria
+        )
+        for i in range(cantidad)
+    ]
+
+
+class CarritoTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_cliente()
+        self.productos = crear_productos(3)
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.usuario)
+
+    def agregar(self, cliente, producto, cantidad=1, **extra):
+        return cliente.post(
+            URL_CARRITO + 'agregar-producto/', {'producto_id': producto.id, 'cantidad': cantidad}, format='json', **extra
+        )
+
+
+class PermisosCarritoTests(CarritoTestCase):
+    def test_anonimo_no_puede_crear_carrito_de_otro_usuario(self):
+        respuesta = APIClient().post(URL_CARRITO, {'usuario': self.usuario.id}, format='json')
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertFalse(Carrito.objects.exists())
+
+    def test_usuario_no_se_puede_asignar_por_el_serializer(self):
+        otro = crear_cliente('otro@shopia.test')
+        respuesta = self.cliente.post(URL_CARRITO, {'usuario': otro.id}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(Carrito.objects.filter(usuario=otro).exists())
+
+    def test_invitado_no_puede_finalizar_compra(self):
+        respuesta = APIClient().post(URL_CARRITO + 'finalizar-compra/', {}, format='json')
+        self.assertEqual(respuesta.status_code, 401)
+
+
+class CarritoInvitadoTests(CarritoTestCase):
+    def test_carrito_de_invitado_se_guarda_en_bd_y_se_suma_al_iniciar_sesion(self):
+        respuesta = self.agregar(APIClient(), self.productos[0], 2)
+        self.assertEqual(respuesta.status_code, 201)
+        token = respuesta['X-Carrito-Id']
+        self.assertTrue(Carrito.objects.filter(usuario__isnull=True, token_invitado=token).exists())
+
+        # Otra "instancia" del cliente (sin caché) ve el mismo carrito
+        cache.clear()
+        respuesta = APIClient().get(URL_CARRITO, HTTP_X_CARRITO_ID=token)
+        self.assertEqual(respuesta.data['total_items'], 2)
+
+        self.agregar(self.cliente, self.productos[0], 1)
+        respuesta = self.cliente.get(URL_CARRITO, HTTP_X_CARRITO_ID=token)
+        self.assertEqual(respuesta.data['total_items'], 3)
+        self.assertEqual(respuesta.data['items'][0]['id'], self.productos[0].id)
+        self.assertFalse(Carrito.objects.filter(token_invitado=token).exists())
+
+
+class SincronizarCarritoTests(CarritoTestCase):
+    def sync(self, items, url=URL_CARRITO + 'sync/', **datos):
+        return self.cliente.post(url, {'items': items, **datos}, format='json')
+
+    def cantidades(self):
+        return dict(ItemCarrito.objects.filter(carrito__usuario=self.usuario).values_list('producto_id', 'cantidad'))
+
+    def test_aplica_altas_cambios_y_bajas(self):
+        uno, dos, tres = self.productos
+        self.agregar(self.cliente, uno, 1)
+        self.agregar(self.cliente, dos, 1)
+
+        respuesta = self.sync([
+            {'producto_id': uno.id, 'cantidad': 4},
+            {'producto_id': dos.id, 'cantidad': 0},
+            {'producto_id': tres.id, 'cantidad': 2},
+        ])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.cantidades(), {uno.id: 4, tres.id: 2})
+        self.assertEqual(respuesta.data['total_items'], 6)
+
+    def test_un_producto_sin_stock_rechaza_todo_el_lote(self):
+        uno, dos, tres = self.productos
+        self.agregar(self.cliente, uno, 1)
+
+        respuesta = self.sync([
+            {'producto_id': uno.id, 'cantidad': 3},
+            {'producto_id': dos.id, 'cantidad': 11},  # stock 10
+            {'producto_id': tres.id, 'cantidad': 1},
+        ])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([e['producto_id'] for e in respuesta.data['errores']], [dos.id])
+        self.assertEqual(self.cantidades(), {uno.id: 1})
+
+    def test_valida_el_stock_con_una_consulta(self):
+        self.cliente.get(URL_CARRITO)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.sync(
+                [{'producto_id': producto.id, 'cantidad': 2} for producto in self.productos],
+                url=URL_CARRITO + 'sync/?view=summary',
+            )
+        self.assertEqual(respuesta.status_code, 200)
+        # La otra lectura de productos es la de carrito_store (solo ids, por si se borró alguno)
+        stock = f'"{Producto._meta.db_table}"."stock"'
+        self.assertEqual(len([c for c in consultas.captured_queries if stock in c['sql']]), 1)
+
+    def test_mas_de_100_productos_se_rechaza(self):
+        items = [{'producto_id': i, 'cantidad': 1} for i in range(1, 102)]
+        serializer = SincronizarCarritoSerializer(data={'items': items})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('items', serializer.errors)
+
+        self.assertEqual(self.sync(items).status_code, 400)
+        self.assertTrue(SincronizarCarritoSerializer(data={'items': items[:100]}).is_valid())
+
+    def test_devuelve_el_carrito_una_sola_vez(self):
+        uno, dos, _ = self.productos
+        with mock.patch.object(CarritoViewSet, '_responder', autospec=True, side_effect=CarritoViewSet._responder) as responder:
+            respuesta = self.sync([{'producto_id': uno.id, 'cantidad': 1}, {'producto_id': dos.id, 'cantidad': 2}])
+        responder.assert_called_once()
+        self.assertEqual(sorted(item['id'] for item in respuesta.data['items']), [uno.id, dos.id])
+
+
+class PrecioFinalCarritoTests(CarritoTestCase):
+    def test_carrito_y_compra_cobran_el_precio_final(self):
+        producto = self.productos[0]
+        producto.descuento = 0.25
+        producto.save(update_fields=['descuento'])
+        tipo_pago = TipoPago.objects.create(nombre='Efectivo')
+
+        respuesta = self.agregar(self.cliente, producto, 2)
+        self.assertEqual(respuesta.data['total_precio'], Decimal('150.00'))
+        self.assertEqual(ItemCarrito.objects.get().precio_unitario, Decimal('75.00'))
+
+        respuesta = self.cliente.post(
+            URL_CARRITO + 'finalizar-compra/', {'direccion': 'Calle 1', 'tipo_pago_id': tipo_pago.id}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        venta = Venta.objects.get()
+        self.assertEqual(venta.monto_total, Decimal('150.00'))
+        self.assertEqual(venta.detalles.get().precio_unitario, Decimal('75.00'))
+
+
+@override_settings(CARRITO_WRITE_BEHIND=True, CARRITO_FLUSH_INTERVALO=3600)
+class CarritoWriteBehindTests(CarritoTestCase):
+    def test_escritura_pendiente_vieja_no_revive_el_carrito_comprado(self):
+        tipo_pago = TipoPago.objects.create(nombre='Efectivo')
+        self.agregar(self.cliente, self.productos[0], 2)
+        clave = f"carrito:usuario:{self.usuario.id}"
+        pendiente = escritor_carritos.pendiente(self.usuario.id)
+        self.assertIsNotNone(pendiente)
+
+        respuesta = self.cliente.post(
+            URL_CARRITO + 'finalizar-compra/', {'direccion': 'Calle 1', 'tipo_pago_id': tipo_pago.id}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(Venta.objects.count(), 1)
+
+        # Un flush que leyó el estado antes del checkout llega tarde
+        escritor_carritos._guardar(self.usuario.id, clave, pendiente)
+        self.assertFalse(ItemCarrito.objects.filter(carrito__usuario=self.usuario).exists())
+        self.assertEqual(self.cliente.get(URL_CARRITO).data['total_items'], 0)
+
+    def test_vaciar_baja_los_carritos_pendientes_a_la_bd(self):
+        self.agregar(self.cliente, self.productos[1], 3)
+        self.assertFalse(ItemCarrito.objects.exists())
+        escritor_carritos.vaciar()
+        item = ItemCarrito.objects.get(carrito__usuario=self.usuario)
+        self.assertEqual((item.producto_id, item.cantidad), (self.productos[1].id, 3))
+
+
+class CarritoConsultasTests(TestCase):
+    """GET del carrito con consultas fijas, sin importar cuántos items tenga"""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_cliente()
+        self.cliente = cliente_jwt(self.usuario)
+
+    def llenar_carrito(self, cantidad):
+        for producto in crear_productos(cantidad):
+            for orden in range(2):
+                ImagenProducto.objects.create(producto=producto, url=f'https://img.test/{producto.id}/{orden}.jpg')
+            respuesta = self.cliente.post(
+                URL_CARRITO + 'agregar-producto/', {'producto_id': producto.id, 'cantidad': 2}, format='json'
+            )
+            self.assertEqual(respuesta.status_code, 201)
+        self.cliente.get(URL_CARRITO + '?view=summary')  # deja el usuario en la caché
+
+    def test_carrito_completo(self):
+        self.llenar_carrito(8)
+        # items, productos + categoría, primera imagen de cada producto
+        with self.assertNumQueries(3):
+            respuesta = self.cliente.get(URL_CARRITO)
+        self.assertEqual(len(respuesta.data['items']), 8)
+        self.assertEqual(respuesta.data['total_items'], 16)
+        self.assertTrue(all(len(item['producto']['imagenes']) == 1 for item in respuesta.data['items']))
+
+    def test_resumen(self):
+        self.llenar_carrito(8)
+        with self.assertNumQueries(1):
+            respuesta = self.cliente.get(URL_CARRITO + '?view=summary')
+        self.assertEqual(respuesta.data, {'total_items': 16, 'total_precio': Decimal('1600.00')})
+
+    @override_settings(CARRITO_WRITE_BEHIND=True, CARRITO_FLUSH_INTERVALO=3600)
+    def test_write_behind_lee_el_carrito_de_la_cache(self):
+        self.llenar_carrito(8)
+        with self.assertNumQueries(0):
+            self.cliente.get(URL_CARRITO + '?view=summary')
+        with self.assertNumQueries(2):
+            respuesta = self.cliente.get(URL_CARRITO)
+        self.assertEqual(len(respuesta.data['items']), 8)
+
+
+# (quién, url, máximo de consultas con la caché caliente)
+PRESUPUESTOS = [
+    ('cliente', '/api/ventas/carrito/', 3),
+    ('cliente', '/api/ventas/carrito/?view=summary', 1),
+    ('cliente', '/api/ventas/ventas/?page_size=50', 4),
+    ('admin', '/api/ventas/ventas/?page_size=50', 4),
+    ('admin', '/api/ventas/ventas/?page_size=50&view=summary', 2),
+]
+
+
+class PresupuestoConsultasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuarios = {'cliente': crear_cliente(), 'admin': crear_admin()}
+        otro = crear_cliente('otro@shopia.test')
+        productos = crear_productos(6)
+        for producto in productos:
+            ImagenProducto.objects.create(producto=producto, url=f'https://img.test/{producto.id}.jpg')
+        tipo_pago = TipoPago.objects.create(nombre='Efectivo')
+
+        for i in range(30):
+            venta = Venta.objects.create(
+                usuario=cls.usuarios['cliente'] if i % 2 else otro,
+                monto_total=Decimal('300.00'), direccion='Calle 1', estado='PAGADA',
+            )
+            for producto in productos[i % 3:i % 3 + 3]:
+                DetalleVenta.objects.create(venta=venta, producto=producto, precio_unitario=producto.precio_final, cantidad=1)
+            Pago.objects.create(venta=venta, tipo_pago=tipo_pago, monto=venta.monto_total, estado='COMPLETADO')
+
+        carrito = Carrito.objects.create(usuario=cls.usuarios['cliente'])
+        for producto in productos:
+            ItemCarrito.objects.create(carrito=carrito, producto=producto, precio_unitario=producto.precio_final, cantidad=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_presupuestos(self):
+        clientes = {rol: cliente_jwt(usuario) for rol, usuario in self.usuarios.items()}
+        for rol, url, maximo in PRESUPUESTOS:
+            with self.subTest(rol=rol, url=url):
+                clientes[rol].get(url)  # calentar cachés
+                with presupuesto_consultas(maximo, url):
+                    respuesta = clientes[rol].get(url)
+                self.assertEqual(respuesta.status_code, 200)
@@ -1,25 +1,30 @@
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, response, status
 from rest_framework.decorators import action
-from django.db.models import ProtectedError
+from django.db.models import ProtectedError, Prefetch, Count
 from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
 import stripe
+import time
 import traceback  # <-- AGREGA ESTO
+import uuid
 
 from .models import TipoPago, Carrito, ItemCarrito, Venta, DetalleVenta, Pago
+from . import carrito_store
 from .serializers import (
     TipoPagoSerializer, CarritoSerializer, ItemCarritoSerializer,
-    VentaSerializer, CrearVentaSerializer
+    VentaSerializer, VentaResumenSerializer, CrearVentaSerializer, SincronizarCarritoSerializer
 )
-from apps.productos.models import Producto  
+from config.paginacion import CursorOpcional
+from apps.monitoreo.metricas import checkout_espera_lock_segundos
+from apps.productos.models import Producto, ImagenProducto
 from rest_framework.exceptions import NotAuthenticated
-from decimal import Decimal
 
 # Configurar Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+
 class TipoPagoViewSet(viewsets.ModelViewSet):
     """
     ViewSet para el CRUD completo del modelo TipoPago.
@@ -59,9 +64,27 @@ class TipoPagoViewSet(viewsets.ModelViewSet):
             )
 
 class CarritoViewSet(viewsets.ModelViewSet):
+    """
+    Carrito del usuario autenticado o, sin sesión, de invitado identificado por
+    el header X-Carrito-Id (se genera y se devuelve en la primera respuesta).
+    Si un usuario autenticado manda X-Carrito-Id, el carrito de invitado se suma
+    al suyo. El almacenamiento está en carrito_store (BD o caché write-behind).
+    En las respuestas el carrito tiene id null y el id de cada item es su
+    producto_id (el mismo que reciben actualizar-cantidad y eliminar-producto),
+    porque con write-behind los items pueden no estar aún en la BD.
+    """
     queryset = Carrito.objects.all()
     serializer_class = CarritoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Lo único que puede hacer un invitado; el resto (y finalizar_compra) pide sesión
+    ACCIONES_INVITADO = {
+        'list', 'agregar_producto', 'actualizar_cantidad', 'eliminar_producto', 'sync', 'limpiar_carrito',
+    }
+
+    def get_permissions(self):
+        if self.action in self.ACCIONES_INVITADO:
+            return [permissions.AllowAny()]
+        return super().get_permissions()
 
     def get_queryset(self):
         # Si el usuario no está autenticado, devuelve vacío
@@ -77,19 +100,90 @@ class CarritoViewSet(viewsets.ModelViewSet):
         carrito, created = Carrito.objects.get_or_create(usuario=self.request.user)
         return carrito
 
+    def create(self, request, *args, **kwargs):
+        # Cada usuario tiene un solo carrito: POST devuelve el suyo
+        return self._responder(self._store().leer())
+
+    def _store(self):
+        """Store del carrito de este request (ver carrito_store)"""
+        if hasattr(self, '_store_actual'):
+            return self._store_actual
+
+        carrito_id = self.request.headers.get('X-Carrito-Id', '')
+        try:
+            carrito_id = uuid.UUID(carrito_id).hex
+        except ValueError:
+            carrito_id = None
+
+        if self.request.user.is_authenticated:
+            store = carrito_store.carrito_de_usuario(self.request.user.id)
+            if carrito_id:
+                carrito_store.fusionar(carrito_store.carrito_invitado(carrito_id), store)
+        else:
+            self._carrito_invitado_id = carrito_id or uuid.uuid4().hex
+            store = carrito_store.carrito_invitado(self._carrito_invitado_id)
+
+        self._store_actual = store
+        return store
+
+    def _puede_comprar(self):
+        # Los invitados pueden armar carrito; con sesión, solo los clientes
+        return not self.request.user.is_authenticated or self.request.user.tiene_rol('cliente')
+
+    def _responder(self, items, codigo=status.HTTP_200_OK):
+        """
+        Serializa el carrito: productos + categoría en una consulta y solo la
+        primera imagen de cada uno en otra. Con ?view=summary solo los totales.
+        """
+        total_items = sum(datos['cantidad'] for datos in items.values())
+        total_precio = sum(datos['precio_unitario'] * datos['cantidad'] for datos in items.values())
+        data = {'total_items': total_items, 'total_precio': total_precio}
+
+        if self.request.query_params.get('view') != 'summary':
+            productos = (
+                Producto.objects
+                .select_related('categoria')
+                .prefetch_related(Prefetch(
+                    'imagenes',
+                    queryset=ImagenProducto.objects.order_by('id')[:1],
+                    to_attr='primera_imagen',
+                ))
+                .in_bulk(list(items))
+            ) if items else {}
+
+            # Misma forma que CarritoSerializer; el id del item es el del producto
+            # porque el carrito puede no estar aún en la BD
+            items_carrito = [
+                ItemCarrito(id=producto_id, producto=productos[producto_id], **datos)
+                for producto_id, datos in items.items() if producto_id in productos
+            ]
+            usuario = self.request.user
+            data = {
+                'id': None,
+                'usuario': usuario.id if usuario.is_authenticated else None,
+                'items': ItemCarritoSerializer(items_carrito, many=True).data,
+                **data,
+            }
+
+        carrito_id = getattr(self, '_carrito_invitado_id', None)
+        if carrito_id:
+            data = {**data, 'carrito_id': carrito_id}
+        respuesta = response.Response(data, status=codigo)
+        if carrito_id:
+            respuesta['X-Carrito-Id'] = carrito_id
+        return respuesta
+
     def list(self, request, *args, **kwargs):
-        # Devuelve el carrito del usuario autenticado (crea si no existe)
-        if not request.user.is_authenticated:
-            return response.Response({'detail': 'No autenticado'}, status=status.HTTP_401_UNAUTHORIZED)
-        carrito, _ = Carrito.objects.get_or_create(usuario=request.user)
-        serializer = self.get_serializer(carrito)
-        return response.Response(serializer.data)
+        return self._responder(self._store().leer())
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._responder(self._store().leer())
 
     @action(detail=False, methods=['post'], url_path='agregar-producto')
     def agregar_producto(self, request):
         """Agrega un producto al carrito"""
         # Verificar que el usuario sea cliente
-        if not request.user.roles.filter(nombre='cliente').exists():
+        if not self._puede_comprar():
             return response.Response(
                 {"detail": "Solo los clientes pueden agregar productos al carrito."},
                 status=status.HTTP_403_FORBIDDEN
@@ -100,7 +194,7 @@ class CarritoViewSet(viewsets.ModelViewSet):
 
         try:
             producto = Producto.objects.get(id=producto_id)
-        except Producto.DoesNotExist:
+        except (Producto.DoesNotExist, ValueError, TypeError):
             return response.Response(
                 {"detail": "Producto no encontrado."},
                 status=status.HTTP_404_NOT_FOUND
@@ -112,103 +206,135 @@ class CarritoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        carrito = self.get_object()
-        
-        # Calcular precio con descuento si existe - CORREGIDO
-        precio_final = producto.precio
-        if producto.descuento and producto.descuento > 0:
-            # Convertir descuento a Decimal para evitar error de tipos
-            descuento_decimal = Decimal(str(producto.descuento))
-            precio_final = producto.precio * (Decimal('1') - descuento_decimal / Decimal('100'))
-        
-        # Verificar si el producto ya está en el carrito
-        item_carrito, created = ItemCarrito.objects.get_or_create(
-            carrito=carrito,
-            producto=producto,
-            defaults={
-                'precio_unitario': precio_final,
-                'cantidad': cantidad
-            }
-        )
+        store = self._store()
+        items = store.leer()
 
-        if not created:
+        # Verificar si el producto ya está en el carrito
+        if producto.id in items:
             # Si ya existe, actualizar cantidad
-            nueva_cantidad = item_carrito.cantidad + cantidad
+            nueva_cantidad = items[producto.id]['cantidad'] + cantidad
             if producto.stock < nueva_cantidad:
                 return response.Response(
                     {"detail": "Stock insuficiente para esta cantidad."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            item_carrito.cantidad = nueva_cantidad
-            item_carrito.save()
-
-        carrito.save()
+            items[producto.id] = {**items[producto.id], 'cantidad': nueva_cantidad}
+        else:
+            items[producto.id] = {'cantidad': cantidad, 'precio_unitario': producto.precio_final}
 
-        serializer = CarritoSerializer(carrito)
-        return response.Response(serializer.data, status=status.HTTP_201_CREATED)
+        store.escribir(items)
+        return self._responder(items, status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['put'], url_path='actualizar-cantidad')
     def actualizar_cantidad(self, request):
         """Actualiza la cantidad de un producto en el carrito"""
-        producto_id = request.data.get('producto_id')
+        try:
+            producto_id = int(request.data.get('producto_id'))
+        except (TypeError, ValueError):
+            producto_id = None
         cantidad = int(request.data.get('cantidad', 1))
 
-        carrito = self.get_object()
-        
-        try:
-            item = ItemCarrito.objects.get(carrito=carrito, producto_id=producto_id)
-            producto = item.producto
-            
-            if cantidad <= 0:
-                item.delete()
-            else:
-                if producto.stock < cantidad:
-                    return response.Response(
-                        {"detail": "Stock insuficiente."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                item.cantidad = cantidad
-                item.save()
-                
-        except ItemCarrito.DoesNotExist:
+        store = self._store()
+        items = store.leer()
+
+        if producto_id not in items:
             return response.Response(
                 {"detail": "Producto no encontrado en el carrito."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = CarritoSerializer(carrito)
-        return response.Response(serializer.data)
+        if cantidad <= 0:
+            del items[producto_id]
+        else:
+            stock = Producto.objects.filter(id=producto_id).values_list('stock', flat=True).first() or 0
+            if stock < cantidad:
+                return response.Response(
+                    {"detail": "Stock insuficiente."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            items[producto_id] = {**items[producto_id], 'cantidad': cantidad}
+
+        store.escribir(items)
+        return self._responder(items)
 
     @action(detail=False, methods=['delete'], url_path='eliminar-producto/(?P<producto_id>[^/.]+)')
     def eliminar_producto(self, request, producto_id=None):
         """Elimina un producto del carrito"""
-        carrito = self.get_object()
-        
+        store = self._store()
+        items = store.leer()
+
         try:
-            item = ItemCarrito.objects.get(carrito=carrito, producto_id=producto_id)
-            item.delete()
-        except ItemCarrito.DoesNotExist:
+            del items[int(producto_id)]
+        except (KeyError, ValueError):
             return response.Response(
                 {"detail": "Producto no encontrado en el carrito."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = CarritoSerializer(carrito)
-        return response.Response(serializer.data)
+        store.escribir(items)
+        return self._responder(items)
+
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Aplica varios cambios de una vez: items = [{producto_id, cantidad}, ...]
+        con la cantidad final de cada producto (0 lo quita). Si algún producto
+        no existe o no tiene stock no se aplica nada.
+        """
+        if not self._puede_comprar():
+            return response.Response(
+                {"detail": "Solo los clientes pueden agregar productos al carrito."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = SincronizarCarritoSerializer(data=request.data)
+        if not serializer.is_valid():
+            return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Si un producto viene repetido vale la última cantidad
+        cantidades = {op['producto_id']: op['cantidad'] for op in serializer.validated_data['items']}
+        productos = Producto.objects.in_bulk(list(cantidades))
+
+        errores = []
+        for producto_id, cantidad in cantidades.items():
+            producto = productos.get(producto_id)
+            if producto is None:
+                errores.append({"producto_id": producto_id, "detail": "Producto no encontrado."})
+            elif cantidad > producto.stock:
+                errores.append({"producto_id": producto_id, "detail": f"Stock insuficiente para {producto.nombre}."})
+        if errores:
+            return response.Response(
+                {"detail": "No se pudo sincronizar el carrito.", "errores": errores},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        store = self._store()
+        items = {} if serializer.validated_data['reemplazar'] else store.leer()
+        for producto_id, cantidad in cantidades.items():
+            if cantidad == 0:
+                items.pop(producto_id, None)
+            elif producto_id in items:
+                items[producto_id] = {**items[producto_id], 'cantidad': cantidad}
+            else:
+                items[producto_id] = {
+                    'cantidad': cantidad,
+                    'precio_unitario': productos[producto_id].precio_final,
+                }
+
+        # En BD: borrados, bulk_update y bulk_create en una transacción
+        store.escribir(items)
+        return self._responder(items)
 
     @action(detail=False, methods=['delete'], url_path='limpiar')
     def limpiar_carrito(self, request):
         """Limpia todo el carrito"""
-        carrito = self.get_object()
-        carrito.items.all().delete()
-        
-        serializer = CarritoSerializer(carrito)
-        return response.Response(serializer.data)
+        self._store().escribir({})
+        return self._responder({})
 
     @action(detail=False, methods=['post'], url_path='finalizar-compra')
     def finalizar_compra(self, request):
         """Convierte el carrito en una venta"""
-        if not request.user.roles.filter(nombre='cliente').exists():
+        if not request.user.tiene_rol('cliente'):
             return response.Response(
                 {"detail": "Solo los clientes pueden realizar compras."},
                 status=status.HTTP_403_FORBIDDEN
@@ -218,39 +344,54 @@ class CarritoViewSet(viewsets.ModelViewSet):
         if not serializer.is_valid():
             return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        carrito = self.get_object()
-        
-        if not carrito.items.exists():
-            return response.Response(
-                {"detail": "El carrito está vacío."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Verificar stock antes de procesar
-        for item in carrito.items.all():
-            if item.producto.stock < item.cantidad:
-                return response.Response(
-                    {"detail": f"Stock insuficiente para {item.producto.nombre}."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
+        store = self._store()
         try:
             with transaction.atomic():
+                # Con el carrito bloqueado el EscritorCarritos no puede escribirle
+                # encima un estado viejo (ver carrito_store). Si solo estaba en la
+                # caché se baja a la BD dentro de esta misma transacción.
+                carrito = carrito_store.bloquear_carrito(usuario_id=request.user.id)
+                store.persistir()
+                items = list(carrito.items.select_related('producto'))
+
+                if not items:
+                    return response.Response(
+                        {"detail": "El carrito está vacío."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                # Bloquear el stock (en orden de id, sin deadlocks entre compras
+                # simultáneas) y volver a verificarlo ya con el lock tomado
+                inicio_lock = time.perf_counter()
+                bloqueados = Producto.objects.select_for_update().filter(
+                    id__in=[item.producto_id for item in items]
+                ).order_by('id').in_bulk()
+                checkout_espera_lock_segundos.observe(time.perf_counter() - inicio_lock)
+
+                for item in items:
+                    item.producto = bloqueados[item.producto_id]
+                    if item.producto.stock < item.cantidad:
+                        return response.Response(
+                            {"detail": f"Stock insuficiente para {item.producto.nombre}."},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+
                 # Crear la venta
+                # Se cobra el precio final vigente, no el guardado al agregar al carrito
                 venta = Venta.objects.create(
                     usuario=request.user,
-                    monto_total=carrito.total_precio(),
+                    monto_total=sum(item.producto.precio_final * item.cantidad for item in items),
                     direccion=serializer.validated_data['direccion'],
                     numero_int=serializer.validated_data.get('numero_int'),
                     estado='PENDIENTE'
                 )
 
                 # Crear detalles de venta y actualizar stock
-                for item in carrito.items.all():
+                for item in items:
                     DetalleVenta.objects.create(
                         venta=venta,
                         producto=item.producto,
-                        precio_unitario=item.precio_unitario,
+                        precio_unitario=item.producto.precio_final,
                         cantidad=item.cantidad
                     )
                     
@@ -268,8 +409,10 @@ class CarritoViewSet(viewsets.ModelViewSet):
                     estado='PENDIENTE'
                 )
 
-                # Limpiar carrito
+                # Limpiar carrito; la versión nueva en la caché queda antes del
+                # commit, mientras el carrito sigue bloqueado
                 carrito.items.all().delete()
+                store.olvidar()
 
                 # Devolver ID de venta para redirigir al resumen
                 return response.Response(
@@ -281,25 +424,65 @@ class CarritoViewSet(viewsets.ModelViewSet):
                 )
 
         except Exception as e:
+            # Hubo rollback: la caché vuelve a lo que quedó en la BD
+            store.olvidar()
             return response.Response(
                 {"detail": f"Error al procesar la compra: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class VentaPaginacion(CursorOpcional):
+    ordering = ('-fecha', '-id')
+
+
 class VentaViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Ventas (todas para admin, las propias para clientes). Paginación por
+    cursor opcional (?page_size= / ?cursor=) y ?view=summary sin los detalles.
+    """
     serializer_class = VentaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = VentaPaginacion
+
+    def _resumen(self):
+        return self.request.query_params.get('view') == 'summary'
 
     def get_queryset(self):
         user = self.request.user
         
-        if user.roles.filter(nombre='admin').exists():
-            return Venta.objects.all()
-        
-        if user.roles.filter(nombre='cliente').exists():
-            return Venta.objects.filter(usuario=user)
-        
-        return Venta.objects.none()
+        if user.tiene_rol('admin'):
+            queryset = Venta.objects.all()
+        elif user.tiene_rol('cliente'):
+            queryset = Venta.objects.filter(usuario=user)
+        else:
+            return Venta.objects.none()
+
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+
+        # Consultas fijas por página: usuario por JOIN, pagos anotados y
+        # detalles con su producto, categoría e imágenes en 3 consultas
+        queryset = (
+            queryset
+            .select_related('usuario')
+            .annotate(num_pagos=Count('pagos'))
+            .order_by('-fecha', '-id')
+        )
+        if not self._resumen():
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'detalles',
+                    queryset=DetalleVenta.objects.select_related('producto__categoria')
+                    .defer('producto__vector_busqueda'),
+                ),
+                'detalles__producto__imagenes',
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve') and self._resumen():
+            return VentaResumenSerializer
+        return super().get_serializer_class()
 
     @action(detail=True, methods=['post'], url_path='crear-sesion-pago')
     def crear_sesion_pago(self, request, pk=None):
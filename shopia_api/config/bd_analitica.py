@@ -0,0 +1,99 @@
+# Réplica de lectura para reportes, predicciones y el entrenamiento.
+# Solo las lecturas hechas dentro de lecturas_analiticas() (o de una vista con
+# @vista_analitica) van al alias 'analytics'; todo lo demás, y todas las
+# escrituras, siguen en 'default'. Sin DB_ANALYTICS_HOST el alias no existe y
+# todo queda en 'default'. Un usuario que acaba de escribir lee de la primaria
+# durante BD_ANALITICA_FIJAR_SEGUNDOS (la réplica puede venir atrasada). Esa
+# marca se guarda en la caché: con varios workers hace falta la compartida
+# (CACHE_URL); con la LocMem por defecto solo la ve el worker que atendió la
+# escritura y otro worker puede devolverle datos viejos de la réplica.
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+ALIAS_ANALITICA = 'analytics'
+METODOS_ESCRITURA = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+_en_analitica = ContextVar('en_analitica', default=False)
+
+
+def hay_analitica():
+    return ALIAS_ANALITICA in settings.DATABASES
+
+
+def _clave_fijado(usuario_id):
+    return f"bd_primaria:{usuario_id}"
+
+
+def fijar_a_primaria(usuario_id):
+    cache.set(_clave_fijado(usuario_id), True, settings.BD_ANALITICA_FIJAR_SEGUNDOS)
+
+
+def fijado_a_primaria(usuario):
+    if usuario is None or not usuario.is_authenticated:
+        return False
+    return cache.get(_clave_fijado(usuario.pk), False)
+
+
+@contextmanager
+def lecturas_analiticas(usuario=None):
+    """
+    Manda a 'analytics' las lecturas del bloque. También sirve como
+    decorador: @lecturas_analiticas(). Devuelve el alias que se usa.
+    """
+    if not hay_analitica() or fijado_a_primaria(usuario):
+        yield DEFAULT_DB_ALIAS
+        return
+    token = _en_analitica.set(True)
+    try:
+        yield ALIAS_ANALITICA
+    finally:
+        _en_analitica.reset(token)
+
+
+def vista_analitica(vista):
+    """Para vistas de solo lectura con @api_view (va debajo de @permission_classes)"""
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        with lecturas_analiticas(request.user):
+            return vista(request, *args, **kwargs)
+    return envoltura
+
+
+class EnrutadorAnalitica:
+    def db_for_read(self, model, **hints):
+        if _en_analitica.get() and hay_analitica():
+            return ALIAS_ANALITICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explícito: un objeto leído de la réplica se guarda en la primaria
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las dos bases tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación
+        return db != ALIAS_ANALITICA
+
+
+class FijarPrimariaMiddleware:
+    """Después de una escritura exitosa de un usuario, sus lecturas analíticas van a la primaria"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method in METODOS_ESCRITURA and response.status_code < 400 and hay_analitica():
+            # Con JWT, DRF deja el usuario en el request al autenticar en la vista
+            usuario = getattr(request, 'user', None)
+            if usuario is not None and usuario.is_authenticated:
+                fijar_a_primaria(usuario.pk)
+        return response
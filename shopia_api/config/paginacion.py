@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CursorOpcional(CursorPagination):
+    """
+    Paginación por cursor (keyset) que solo se activa si el cliente manda
+    ?cursor= o ?page_size=. Sin esos parámetros se devuelve la lista completa
+    como antes, para no romper al frontend actual.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -13,7 +13,10 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
+from corsheaders.defaults import default_headers
 import os
+import sys
+import tempfile
 import cloudinary
 from dotenv import load_dotenv
 
@@ -21,6 +24,9 @@ from dotenv import load_dotenv
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / '.env')
 
+# manage.py test: lo que en producción va en segundo plano se hace en el momento
+PRUEBAS = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -49,6 +55,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_extensions',
 
     # DRF + CORS
@@ -64,13 +71,14 @@ INSTALLED_APPS = [
     'apps.ventas',
     'apps.reportes',
     'apps.predicciones',
+    'apps.monitoreo',
 ]
 
 AUTH_USER_MODEL = 'usuarios.Usuario'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.usuarios.autenticacion.JWTAutenticacionCacheada',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',  
@@ -87,8 +95,12 @@ CORS_ALLOWED_ORIGINS = [
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+# Carrito de invitado
+CORS_ALLOW_HEADERS = (*default_headers, 'x-carrito-id', 'x-perfilar')
+CORS_EXPOSE_HEADERS = ['X-Carrito-Id', 'X-Perfil']
 
 MIDDLEWARE = [
+    'apps.monitoreo.middleware.MedicionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -96,6 +108,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.monitoreo.middleware.PerfiladoMiddleware',
+    'config.bd_analitica.FijarPrimariaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -146,6 +160,52 @@ DATABASES = {
     }
 }
 
+# Réplica de lectura opcional para reportes, predicciones y entrenamiento
+# (config/bd_analitica.py). Sin DB_ANALYTICS_HOST todo se lee de 'default'.
+if config('DB_ANALYTICS_HOST', default=''):
+    DATABASES['analytics'] = {
+        **DATABASES['default'],
+        'NAME': config('DB_ANALYTICS_NAME', default=DATABASES['default']['NAME']),
+        'USER': config('DB_ANALYTICS_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_ANALYTICS_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': config('DB_ANALYTICS_HOST'),
+        'PORT': config('DB_ANALYTICS_PORT', default=DATABASES['default']['PORT'], cast=int),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif PRUEBAS:
+    # Sin réplica las pruebas igual pasan por el enrutador: 'analytics' es
+    # otra conexión a la base de prueba de 'default'
+    DATABASES['analytics'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['config.bd_analitica.EnrutadorAnalitica']
+# Tras escribir, el usuario lee de la primaria. La marca va en la caché: sin
+# CACHE_URL (caché por proceso) solo la ve el worker que atendió la escritura
+BD_ANALITICA_FIJAR_SEGUNDOS = config('BD_ANALITICA_FIJAR_SEGUNDOS', default=30, cast=int)
+
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Por defecto en memoria del proceso; CACHE_URL permite usar Redis compartido
+CACHE_URL = config('CACHE_URL', default='')
+if 'analytics' in DATABASES and not CACHE_URL and not PRUEBAS:
+    print("⚠️ ADVERTENCIA: DB_ANALYTICS_HOST sin CACHE_URL: leer-lo-escrito solo vale dentro del mismo worker")
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'shopia',
+        }
+    }
+
+# Segundos que vive en caché el contador de notificaciones no leídas
+NOTIF_CONTADOR_TTL = config('NOTIF_CONTADOR_TTL', default=300, cast=int)
 
 
 # Password validation
@@ -209,6 +269,15 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
 BREVO_API_KEY = config('BREVO_API_KEY')
+BREVO_API_URL = config('BREVO_API_URL', default='https://api.brevo.com/v3/smtp/email')
+
+# Bandeja de salida de emails (manage.py procesar_emails)
+EMAIL_OUTBOX_LOTE = config('EMAIL_OUTBOX_LOTE', default=50, cast=int)
+EMAIL_OUTBOX_MAX_INTENTOS = config('EMAIL_OUTBOX_MAX_INTENTOS', default=5, cast=int)
+EMAIL_OUTBOX_TIMEOUT = config('EMAIL_OUTBOX_TIMEOUT', default=10, cast=int)
+# Segundos que un lote queda tomado por un worker; tiene que cubrir el envío de
+# todo el lote (LOTE * TIMEOUT). Vencido, otro worker retoma los que quedaron
+EMAIL_OUTBOX_PLAZO_ENVIO = config('EMAIL_OUTBOX_PLAZO_ENVIO', default=900, cast=int)
 
 
 # CONFIGURACIÓN CLOUDINARY
@@ -226,5 +295,60 @@ FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:5173')
 GOOGLE_CREDENTIALS_JSON = os.getenv('GOOGLE_CREDENTIALS_JSON')
 if not GOOGLE_CREDENTIALS_JSON:
     print("⚠️ ADVERTENCIA: GOOGLE_CREDENTIALS_JSON no está definido en .env")
+
+# Envío push (FCM): lotes multicast enviados por un pool de hilos acotado
+FCM_TAMANO_LOTE = config('FCM_TAMANO_LOTE', default=500, cast=int)  # máximo de FCM
+FCM_MAX_HILOS = config('FCM_MAX_HILOS', default=4, cast=int)
+FCM_ASINCRONO = config('FCM_ASINCRONO', default=True, cast=bool)
+
+# Límite de usuarios para una notificación con selección explícita (filas M2M)
+NOTIFICACION_MAX_SELECCION = config('NOTIFICACION_MAX_SELECCION', default=1000, cast=int)
+
+# Bitácora: escritura en lotes desde un hilo (False = guardar en el momento, en las pruebas)
+BITACORA_ASINCRONA = config('BITACORA_ASINCRONA', default=not PRUEBAS, cast=bool)
+BITACORA_TAMANO_LOTE = config('BITACORA_TAMANO_LOTE', default=100, cast=int)
+BITACORA_INTERVALO = config('BITACORA_INTERVALO', default=2, cast=float)  # segundos
+# Retención (comando depurar_bitacora): días en la tabla activa y días totales
+BITACORA_DIAS_ACTIVOS = config('BITACORA_DIAS_ACTIVOS', default=90, cast=int)
+BITACORA_DIAS_HISTORICO = config('BITACORA_DIAS_HISTORICO', default=730, cast=int)
+
+# Login: intentos por (correo, ip) en una ventana, bloqueo y límite por IP (en caché)
+LOGIN_MAX_INTENTOS = config('LOGIN_MAX_INTENTOS', default=3, cast=int)
+LOGIN_MAX_INTENTOS_CUENTA = config('LOGIN_MAX_INTENTOS_CUENTA', default=10, cast=int)  # desde cualquier IP
+LOGIN_VENTANA_SEGUNDOS = config('LOGIN_VENTANA_SEGUNDOS', default=900, cast=int)
+LOGIN_BLOQUEO_MINUTOS = config('LOGIN_BLOQUEO_MINUTOS', default=30, cast=int)
+LOGIN_IP_MAX_INTENTOS = config('LOGIN_IP_MAX_INTENTOS', default=20, cast=int)
+LOGIN_IP_VENTANA = config('LOGIN_IP_VENTANA', default=60, cast=int)
+# Proxies delante de la app que agregan su entrada a X-Forwarded-For (el router
+# de la plataforma = 1). Con 0 se usa REMOTE_ADDR (ver usuarios.utils.obtener_ip)
+PROXIES_CONFIABLES = config('PROXIES_CONFIABLES', default=1, cast=int)
+
+# Segundos que se guarda la copia del usuario autenticado (lecturas sin consultar la BD)
+AUTH_USUARIO_CACHE_TTL = config('AUTH_USUARIO_CACHE_TTL', default=60, cast=int)
+
+# Snapshot del catálogo público (se invalida con señales; el TTL es solo un respaldo)
+CATALOGO_CACHE_TTL = config('CATALOGO_CACHE_TTL', default=3600, cast=int)
+CATALOGO_LOCK_SEGUNDOS = 10
     
 
+# Carritos de usuario write-behind en la caché (apps/ventas/carrito_store.py).
+# Solo con caché compartida: la LocMem es por worker y descarta entradas.
+# Los carritos de invitado van siempre a la BD.
+CARRITO_WRITE_BEHIND = config('CARRITO_WRITE_BEHIND', default=bool(CACHE_URL), cast=bool)
+CARRITO_FLUSH_INTERVALO = config('CARRITO_FLUSH_INTERVALO', default=30, cast=float)  # segundos
+CARRITO_CACHE_TTL = config('CARRITO_CACHE_TTL', default=7 * 24 * 3600, cast=int)
+CARRITO_INVITADO_DIAS = config('CARRITO_INVITADO_DIAS', default=30, cast=int)  # sin cambios -> se borra
+
+# Monitoreo por request (apps.monitoreo): Server-Timing para admins, histogramas
+# en /api/monitoreo/solicitudes/ y log de solicitudes lentas con su SQL
+MONITOREO_ACTIVO = config('MONITOREO_ACTIVO', default=True, cast=bool)
+MONITOREO_LENTO_MS = config('MONITOREO_LENTO_MS', default=1000, cast=int)
+MONITOREO_MAX_CONSULTAS = config('MONITOREO_MAX_CONSULTAS', default=50, cast=int)  # más = se loguea
+MONITOREO_MAX_SQL = config('MONITOREO_MAX_SQL', default=100, cast=int)  # consultas guardadas por request
+# Token para /metrics (Prometheus manda Authorization: Bearer <token>); vacío = solo con DEBUG
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
+# Perfilado bajo demanda (X-Perfilar / ?perfilar=1, solo admins)
+PERFILADO_DIR = config('PERFILADO_DIR', default=os.path.join(tempfile.gettempdir(), 'shopia_perfiles'))
+PERFILADO_MAX_ARCHIVOS = config('PERFILADO_MAX_ARCHIVOS', default=50, cast=int)
+PERFILADO_INTERVALO_MS = config('PERFILADO_INTERVALO_MS', default=5, cast=int)  # entre muestras
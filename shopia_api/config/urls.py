@@ -2,17 +2,20 @@
 from django.urls import path, include
 from django.contrib import admin
 from django.shortcuts import redirect
+from apps.monitoreo.views import metricas_prometheus
 def redirect_to_admin(request):
     return redirect('/admin/')
 
 urlpatterns = [
     path('', redirect_to_admin),
     path('admin/', admin.site.urls),
+    path('metrics', metricas_prometheus, name='metricas-prometheus'),
     path('api/', include([
         path('', include('apps.usuarios.urls')),
         path('',include('apps.productos.urls')),
         path('ventas/',include('apps.ventas.urls')),
         path('reportes/', include('apps.reportes.urls')),
         path('predicciones/', include('apps.predicciones.urls')),
+        path('monitoreo/', include('apps.monitoreo.urls')),
     ])),
 ]
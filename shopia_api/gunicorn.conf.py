@@ -0,0 +1,30 @@
+# Configuración de gunicorn (se carga sola desde el directorio de trabajo).
+# Las opciones de arranque siguen en el Procfile.
+import os
+import shutil
+
+# Métricas de Prometheus compartidas entre workers (apps/monitoreo/metricas.py).
+# Se define antes de cargar la app para que prometheus_client arranque en modo multiproceso.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/shopia_metricas')
+
+
+def on_starting(server):
+    # Empezar sin los archivos de métricas de una ejecución anterior
+    directorio = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.makedirs(directorio, exist_ok=True)
+
+
+def worker_exit(server, worker):
+    # Guardar la bitácora que quedó en memoria antes de que el worker termine
+    from apps.usuarios.bitacora import escritor_bitacora
+    escritor_bitacora.vaciar()
+    # y los carritos modificados que aún no se bajaron a la BD
+    from apps.ventas.carrito_store import escritor_carritos
+    escritor_carritos.vaciar()
+
+
+def child_exit(server, worker):
+    # Las métricas del worker que murió dejan de sumarse como proceso vivo
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
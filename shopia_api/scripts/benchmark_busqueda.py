@@ -0,0 +1,99 @@
+import sys
+import os
+import time
+import random
+import argparse
+import statistics
+
+# Agrega el directorio raíz del proyecto al sys.path
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection
+from django.db.models import Q
+from apps.productos.models import Categoria, Producto
+from apps.productos.busqueda import buscar_productos
+from apps.productos.precios import recalcular_precios
+
+CATEGORIA_BENCHMARK = 'Benchmark búsqueda'
+PALABRAS = ['teclado', 'mouse', 'monitor', 'audífonos', 'parlante', 'cámara', 'router',
+            'laptop', 'tablet', 'cargador', 'inalámbrico', 'gamer', 'mecánico', 'usb', 'bluetooth']
+MARCAS = ['Logitech', 'Razer', 'Samsung', 'Sony', 'HyperX', 'Corsair', 'Xiaomi', 'Lenovo']
+# Incluye errores de tipeo para ver la tolerancia por trigramas
+TERMINOS = ['teclado mecanico', 'mouse gamer', 'logitech', 'tecaldo', 'samsnug monitor', 'audifonos bluetooth']
+
+
+def generar(cantidad, lote=5000):
+    categoria, _ = Categoria.objects.get_or_create(nombre=CATEGORIA_BENCHMARK)
+    creados = 0
+    while creados < cantidad:
+        productos = []
+        for _ in range(min(lote, cantidad - creados)):
+            nombre = ' '.join(random.sample(PALABRAS, 3)).capitalize()
+            productos.append(Producto(
+                nombre=nombre,
+                marca=random.choice(MARCAS),
+                descripcion=f"{nombre} ideal para oficina y juegos, {' '.join(random.sample(PALABRAS, 5))}",
+                precio=random.randint(50, 5000),
+                stock=random.randint(0, 100),
+                categoria=categoria,
+            ))
+        Producto.objects.bulk_create(productos)
+        creados += len(productos)
+        print(f"   {creados}/{cantidad} productos creados")
+    # bulk_create no pasa por save()
+    recalcular_precios(Producto.objects.filter(categoria=categoria))
+
+
+def limpiar():
+    borrados, _ = Producto.objects.filter(categoria__nombre=CATEGORIA_BENCHMARK).delete()
+    Categoria.objects.filter(nombre=CATEGORIA_BENCHMARK).delete()
+    print(f"🗑️ {borrados} registros de benchmark eliminados")
+
+
+def busqueda_anterior(texto):
+    """Lo que hacía SearchFilter: ILIKE en tres columnas"""
+    return Producto.objects.filter(
+        Q(nombre__icontains=texto) | Q(marca__icontains=texto) | Q(descripcion__icontains=texto)
+    )
+
+
+def medir(funcion, texto, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultados = list(funcion(texto)[:20])  # una página de resultados
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), len(resultados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda de productos")
+    parser.add_argument('--generar', type=int, default=0, help='Crear N productos de prueba (ej. 100000)')
+    parser.add_argument('--limpiar', action='store_true', help='Borrar los productos de prueba y salir')
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.limpiar:
+        limpiar()
+        return
+    if args.generar:
+        generar(args.generar)
+
+    print("=" * 70)
+    print(f"🔎 BENCHMARK BÚSQUEDA ({connection.vendor}, {Producto.objects.count()} productos)")
+    print("=" * 70)
+    print(f"{'término':<24}{'anterior (ILIKE)':>20}{'buscar_productos':>22}")
+    for texto in TERMINOS:
+        t_anterior, n_anterior = medir(busqueda_anterior, texto, args.repeticiones)
+        t_nuevo, n_nuevo = medir(buscar_productos, texto, args.repeticiones)
+        print(f"{texto:<24}{t_anterior:>10.2f} ms ({n_anterior:>2}){t_nuevo:>12.2f} ms ({n_nuevo:>2})")
+
+
+if __name__ == "__main__":
+    main()
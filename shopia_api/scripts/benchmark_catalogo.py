@@ -0,0 +1,61 @@
+import sys
+import os
+import time
+import statistics
+
+# Agrega el directorio raíz del proyecto al sys.path
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.test import Client
+from apps.productos import cache_catalogo
+
+URLS = ['/api/catalogo/', '/api/categorias/']
+
+
+def medir(cliente, url, repeticiones, antes=None, **headers):
+    """Devuelve (última respuesta, lista de tiempos en ms)"""
+    tiempos = []
+    respuesta = None
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        respuesta = cliente.get(url, **headers)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return respuesta, tiempos
+
+
+def imprimir(nombre, tiempos):
+    p95 = statistics.quantiles(tiempos, n=20)[18] if len(tiempos) > 1 else tiempos[0]
+    print(f"   {nombre:<22} p50={statistics.median(tiempos):7.2f} ms   p95={p95:7.2f} ms")
+
+
+def main(repeticiones=50):
+    print("=" * 60)
+    print("⏱️  BENCHMARK CATÁLOGO (snapshot en caché)")
+    print("=" * 60)
+    cliente = Client()
+
+    for url in URLS:
+        print(f"\n{url}")
+        # Frío: se invalida antes de cada petición, obliga a reconstruir
+        _, frio = medir(cliente, url, repeticiones, antes=cache_catalogo.invalidar)
+        # Tibio: sale directo de la caché
+        respuesta, tibio = medir(cliente, url, repeticiones)
+        # Condicional: el cliente ya tiene el ETag -> 304 sin cuerpo
+        _, condicional = medir(cliente, url, repeticiones, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+
+        imprimir("frío (reconstruye)", frio)
+        imprimir("tibio (caché)", tibio)
+        imprimir("If-None-Match (304)", condicional)
+        print(f"   tamaño: {len(respuesta.content)} bytes")
+
+
+if __name__ == "__main__":
+    main()
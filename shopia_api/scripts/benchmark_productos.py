@@ -0,0 +1,55 @@
+import sys
+import os
+import time
+
+# Agrega el directorio raíz del proyecto al sys.path
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from apps.productos.models import Producto
+
+CASOS = [
+    ("lista completa (sin paginar)", "/api/productos/"),
+    ("página de 24", "/api/productos/?page_size=24"),
+    ("página de 24 + fields", "/api/productos/?page_size=24&fields=id,nombre,marca,precio,descuento,url_imagen_principal"),
+]
+
+
+def medir(cliente, url):
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        respuesta = cliente.get(url)
+        ms = (time.perf_counter() - inicio) * 1000
+    return respuesta, ms, len(consultas.captured_queries)
+
+
+def main():
+    print("=" * 70)
+    print(f"📦 BENCHMARK LISTADO DE PRODUCTOS ({Producto.objects.count()} productos)")
+    print("=" * 70)
+    cliente = Client()
+    for nombre, url in CASOS:
+        medir(cliente, url)  # calentar
+        respuesta, ms, consultas = medir(cliente, url)
+        print(f"{nombre:<32}{ms:>9.1f} ms{consultas:>5} consultas{len(respuesta.content):>12} bytes")
+
+    # Recorrer todas las páginas con el cursor: las consultas por página no crecen
+    url, paginas, maximo = "/api/productos/?page_size=24&fields=id,nombre,precio", 0, 0
+    while url and paginas < 50:
+        respuesta, _, consultas = medir(cliente, url)
+        maximo = max(maximo, consultas)
+        url = respuesta.json().get('next')
+        paginas += 1
+    print(f"\n{paginas} páginas recorridas con cursor, máximo {maximo} consultas por página")
+
+
+if __name__ == "__main__":
+    main()
@@ -175,11 +175,8 @@ def generar_ventas_sinteticas(cantidad, meses_atras):
                 # Cantidad realista: mayoría compra 1 unidad
                 cantidad_item = random.choices([1, 2, 3], weights=[0.75, 0.20, 0.05])[0]
                 
-                precio_base = Decimal(str(producto.precio))
-                if producto.descuento > 0:
-                    precio_unitario = precio_base * (Decimal('1') - Decimal(str(producto.descuento)))
-                else:
-                    precio_unitario = precio_base
+                # Misma regla de descuento que la tienda (apps/productos/precios.py)
+                precio_unitario = producto.precio_final
                 
                 subtotal = Decimal(str(cantidad_item)) * precio_unitario
                 monto_total += subtotal
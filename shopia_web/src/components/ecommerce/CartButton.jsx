@@ -8,7 +8,7 @@ export default function CartButton({ className = '', onClick, reload }) {
 
   useEffect(() => {
     if (isAuthenticated && isClient()) {
-      api.get('/api/ventas/carrito/')
+      api.get('/api/ventas/carrito/?view=summary')
         .then(data => setTotalItems(data.total_items || 0))
         .catch(() => setTotalItems(0));
     } else {
@@ -2,19 +2,39 @@ import { useEffect, useState } from "react";
 import SmartTable from "../../../components/tabla/SmartTable.jsx";
 import { api } from "../../../services/apiClient.js";
 
+// La bitácora crece sin límite: se pide por páginas (cursor) y se siguen
+// agregando con "Cargar más", que usa la URL `next` del backend
+const PAGE_SIZE = 100;
+
+// `next` viene absoluto y, detrás del proxy, con http://: se usa solo la ruta
+function rutaRelativa(url) {
+  if (!url) return null;
+  const u = new URL(url);
+  return `${u.pathname}${u.search}`;
+}
+
 export default function BitacoraPage() {
   const [loading, setLoading] = useState(false);
   const [list, setList] = useState([]);
+  const [next, setNext] = useState(null);
+  const [cargandoMas, setCargandoMas] = useState(false);
   const [error, setError] = useState("");
 
-  function cargar() {
-    setLoading(true);
+  function cargar(url = `/api/cuenta/bitacora/?page_size=${PAGE_SIZE}`) {
+    // Al cargar más, la tabla sigue mostrando lo que ya tiene
+    const primera = !url.includes("cursor=");
+    const setCargando = primera ? setLoading : setCargandoMas;
+    setCargando(true);
     setError("");
     api
-      .get("/api/cuenta/bitacora/")
-      .then((d) => setList(Array.isArray(d) ? d : []))
+      .get(url)
+      .then((d) => {
+        const resultados = Array.isArray(d?.results) ? d.results : [];
+        setList((prev) => (primera ? resultados : [...prev, ...resultados]));
+        setNext(rutaRelativa(d?.next));
+      })
       .catch((e) => setError(e.message))
-      .finally(() => setLoading(false));
+      .finally(() => setCargando(false));
   }
   useEffect(() => {
     cargar();
@@ -61,6 +81,17 @@ export default function BitacoraPage() {
         onEdit={null}
         onDelete={null}
         hideActions={true} // <-- Oculta columna acciones
+        customHeaderActions={
+          next && (
+            <button
+              onClick={() => cargar(next)}
+              disabled={cargandoMas}
+              className="px-4 py-3 text-sm rounded-xl font-medium border-2 bg-white border-gray-300 text-gray-700 hover:bg-gray-50 hover:border-gray-400 shadow-sm transition-all duration-200 disabled:opacity-50 disabled:cursor-not-allowed"
+            >
+              {cargandoMas ? "Cargando..." : `Cargar más (${list.length} cargados)`}
+            </button>
+          )
+        }
       />
     </div>
   );
@@ -11,7 +11,8 @@ export default function VentaLogPage() {
     setLoading(true);
     setError("");
     api
-      .get("/api/ventas/ventas/")
+      // Solo la cabecera de las últimas 200 ventas (paginación por cursor)
+      .get("/api/ventas/ventas/?view=summary&page_size=200")
       .then((d) => setList(Array.isArray(d.results) ? d.results : d))
       .catch((e) => setError(e.message))
       .finally(() => setLoading(false));
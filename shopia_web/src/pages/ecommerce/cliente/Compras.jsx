@@ -19,7 +19,7 @@ export default function ComprasPage() {
     setLoading(true);
     setError("");
     api
-      .get("/api/ventas/ventas/")
+      .get("/api/ventas/ventas/?view=summary")
       .then((d) => setList(Array.isArray(d.results) ? d.results : d))
       .catch((e) => setError(e.message))
       .finally(() => setLoading(false));
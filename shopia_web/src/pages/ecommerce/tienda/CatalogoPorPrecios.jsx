@@ -23,8 +23,9 @@ export default function BusquedaProductosPage() {
     
     let tituloDinamico = "Resultados de Búsqueda";
     const search = params.get('search');
-    const gte = params.get('precio__gte');
-    const lte = params.get('precio__lte');
+    // El asistente filtra por lo que paga el cliente (precio con descuento)
+    const gte = params.get('precio_final__gte') || params.get('precio__gte');
+    const lte = params.get('precio_final__lte') || params.get('precio__lte');
 
     if (search) {
       tituloDinamico = `Búsqueda: "${search}"`;
@@ -11,6 +11,12 @@ export async function apiFetch(url, options = {}) {
   };
   if (token) headers["Authorization"] = `Bearer ${token}`;
 
+  // Carrito de invitado: el backend devuelve X-Carrito-Id y al iniciar sesión
+  // lo suma al carrito del usuario en la primera petición que lo incluya
+  const esCarrito = url.includes("/api/ventas/carrito/");
+  const carritoId = localStorage.getItem("carrito_id");
+  if (esCarrito && carritoId) headers["X-Carrito-Id"] = carritoId;
+
   // En desarrollo local: usar proxy (/api)
   // En producción: usar URL completa
   //const isDev = import.meta.env.DEV;
@@ -25,6 +31,12 @@ export async function apiFetch(url, options = {}) {
 
   const res = await fetch(fullUrl, { ...options, headers });
 
+  if (esCarrito && res.ok) {
+    const nuevoCarritoId = res.headers.get("X-Carrito-Id");
+    if (nuevoCarritoId) localStorage.setItem("carrito_id", nuevoCarritoId);
+    else if (token) localStorage.removeItem("carrito_id");
+  }
+
   let data = null;
   try {
     const text = await res.text();